@@ -39,3 +39,6 @@ class AgentState(TypedDict):
     search_criteria: Annotated[SearchCriteria, update_search_criteria]
     last_updated_keys: list[str]
     thread_id: str
+    # Rolling summary of the turns dropped from messages by the context manager node
+    summary: str
+    context_stats: dict
@@ -2,12 +2,13 @@ from typing import Optional
 from django.contrib.auth import get_user_model
 from applications.models import Application
 from properties.models import Property, ResidentialComplex
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+
+from agent.tools_manager import to_coroutine
 
 User = get_user_model()
 
-@tool
-def create_property_application(
+def _create_property_application(
     name: str,
     phone_number: str,
     property_id: Optional[int] = None,
@@ -77,3 +78,9 @@ def create_property_application(
     except Exception as e:
         return f"Произошла ошибка при создании заявки: {str(e)}"
 
+
+create_property_application = StructuredTool.from_function(
+    _create_property_application,
+    name="create_property_application",
+    coroutine=to_coroutine(_create_property_application),
+)
@@ -1,6 +1,37 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AgentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agent'
+
+    def ready(self):
+        from .hybrid_retriever import connect_signals as connect_retriever_signals
+
+        connect_retriever_signals()
+
+        if not settings.AGENT_BACKGROUND_WORKERS:
+            return
+
+        if settings.AGENT_WARM_UP:
+            from .vector_searcher import VectorSearcher
+
+            threading.Thread(
+                target=VectorSearcher.warm_up,
+                args=(settings.AGENT_WARM_UP_COLLECTIONS,),
+                name="agent-warm-up",
+                daemon=True,
+            ).start()
+
+        if settings.AGENT_CHECKPOINT_SWEEP_INTERVAL > 0:
+            from .checkpoint_retention import CheckpointSweeper
+
+            CheckpointSweeper.start()
+
+        if settings.CHROMA_REALTIME_UPDATES:
+            from .vector_updates import connect_signals
+
+            connect_signals()
@@ -0,0 +1,239 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_writes", "checkpoint_blobs")
+# The saver commits blobs before the checkpoint that references them, so threads that are
+# mid-conversation are left alone until they have been idle this long
+ACTIVE_THREAD_GRACE_MINUTES = 10
+# pg advisory lock key held while a sweep runs, so only one process sweeps at a time
+SWEEP_LOCK_KEY = 72_617_001
+# The saver writes "ts" as a UTC isoformat string, so the raw text sorts chronologically and an
+# index on it serves the per-thread last-activity lookups of the sweep. The checkpoint tables
+# belong to langgraph: this runs from a migration and again after the saver's own setup()
+CHECKPOINT_TS_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS checkpoints_thread_ts_idx "
+    "ON public.checkpoints (thread_id, checkpoint_ns, (checkpoint->>'ts'))"
+)
+
+
+def checkpoint_table_sizes() -> Dict[str, Dict[str, int]]:
+    """Total on-disk size (with indexes and TOAST) and estimated row count of each checkpoint table."""
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in CHECKPOINT_TABLES:
+            cursor.execute(
+                """
+                SELECT pg_total_relation_size(c.oid), GREATEST(c.reltuples, 0)::bigint
+                FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public' AND c.relname = %s
+                """,
+                [table],
+            )
+            row = cursor.fetchone()
+            sizes[table] = {"bytes": row[0], "rows": row[1]} if row else {"bytes": 0, "rows": 0}
+    return sizes
+
+
+def delete_threads(thread_ids: List[str]) -> int:
+    """Removes every checkpoint, pending write and blob of the given threads, and their transcripts."""
+    from .models import ConversationMessage
+
+    if not thread_ids:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("DELETE FROM public.checkpoint_writes WHERE thread_id = ANY(%s)", [thread_ids])
+        cursor.execute("DELETE FROM public.checkpoint_blobs WHERE thread_id = ANY(%s)", [thread_ids])
+        cursor.execute("DELETE FROM public.checkpoints WHERE thread_id = ANY(%s)", [thread_ids])
+        deleted = cursor.rowcount
+        ConversationMessage.objects.filter(thread_id__in=thread_ids).delete()
+
+    from .llm_tools import complex_lookup_cache
+    for thread_id in thread_ids:
+        complex_lookup_cache.clear_thread(thread_id)
+    return deleted
+
+
+def checkpoint_ts_bound(age: timedelta) -> str:
+    """The "ts" text of a checkpoint written `age` ago, comparable with checkpoints_thread_ts_idx."""
+    return (timezone.now() - age).astimezone(dt_timezone.utc).isoformat(timespec="microseconds")
+
+
+def expired_threads(ttl_days: int, limit: int) -> List[str]:
+    # The checkpoint payload carries its creation time in "ts"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT thread_id FROM public.checkpoints
+            GROUP BY thread_id
+            HAVING max(checkpoint->>'ts') < %s
+            LIMIT %s
+            """,
+            [checkpoint_ts_bound(timedelta(days=ttl_days)), limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def overgrown_threads(keep_last: int, limit: int) -> List[str]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT thread_id FROM public.checkpoints
+            GROUP BY thread_id, checkpoint_ns
+            HAVING count(*) > %s
+               AND max(checkpoint->>'ts') < %s
+            LIMIT %s
+            """,
+            [keep_last, checkpoint_ts_bound(timedelta(minutes=ACTIVE_THREAD_GRACE_MINUTES)), limit],
+        )
+        return list({row[0] for row in cursor.fetchall()})
+
+
+def prune_threads(thread_ids: List[str], keep_last: int) -> Dict[str, int]:
+    """
+    Keeps the newest `keep_last` checkpoints of each thread (checkpoint ids are time-ordered uuid6),
+    then drops the writes of removed checkpoints and every blob no remaining checkpoint points to.
+    """
+    if not thread_ids:
+        return {"checkpoints": 0, "checkpoint_writes": 0, "checkpoint_blobs": 0}
+
+    deleted = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            """
+            DELETE FROM public.checkpoints c
+            USING (
+                SELECT thread_id, checkpoint_ns, checkpoint_id,
+                       row_number() OVER (
+                           PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                       ) AS position
+                FROM public.checkpoints
+                WHERE thread_id = ANY(%s)
+            ) old
+            WHERE old.position > %s
+              AND c.thread_id = old.thread_id
+              AND c.checkpoint_ns = old.checkpoint_ns
+              AND c.checkpoint_id = old.checkpoint_id
+            """,
+            [thread_ids, keep_last],
+        )
+        deleted["checkpoints"] = cursor.rowcount
+
+        cursor.execute(
+            """
+            DELETE FROM public.checkpoint_writes w
+            WHERE w.thread_id = ANY(%s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM public.checkpoints c
+                  WHERE c.thread_id = w.thread_id
+                    AND c.checkpoint_ns = w.checkpoint_ns
+                    AND c.checkpoint_id = w.checkpoint_id
+              )
+            """,
+            [thread_ids],
+        )
+        deleted["checkpoint_writes"] = cursor.rowcount
+
+        # Blobs are shared between checkpoints through channel_versions
+        cursor.execute(
+            """
+            DELETE FROM public.checkpoint_blobs b
+            WHERE b.thread_id = ANY(%s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM public.checkpoints c
+                  WHERE c.thread_id = b.thread_id
+                    AND c.checkpoint_ns = b.checkpoint_ns
+                    AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+              )
+            """,
+            [thread_ids],
+        )
+        deleted["checkpoint_blobs"] = cursor.rowcount
+    return deleted
+
+
+def sweep_checkpoints(keep_last: int, ttl_days: int, batch_size: int) -> Dict[str, int]:
+    """Expires idle threads, then prunes long threads, `batch_size` threads per transaction."""
+    report = {"expired_threads": 0, "pruned_threads": 0, "checkpoints": 0, "checkpoint_writes": 0, "checkpoint_blobs": 0}
+
+    if ttl_days > 0:
+        while True:
+            thread_ids = expired_threads(ttl_days, batch_size)
+            if not thread_ids:
+                break
+            delete_threads(thread_ids)
+            report["expired_threads"] += len(thread_ids)
+
+    if keep_last > 0:
+        while True:
+            thread_ids = overgrown_threads(keep_last, batch_size)
+            if not thread_ids:
+                break
+            for table, count in prune_threads(thread_ids, keep_last).items():
+                report[table] += count
+            report["pruned_threads"] += len(thread_ids)
+    return report
+
+
+@contextmanager
+def sweep_lock():
+    """Yields whether this process got the sweep lock; every other process skips its sweep meanwhile."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [SWEEP_LOCK_KEY])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [SWEEP_LOCK_KEY])
+
+
+def vacuum_checkpoint_tables():
+    # VACUUM cannot run inside a transaction block; Django's connection is in autocommit here
+    with connection.cursor() as cursor:
+        for table in CHECKPOINT_TABLES:
+            cursor.execute(f"VACUUM (ANALYZE) public.{table}")
+
+
+class CheckpointSweeper:
+    """
+    Background thread that runs sweep_checkpoints every AGENT_CHECKPOINT_SWEEP_INTERVAL seconds.
+    Every worker process starts one; the sweep lock lets only one of them sweep at a time.
+    """
+    _thread = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def start(cls):
+        with cls._lock:
+            if cls._thread is not None:
+                return
+            cls._thread = threading.Thread(target=cls._run, name="agent-checkpoint-sweeper", daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            time.sleep(settings.AGENT_CHECKPOINT_SWEEP_INTERVAL)
+            try:
+                with sweep_lock() as acquired:
+                    if not acquired:
+                        continue
+                    report = sweep_checkpoints(
+                        keep_last=settings.AGENT_CHECKPOINT_KEEP_LAST,
+                        ttl_days=settings.AGENT_CHECKPOINT_TTL_DAYS,
+                        batch_size=settings.AGENT_CHECKPOINT_SWEEP_BATCH,
+                    )
+                print(f"Checkpoint sweep: {report}")
+            except Exception as e:
+                print(f"Checkpoint sweep failed: {e}")
+            finally:
+                connection.close()
@@ -1,32 +1,84 @@
-from typing import Dict, List, Tuple, Any
+import json
+from typing import Dict, Iterator, List, Optional, Any
+
+from django.conf import settings
 
 from .vector_db import VectorDBConnection
 
 
+FETCH_FIELDS = ("documents", "metadatas", "embeddings")
+# Embeddings are the bulk of a collection and rarely what an inspection needs
+DEFAULT_FETCH_INCLUDE = ["documents", "metadatas"]
+# Key of the all-collections dump naming collections that failed mid-stream
+STREAM_ERRORS_KEY = "__errors__"
+
+
+def page_records(data: Dict[str, Any], include: List[str]) -> List[Dict[str, Any]]:
+    """Turns Chroma's column-oriented get() result into one dict per record."""
+    records = []
+    for index, doc_id in enumerate(data.get("ids") or []):
+        record = {"id": doc_id}
+        if "documents" in include:
+            record["text"] = data["documents"][index]
+        if "metadatas" in include:
+            record["metadata"] = data["metadatas"][index] or {}
+        if "embeddings" in include:
+            embedding = data["embeddings"][index]
+            record["embedding"] = embedding.tolist() if hasattr(embedding, "tolist") else embedding
+        records.append(record)
+    return records
+
+
 class ChromaDBFetcher:
     def __init__(self):
         self.chroma_client = VectorDBConnection.get_client()
 
-    def fetch_collection_data(self, collection_name: str) -> Dict[str, Any]:
+    def fetch_collection_page(
+            self, collection_name: str, offset: int = 0, limit: int = 100, include: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        include = DEFAULT_FETCH_INCLUDE if include is None else include
         collection = self.chroma_client.get_collection(name=collection_name)
-        data = collection.get()
-        return data
+        return page_records(collection.get(offset=offset, limit=limit, include=include), include)
 
-    def fetch_all_data_all_collections(self) -> List[Tuple[str, Dict[str, Any]]]:
-        collections = self.chroma_client.list_collections()
-        print(f"Найдено {len(collections)} коллекций в ChromaDB")
-        
-        results = []
-        for collection in collections:
+    def iter_collection(
+            self, collection_name: str, include: Optional[List[str]] = None, batch_size: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yields every record of a collection, reading `batch_size` records per request."""
+        batch_size = batch_size or settings.CHROMA_FETCH_BATCH_SIZE
+        offset = 0
+        while True:
+            records = self.fetch_collection_page(collection_name, offset, batch_size, include)
+            yield from records
+            if len(records) < batch_size:
+                return
+            offset += batch_size
+
+    def stream_all_collections(self, include: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        Streams {"<collection>": [records...], ...} as JSON text chunks, one Chroma page at a time,
+        so dumping every collection never holds more than a page in memory.
+
+        The 200 is sent before any page is read, so a collection that fails partway is reported in
+        the body instead: {STREAM_ERRORS_KEY: {"<collection>": "<error>"}} closes the object, and
+        the records of that collection sent before the error are incomplete.
+        """
+        errors = {}
+        separator = ""
+        yield "{"
+        for collection in self.chroma_client.list_collections():
+            name = collection.name if hasattr(collection, "name") else str(collection)
+            yield f"{separator}{json.dumps(name, ensure_ascii=False)}: ["
+            separator = ","
             try:
-                collection_name = collection.name
-                data = self.fetch_collection_data(collection_name)
-                results.append((collection_name, data))
-                print(f"Данные из коллекции '{collection_name}' успешно получены")
+                for position, record in enumerate(self.iter_collection(name, include)):
+                    yield f"{',' if position else ''}{json.dumps(record, ensure_ascii=False, default=str)}"
             except Exception as e:
-                print(f"Ошибка при получении данных из коллекции '{collection.name if hasattr(collection, 'name') else collection}': {str(e)}")
-        
-        return results
+                print(f"Ошибка при получении данных из коллекции '{name}': {e}")
+                errors[name] = str(e)
+            yield "]"
+        if errors:
+            yield f"{separator}{json.dumps(STREAM_ERRORS_KEY)}: {json.dumps(errors, ensure_ascii=False)}"
+        yield "}"
 
     def list_collections(self):
         collections = self.chroma_client.list_collections()
@@ -39,47 +91,24 @@ class ChromaDBFetcher:
 
     def count_records(self, collection_name):
         try:
-            collection = self.chroma_client.get_collection(collection_name)
-            record_count = len(collection.get()["ids"])
+            record_count = self.chroma_client.get_collection(collection_name).count()
             print(f"📊 Количество записей в '{collection_name}': {record_count}")
             return record_count
         except Exception as e:
             print(f"⚠️ Ошибка при получении данных из '{collection_name}': {e}")
             return 0
 
-    def fetch_all_data(self, collection_name):
+    def fetch_all_data(self, collection_name, include: Optional[List[str]] = None):
         try:
-            collection = self.chroma_client.get_collection(collection_name)
             print(f"🔄 Получаем все данные из коллекции '{collection_name}'...")
-            all_data = collection.get(include=["embeddings", "metadatas", "documents"])
-
-            if not all_data or not all_data.get("ids"):
+            documents = list(self.iter_collection(collection_name, include))
+            if not documents:
                 print("⚠️ В коллекции нет данных!")
                 return []
 
-            documents = []
-            for doc_id, doc_text, metadata, embedding in zip(
-                    all_data.get("ids", []),
-                    all_data.get("documents", []),
-                    all_data.get("metadatas", []),
-                    all_data.get("embeddings", [])
-            ):
-                if hasattr(embedding, "tolist"):
-                    embedding_conv = embedding.tolist()
-                else:
-                    embedding_conv = embedding
-
-                documents.append({
-                    "id": doc_id,
-                    "text": doc_text,
-                    "metadata": metadata or {},
-                    #"embeddings": embedding_conv
-                })
-
             print(f"✅ Получено {len(documents)} записей из коллекции '{collection_name}'!")
             return documents
 
         except Exception as e:
             print(f"⚠️ Ошибка при получении данных из '{collection_name}': {e}")
             return []
-
@@ -0,0 +1,96 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .chroma_loader import ChromaDBLoader
+from .models import ChromaLoadJob
+
+
+class LoadJobCancelled(Exception):
+    pass
+
+
+class ActiveLoadJobExists(Exception):
+    def __init__(self, job: ChromaLoadJob):
+        super().__init__(f"Collection '{job.collection}' already has an active load job {job.pk}")
+        self.job = job
+
+
+def expire_stale_jobs(collection: str) -> int:
+    """Fails active jobs whose runner stopped reporting (e.g. the process was restarted), releasing the collection."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CHROMA_JOB_STALE_SECONDS)
+    return ChromaLoadJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff),
+        collection=collection,
+        status__in=ChromaLoadJob.ACTIVE_STATUSES,
+    ).update(status="failed", error="Job stopped reporting progress", finished_at=timezone.now())
+
+
+def start_load_job(params: dict) -> ChromaLoadJob:
+    """Records a load job for `params` (ChromaDBLoader.load_data kwargs) and runs it on a daemon thread."""
+    collection = params["table"]
+    expire_stale_jobs(collection)
+    try:
+        with transaction.atomic():
+            job = ChromaLoadJob.objects.create(collection=collection, params=params)
+    except IntegrityError:
+        active = ChromaLoadJob.objects.filter(collection=collection, status__in=ChromaLoadJob.ACTIVE_STATUSES).first()
+        if active is None:
+            raise
+        raise ActiveLoadJobExists(active)
+
+    thread = threading.Thread(target=run_load_job, args=(job.pk,), name=f"chroma-load-{collection}", daemon=True)
+    transaction.on_commit(thread.start)
+    return job
+
+
+def cancel_load_job(job: ChromaLoadJob) -> bool:
+    """Asks a queued or running job to stop after its current batch; returns False if it already finished."""
+    return bool(
+        ChromaLoadJob.objects.filter(pk=job.pk, status__in=ChromaLoadJob.ACTIVE_STATUSES).update(cancel_requested=True)
+    )
+
+
+def run_load_job(job_id):
+    jobs = ChromaLoadJob.objects.filter(pk=job_id)
+    # A job expired as stale (see expire_stale_jobs) keeps its failed status if this runner resumes
+    running = jobs.filter(status="running")
+
+    def progress(counters: dict):
+        jobs.update(heartbeat_at=timezone.now(), **{key: value for key, value in counters.items() if value is not None})
+        if jobs.filter(cancel_requested=True).exists():
+            raise LoadJobCancelled()
+
+    try:
+        job = jobs.get()
+        now = timezone.now()
+        jobs.update(status="running", started_at=now, heartbeat_at=now)
+        if job.cancel_requested:
+            raise LoadJobCancelled()
+
+        report = ChromaDBLoader().load_data(**job.params, progress=progress)
+        running.update(status="succeeded", report=report, finished_at=timezone.now())
+    except LoadJobCancelled:
+        print(f"⏹️ Задача загрузки {job_id} отменена")
+        running.update(status="cancelled", finished_at=timezone.now())
+    except Exception as e:
+        print(f"❌ Задача загрузки {job_id} завершилась с ошибкой: {e}")
+        running.update(status="failed", error=str(e), finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def job_progress(job: ChromaLoadJob) -> dict:
+    """Throughput and ETA of a job, estimated from the rows read so far."""
+    if not job.started_at:
+        return {"rows_per_sec": None, "eta_seconds": None}
+    elapsed = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+    rate = job.rows_read / elapsed if elapsed > 0 and job.rows_read else None
+    eta = None
+    if job.status == "running" and rate and job.rows_total is not None:
+        eta = round(max(job.rows_total - job.rows_read, 0) / rate, 1)
+    return {"rows_per_sec": round(rate, 1) if rate else None, "eta_seconds": eta}
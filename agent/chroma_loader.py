@@ -1,54 +1,141 @@
+import hashlib
+import json
 from decimal import Decimal
-from typing import List, Optional, Dict
-import logging
+from typing import Callable, List, NamedTuple, Optional, Dict
 
 from django.db import connection
 from django.conf import settings
-from llama_index.core import Document
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from django.utils import timezone
 
+from .embedding_pipeline import EmbeddingPipeline
+from .embeddings import EmbeddingModelRegistry
+from .models import ChromaSyncState
 from .vector_db import VectorDBConnection
+from .vector_searcher import VectorSearcher
+
+
+class SyncDocument(NamedTuple):
+    id: str
+    text: str
+    metadata: dict
+    content_hash: str
+
+
+def build_document(
+        row: dict,
+        id_column: str,
+        text_columns: List[str],
+        metadata_columns: Optional[List[str]] = None,
+        column_names: Optional[Dict[str, str]] = None
+) -> SyncDocument:
+    texts = []
+    for col in text_columns:
+        value = row.get(col)
+        if value:
+            if column_names and col in column_names.keys():
+                if column_names[col] == "":
+                    texts.append(str(value))
+                else:
+                    texts.append(f"{column_names[col]}: {value}")
+            else:
+                texts.append(str(value))
+    text_content = "\n".join(texts).lower()
+
+    metadata = {}
+    if metadata_columns:
+        for col in metadata_columns:
+            value = row.get(col)
+            if isinstance(value, Decimal):
+                value = float(value)
+            metadata[col] = value
+    metadata["id"] = row.get(id_column)
+
+    # Unchanged rows hash the same and are not re-embedded by an incremental sync
+    payload = json.dumps([text_content, metadata], sort_keys=True, ensure_ascii=False, default=str)
+    content_hash = hashlib.sha1(payload.encode()).hexdigest()
+    return SyncDocument(str(row[id_column]), text_content, {**metadata, "content_hash": content_hash}, content_hash)
 
 
 class ChromaDBLoader:
     def __init__(self):
         self.chroma_client = VectorDBConnection.get_client()
-        
-        try:
-            self.embedding_model = HuggingFaceEmbedding(model_name=settings.EMBEDDING_MODEL)
-        except NotImplementedError as e:
-            if "Cannot copy out of meta tensor" in str(e):
-                import torch
-                from sentence_transformers import SentenceTransformer
-                
-                print("Using alternative model loading method for newer PyTorch versions")
-                model = SentenceTransformer(settings.EMBEDDING_MODEL)
-                if hasattr(model, "to_empty"):
-                    try:
-                        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-                        model = model.to_empty(device=device)
-                        model.eval()
-                        self.embedding_model = HuggingFaceEmbedding(model=model)
-                    except Exception as inner_e:
-                        print(f"Failed with to_empty() method: {inner_e}")
-                        with torch.no_grad():
-                            model = SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu")
-                            self.embedding_model = HuggingFaceEmbedding(model=model)
-                else:
-                    print("Model doesn't have to_empty() method, falling back to CPU")
-                    with torch.no_grad():
-                        model = SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu")
-                        self.embedding_model = HuggingFaceEmbedding(model=model)
-            else:
-                raise
+
+    @property
+    def embedding_model(self):
+        # Loaded on first use: with a process pool only the workers need the model
+        return EmbeddingModelRegistry.get_model()
+
+    def iter_rows(self, table_name: str, columns: List[str], batch_size: int, where: str = None, params=None):
+        """Yields lists of row dicts read through a server-side cursor, `batch_size` rows at a time."""
+        quote = connection.ops.quote_name
+        query = f"SELECT {', '.join(quote(col) for col in columns)} FROM {quote(table_name)}"
+        if where:
+            query += f" WHERE {where}"
+
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(query, params or [])
+            column_names = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if column_names is None:
+                    column_names = [col[0] for col in cursor.description]
+                yield [dict(zip(column_names, row)) for row in rows]
 
     def fetch_data(self, table_name: str, columns: List[str]):
-        with connection.cursor() as cursor:
-            query = f"SELECT {', '.join(columns)} FROM {table_name};"
-            cursor.execute(query)
-            column_names = [col[0] for col in cursor.description]
-            result = [dict(zip(column_names, row)) for row in cursor.fetchall()]
-            return result
+        return [row for rows in self.iter_rows(table_name, columns, settings.CHROMA_SYNC_BATCH_SIZE) for row in rows]
+
+    def collection_ids(self, collection, batch_size: int) -> set:
+        ids, offset = set(), 0
+        while True:
+            page = collection.get(include=[], limit=batch_size, offset=offset)["ids"]
+            ids.update(page)
+            if len(page) < batch_size:
+                return ids
+            offset += batch_size
+
+    def changed_documents(self, collection, documents: List[SyncDocument]) -> List[SyncDocument]:
+        existing = collection.get(ids=[doc.id for doc in documents], include=["metadatas"])
+        hashes = {
+            doc_id: (metadata or {}).get("content_hash")
+            for doc_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+        return [doc for doc in documents if hashes.get(doc.id) != doc.content_hash]
+
+    def upsert_documents(self, collection, documents: List[SyncDocument]):
+        embeddings = self.embedding_model._get_text_embeddings([doc.text for doc in documents])
+        collection.upsert(
+            ids=[doc.id for doc in documents],
+            documents=[doc.text for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+            embeddings=embeddings
+        )
+
+    def sync_ids(self, state: ChromaSyncState, ids) -> dict:
+        """Re-syncs just the given row ids of a collection synced before: upserts changed rows, deletes missing ones."""
+        ids = list(ids)
+        columns = list(dict.fromkeys([state.id_column, *state.text_columns, *state.metadata_columns]))
+        collection = self.chroma_client.get_or_create_collection(state.collection)
+        where = f"{connection.ops.quote_name(state.id_column)} = ANY(%s)"
+
+        documents = [
+            build_document(row, state.id_column, state.text_columns, state.metadata_columns, state.column_names)
+            for rows in self.iter_rows(state.sql_table, columns, settings.CHROMA_SYNC_BATCH_SIZE, where, [ids])
+            for row in rows
+        ]
+        changed = self.changed_documents(collection, documents) if documents else []
+        if changed:
+            self.upsert_documents(collection, changed)
+
+        found = {doc.id for doc in documents}
+        missing = [str(row_id) for row_id in ids if str(row_id) not in found]
+        if missing:
+            collection.delete(ids=missing)
+
+        if changed or missing:
+            VectorSearcher.invalidate(state.collection)
+        return {"upserted": len(changed), "deleted": len(missing)}
 
     def load_data(
             self,
@@ -57,66 +144,130 @@ class ChromaDBLoader:
             id_column: str,
             text_columns: List[str],
             metadata_columns: Optional[List[str]] = None,
-            column_names: Optional[Dict[str, str]] = None
-    ):
-        columns_set = {id_column}
-        columns_set.update(text_columns)
-        if metadata_columns:
-            columns_set.update(metadata_columns)
-        columns = list(columns_set)
-
-        print(f"🔄 Загружаем данные из таблицы '{sql_table}' для колонок: {columns} ...")
-        rows = self.fetch_data(sql_table, columns)
-        if not rows:
-            print(f"⚠️ Нет данных в таблице '{sql_table}'!")
-            return
-
-        print(f"✅ Найдено {len(rows)} записей из таблицы '{sql_table}'!")
-
-        documents = []
-        for row in rows:
-            doc_id = str(row[id_column])
-            texts = []
-            for col in text_columns:
-                value = row.get(col)
-                if value:
-                    if column_names and col in column_names.keys():
-                        if column_names[col] == "":
-                            texts.append(str(value))
-                        else:
-                            texts.append(f"{column_names[col]}: {value}")
-                    else:
-                        texts.append(str(value))
-            text_content = "\n".join(texts)
-
-            metadata = {}
-            if metadata_columns:
-                for col in metadata_columns:
-                    value = row.get(col)
-                    if isinstance(value, Decimal):
-                        value = float(value)
-                    metadata[col] = value
-            metadata["id"] = row.get(id_column)
-            documents.append(Document(doc_id=doc_id, text=text_content, metadata=metadata))
+            column_names: Optional[Dict[str, str]] = None,
+            mode: str = "incremental",
+            watermark_column: Optional[str] = None,
+            batch_size: Optional[int] = None,
+            embed_batch_size: Optional[int] = None,
+            workers: Optional[int] = None,
+            progress: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        """
+        Syncs a Chroma collection with a SQL table in batches. "incremental" embeds and upserts only
+        rows whose content hash changed and, when `watermark_column` is given, reads only rows past
+        the recorded high-water mark; "full" re-embeds every row. Both modes delete documents whose
+        rows are gone. Embedding and writing run in an EmbeddingPipeline alongside the reads.
+        `progress` is called after every batch with row counters, and periodically while the pipeline
+        drains and stale documents are deleted; an exception it raises aborts the sync.
+        """
+        batch_size = batch_size or settings.CHROMA_SYNC_BATCH_SIZE
+        incremental = mode == "incremental"
+        watermark_key = watermark_column or id_column
+
+        columns = list(dict.fromkeys([id_column, *text_columns, *(metadata_columns or []), watermark_key]))
+        state = ChromaSyncState.objects.filter(collection=table).first()
 
+        where, params = None, []
+        if (
+                incremental and watermark_column and state and state.high_water_mark
+                and state.sql_table == sql_table and state.watermark_column == watermark_column
+        ):
+            where, params = f"{connection.ops.quote_name(watermark_column)} > %s", [state.high_water_mark]
+
+        print(f"🔄 Синхронизируем '{sql_table}' -> '{table}' ({mode}) для колонок: {columns} ...")
         collection = self.chroma_client.get_or_create_collection(table)
+        report = {"collection": table, "mode": mode, "rows_read": 0, "rows_upserted": 0, "rows_unchanged": 0, "rows_deleted": 0}
+        seen_ids = set()
+        high_water_mark = None
+        pipeline = EmbeddingPipeline(collection, batch_size=embed_batch_size, workers=workers)
+
+        def report_progress(rows_total=None):
+            if progress:
+                progress({
+                    "rows_total": rows_total,
+                    "rows_read": report["rows_read"],
+                    "rows_embedded": pipeline.stats["embedded"],
+                    "rows_written": pipeline.stats["written"],
+                })
 
-        doc_texts = [doc.text.lower() for doc in documents]
         try:
-            embeddings = self.embedding_model._get_text_embeddings(doc_texts)
-            
-            ids = [doc.doc_id for doc in documents]
-            metadatas = [doc.metadata for doc in documents]
-            collection.add(
-                ids=ids,
-                documents=doc_texts,
-                metadatas=metadatas,
-                embeddings=embeddings
-            )
-
-            num_records = len(collection.get()["ids"])
-            print(f"📊 Записей в коллекции '{table}' ChromaDB: {num_records}")
-            print("✅ Данные успешно загружены, эмбеддинги вычислены и индексированы в ChromaDB!")
+            rows_total = None
+            if progress:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT count(*) FROM {connection.ops.quote_name(sql_table)}" + (f" WHERE {where}" if where else ""),
+                        params
+                    )
+                    rows_total = cursor.fetchone()[0]
+                report_progress(rows_total)
+
+            for rows in self.iter_rows(sql_table, columns, batch_size, where, params):
+                documents = [build_document(row, id_column, text_columns, metadata_columns, column_names) for row in rows]
+                report["rows_read"] += len(documents)
+                seen_ids.update(doc.id for doc in documents)
+
+                marks = [row[watermark_key] for row in rows if row[watermark_key] is not None]
+                if marks:
+                    high_water_mark = max([high_water_mark, *marks]) if high_water_mark is not None else max(marks)
+
+                changed = self.changed_documents(collection, documents) if incremental else documents
+                report["rows_unchanged"] += len(documents) - len(changed)
+                if changed:
+                    pipeline.submit(changed)
+                    report["rows_upserted"] += len(changed)
+                print(
+                    f"📦 '{table}': прочитано {report['rows_read']}, "
+                    f"эмбеддингов {pipeline.stats['embedded']}, записано {pipeline.stats['written']}"
+                )
+                report_progress(rows_total)
+
+            report["embedding"] = pipeline.close(on_wait=lambda: report_progress(rows_total))
+            report_progress(rows_total)
+
+            if where:
+                # Only rows past the mark were read; deletions need every current id
+                seen_ids = set()
+                for rows in self.iter_rows(sql_table, [id_column], batch_size):
+                    seen_ids.update(str(row[id_column]) for row in rows)
+                    report_progress(rows_total)
+            stale_ids = list(self.collection_ids(collection, batch_size) - seen_ids)
+            for start in range(0, len(stale_ids), batch_size):
+                collection.delete(ids=stale_ids[start:start + batch_size])
+                report_progress(rows_total)
+            report["rows_deleted"] = len(stale_ids)
         except Exception as e:
-            print(f"❌ Ошибка при создании эмбеддингов или добавлении в коллекцию: {e}")
-            raise
\ No newline at end of file
+            print(f"❌ Ошибка при синхронизации коллекции '{table}': {e}")
+            try:
+                pipeline.close()
+            except Exception:
+                pass
+            raise
+
+        if report["rows_upserted"] or report["rows_deleted"]:
+            VectorSearcher.invalidate(table)
+
+        if high_water_mark is None and state and where:
+            high_water_mark = state.high_water_mark
+        ChromaSyncState.objects.update_or_create(
+            collection=table,
+            defaults={
+                "sql_table": sql_table,
+                "id_column": id_column,
+                "text_columns": list(text_columns),
+                "metadata_columns": list(metadata_columns or []),
+                "column_names": dict(column_names or {}),
+                "watermark_column": watermark_column or "",
+                "high_water_mark": "" if high_water_mark is None else (
+                    high_water_mark.isoformat() if hasattr(high_water_mark, "isoformat") else str(high_water_mark)
+                ),
+                "rows_read": report["rows_read"],
+                "rows_upserted": report["rows_upserted"],
+                "rows_unchanged": report["rows_unchanged"],
+                "rows_deleted": report["rows_deleted"],
+                "synced_at": timezone.now(),
+            },
+        )
+
+        print(f"📊 Записей в коллекции '{table}' ChromaDB: {collection.count()}")
+        print(f"✅ Синхронизация завершена: {report}")
+        return report
@@ -0,0 +1,98 @@
+import ast
+import difflib
+import re
+import threading
+from typing import List
+
+from django.conf import settings
+
+from properties.cache import get_catalogue_version
+from properties.models import ResidentialComplex
+
+
+COMPLEX_NAMES_COLLECTION = "residential_complexes_names"
+# Shorter fragments ("ай", "сити") are contained in too many names to identify one
+MIN_CONTAINED_LENGTH = 4
+
+
+def normalize_name(name: str) -> str:
+    name = name.lower().replace("ё", "е")
+    name = re.sub(r"[«»\"'`“”„.,!?()\-–—]", " ", name)
+    name = re.sub(r"\b(жк|жилой комплекс|жилого комплекса|residential complex|rc)\b", " ", name)
+    return " ".join(name.split())
+
+
+class ComplexNameResolver:
+    """
+    Resolves a user-supplied residential complex name to complex ids without an LLM round trip:
+    exact and fuzzy matches against an in-memory name index first, then HybridRetriever (lexical
+    index fused with Chroma nearest neighbours). The LLM is only an opt-in reranker.
+    """
+    _names = {}
+    _version = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_name_index(cls) -> dict:
+        # The catalogue version is bumped on every ResidentialComplex save/delete
+        version = get_catalogue_version()
+        if cls._version != version:
+            with cls._lock:
+                if cls._version != version:
+                    names = {}
+                    for complex_id, name in ResidentialComplex.objects.values_list("id", "name"):
+                        names.setdefault(normalize_name(name), []).append(complex_id)
+                    cls._names, cls._version = names, version
+        return cls._names
+
+    @classmethod
+    def match_name(cls, query: str) -> List[int]:
+        names = cls._get_name_index()
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+
+        if normalized in names:
+            return names[normalized]
+
+        contained = [
+            name for name in names
+            if (len(name) >= MIN_CONTAINED_LENGTH and name in normalized)
+            or (len(normalized) >= MIN_CONTAINED_LENGTH and normalized in name)
+        ]
+        if len(contained) == 1:
+            return names[contained[0]]
+        if contained:
+            # Several complexes fit; hybrid retrieval ranks them instead of guessing here
+            return []
+
+        close = difflib.get_close_matches(normalized, names.keys(), n=1, cutoff=settings.AGENT_RESOLVER_FUZZY_CUTOFF)
+        return names[close[0]] if close else []
+
+    @classmethod
+    def llm_rerank(cls, query: str, top_k: int = 3) -> List[int]:
+        from .vector_searcher import VectorSearcher
+
+        response = VectorSearcher(collection_name=COMPLEX_NAMES_COLLECTION, top_k=top_k).search_vector(query)
+        print("raw_vector_res:", response.response)
+        return [int(complex_id) for complex_id in ast.literal_eval(response.response)]
+
+    @classmethod
+    def resolve(cls, query: str, top_k: int = 3) -> List[int]:
+        ids = cls.match_name(query)
+        if ids:
+            print(f"Complex '{query}' resolved by name index: {ids}")
+            return ids
+
+        from .hybrid_retriever import HybridRetriever
+
+        ids = [hit.id for hit in HybridRetriever.search(query, "complex", top_k)]
+        if len(ids) > 1 and settings.AGENT_RESOLVER_LLM_RERANK:
+            try:
+                reranked = [complex_id for complex_id in cls.llm_rerank(query, top_k) if complex_id in ids]
+                ids = reranked or ids
+            except Exception as e:
+                print(f"LLM rerank failed, keeping nearest neighbours: {e}")
+
+        print(f"Complex '{query}' resolved by hybrid retrieval: {ids}")
+        return ids
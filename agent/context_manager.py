@@ -0,0 +1,151 @@
+import json
+from typing import Any, Dict, List
+
+from django.conf import settings
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_openai import ChatOpenAI
+
+from agent.agent_state import AgentState
+from agent.transcript import aappend_transcript, append_transcript
+
+
+# AIMessages that carry a tool-like dump rather than an answer written for the user
+TOOL_OUTPUT_NAMES = {"query_real_estate_db"}
+TRIM_MARKER = "\n… [вывод инструмента сокращён]"
+
+SUMMARY_PROMPT = """
+Ты ведёшь краткое содержание диалога менеджера по недвижимости с клиентом.
+Обнови краткое содержание с учётом новых сообщений. Сохрани имя и контакты клиента, его
+критерии поиска, упомянутые ЖК, квартиры (property_id, complex_id) и договорённости.
+Пиши по существу, не более 200 слов, без вступлений.
+"""
+
+summary_llm = ChatOpenAI(model=settings.LLM_MODEL, temperature=0.0, api_key=settings.OPENAI_API_KEY)
+
+_encoding = None
+
+
+def count_tokens(messages: List[AnyMessage]) -> int:
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(settings.LLM_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"tiktoken unavailable, estimating tokens from length: {e}")
+            _encoding = False
+
+    total = 0
+    for message in messages:
+        text = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+        if getattr(message, "tool_calls", None):
+            text += json.dumps(message.tool_calls, ensure_ascii=False, default=str)
+        total += len(_encoding.encode(text)) if _encoding else len(text) // 4
+    return total
+
+
+def is_tool_output(message: AnyMessage) -> bool:
+    return isinstance(message, ToolMessage) or getattr(message, "name", None) in TOOL_OUTPUT_NAMES
+
+
+def plan_context(state: AgentState) -> Dict[str, Any]:
+    """
+    Decides which messages to drop (whole turns, oldest first, so tool calls stay paired with their
+    results) and which older tool outputs to shorten. The current turn is never touched.
+    """
+    messages = state["messages"]
+    turn_starts = [index for index, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    current_turn = turn_starts[-1] if turn_starts else len(messages)
+
+    cut = 0
+    if len(turn_starts) > settings.AGENT_CONTEXT_MAX_TURNS:
+        cut = turn_starts[-settings.AGENT_CONTEXT_KEEP_TURNS] if settings.AGENT_CONTEXT_KEEP_TURNS > 0 else current_turn
+
+    limit = settings.AGENT_CONTEXT_TOOL_OUTPUT_CHARS
+    trimmed = [
+        message.model_copy(update={"content": message.content[:limit] + TRIM_MARKER})
+        for message in messages[cut:current_turn]
+        if is_tool_output(message) and isinstance(message.content, str)
+        and len(message.content) > limit and not message.content.endswith(TRIM_MARKER)
+    ]
+    return {"dropped": messages[:cut], "trimmed": trimmed}
+
+
+def summary_request(summary: str, dropped: List[AnyMessage]) -> list:
+    lines = [
+        f"{message.type}: {message.content[:settings.AGENT_CONTEXT_TOOL_OUTPUT_CHARS] if isinstance(message.content, str) else message.content}"
+        for message in dropped
+        if message.content
+    ]
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Текущее краткое содержание: {summary or 'нет'}\n\nНовые сообщения:\n" + "\n".join(lines)},
+    ]
+
+
+def context_update(state: AgentState, plan: Dict[str, Any], summary: str) -> Dict[str, Any]:
+    messages = state["messages"]
+    dropped, trimmed = plan["dropped"], plan["trimmed"]
+    trimmed_by_id = {message.id: message for message in trimmed}
+
+    before = count_tokens(messages)
+    after = count_tokens([trimmed_by_id.get(message.id, message) for message in messages[len(dropped):]])
+    summary_tokens = count_tokens([HumanMessage(content=summary)]) if summary else 0
+    previous_summary_tokens = count_tokens([HumanMessage(content=state["summary"])]) if state.get("summary") else 0
+
+    stats = dict(state.get("context_stats") or {})
+    # Tokens taken out of the history for good; every later prompt is smaller by this much
+    removed = stats.get("tokens_removed", 0) + before - after
+    stats.update({
+        "turn_tokens_removed": before - after,
+        "tokens_removed": removed,
+        "prompt_tokens": after + summary_tokens,
+        "tokens_saved": removed - summary_tokens,
+        "summary_tokens_delta": summary_tokens - previous_summary_tokens,
+        "messages_kept": len(messages) - len(dropped),
+    })
+    print(f"Context manager: {stats}")
+
+    return {
+        "messages": [RemoveMessage(id=message.id) for message in dropped] + trimmed,
+        "summary": summary,
+        "context_stats": stats,
+    }
+
+
+def user_turn_entries(state: AgentState) -> list:
+    # The context manager is the entry node, so the last message is the user's new one
+    last_message = state["messages"][-1] if state["messages"] else None
+    if isinstance(last_message, HumanMessage):
+        return [("human", last_message.content, "")]
+    return []
+
+
+def manage_context(state: AgentState) -> Dict[str, Any]:
+    append_transcript(state.get("thread_id"), user_turn_entries(state))
+    plan = plan_context(state)
+    summary = state.get("summary", "")
+    if plan["dropped"] and settings.AGENT_CONTEXT_SUMMARY:
+        try:
+            summary = summary_llm.invoke(summary_request(summary, plan["dropped"])).content
+        except Exception as e:
+            # Better to send a longer prompt than to forget the dropped turns
+            print(f"Conversation summary failed, keeping history: {e}")
+            plan["dropped"] = []
+    return context_update(state, plan, summary)
+
+
+async def amanage_context(state: AgentState) -> Dict[str, Any]:
+    await aappend_transcript(state.get("thread_id"), user_turn_entries(state))
+    plan = plan_context(state)
+    summary = state.get("summary", "")
+    if plan["dropped"] and settings.AGENT_CONTEXT_SUMMARY:
+        try:
+            summary = (await summary_llm.ainvoke(summary_request(summary, plan["dropped"]))).content
+        except Exception as e:
+            print(f"Conversation summary failed, keeping history: {e}")
+            plan["dropped"] = []
+    return context_update(state, plan, summary)
@@ -1,8 +1,9 @@
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import ToolMessage
+from langchain_core.messages import SystemMessage, ToolMessage
 from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 
 from agent.agent_state import AgentState
+from agent.transcript import aappend_transcript, append_transcript
 
 
 class Assistant:
@@ -10,33 +11,78 @@ class Assistant:
         self.runnable = runnable
         self.append_tool_message = append_tool_message
 
+    def _prepare_state(self, state: AgentState, config: RunnableConfig) -> dict:
+        thread_id = config.get("thread_id", None)
+        state = {**state, "user_info": thread_id}
+
+        last_message = state["messages"][-1]
+        if hasattr(last_message, "tool_calls") and self.append_tool_message:
+            tool_call_id = last_message.tool_calls[0]["id"]
+            tool_message = ToolMessage(
+                content="Entering specialized agent.", tool_call_id=tool_call_id
+            )
+            state["messages"].append(tool_message)
+        return state
+
+    @staticmethod
+    def _with_summary(state: AgentState) -> dict:
+        # Turns dropped by the context manager reach the LLM only through their summary
+        if not state.get("summary"):
+            return state
+        summary = SystemMessage(content=f"Краткое содержание предыдущей части диалога: {state['summary']}")
+        return {**state, "messages": [summary] + list(state["messages"])}
+
+    @staticmethod
+    def _transcript_args(result, config: RunnableConfig) -> tuple:
+        thread_id = config.get("configurable", {}).get("thread_id")
+        node = config.get("metadata", {}).get("langgraph_node", "")
+        return thread_id, [("ai", result.content, node)]
+
+    @staticmethod
+    def _is_empty(result) -> bool:
+        return not result.tool_calls and (
+                not result.content
+                or isinstance(result.content, list)
+                and not result.content[0].get("text")
+        )
+
+    @staticmethod
+    def _retry_state(state: dict) -> dict:
+        messages = state["messages"] + [("user", "Давай только реальные и фактические ответы.")]
+        return {**state, "messages": messages}
+
     def __call__(self, state: AgentState, config: RunnableConfig):
+        state = self._with_summary(state)
         while True:
-            thread_id = config.get("thread_id", None)
-            state = {**state, "user_info": thread_id}
+            state = self._prepare_state(state, config)
+            result = self.runnable.invoke(state)
 
-            last_message = state["messages"][-1]
-            if hasattr(last_message, "tool_calls") and self.append_tool_message:
-                tool_call_id = last_message.tool_calls[0]["id"]
-                tool_message = ToolMessage(
-                    content="Entering specialized agent.", tool_call_id=tool_call_id
-                )
-                state["messages"].append(tool_message)
+            if self._is_empty(result):
+                state = self._retry_state(state)
+            else:
+                break
 
-            result = self.runnable.invoke(state)
+        append_transcript(*self._transcript_args(result, config))
+        return {"messages": result}
 
-            if not result.tool_calls and (
-                    not result.content
-                    or isinstance(result.content, list)
-                    and not result.content[0].get("text")
-            ):
-                messages = state["messages"] + [("user", "Давай только реальные и фактические ответы.")]
-                state = {**state, "messages": messages}
+    async def acall(self, state: AgentState, config: RunnableConfig):
+        state = self._with_summary(state)
+        while True:
+            state = self._prepare_state(state, config)
+            result = await self.runnable.ainvoke(state)
+
+            if self._is_empty(result):
+                state = self._retry_state(state)
             else:
                 break
 
+        await aappend_transcript(*self._transcript_args(result, config))
         return {"messages": result}
 
+    def as_node(self) -> Runnable:
+        """Node usable by both the sync and the async (astream/ainvoke) graph."""
+        return RunnableLambda(self.__call__, afunc=self.acall)
+
 
 def back_to_main(state: AgentState) -> dict:
     last_tool_call = state["messages"][-1].tool_calls[0]
@@ -1,127 +1,44 @@
 from typing import Dict, Any
 from langchain.schema import AIMessage
-from django.db.models import Q
 from properties.models import Property
 from agent.agent_state import AgentState
+from agent.criteria_evaluator import evaluate_criteria, relaxation_suggestions
+from agent.tools_manager import to_coroutine
+
+
+def build_no_results_message(evaluation: Dict[str, Any]) -> str:
+    lines = ["Извините, по вашим критериям объекты не найдены."]
+
+    first_empty = evaluation["first_empty"]
+    if first_empty:
+        if first_empty["only"] == 0:
+            lines.append(f"Нет ни одного объекта с критерием «{first_empty['label']}».")
+        else:
+            lines.append(f"Объекты заканчиваются на критерии «{first_empty['label']}».")
+
+    suggestions = relaxation_suggestions(evaluation)
+    for item in suggestions:
+        lines.append(f"Если убрать критерий «{item['label']}», будет найдено объектов: {item['without']}.")
+    if not suggestions and evaluation["criteria"]:
+        lines.append("Попробуйте изменить сразу несколько критериев.")
+
+    return "\n".join(lines)
 
 
 def query_real_estate_db(state: AgentState) -> Dict[str, Any]:
     search_criteria = state.get("search_criteria", {})
     
     try:
-        query = Property.objects.all().select_related(
+        available = Property.objects.filter(is_available=True)
+        evaluation = evaluate_criteria(available, search_criteria)
+        total = evaluation["matched"]
+        query = available.filter(evaluation["filter"]).select_related(
             'block', 'block__complex', 'block__complex__district'
         )
-        
-        query = query.exclude(
-            property_purchases__status__in=['RESERVED', 'PAID', 'COMPLETED']
-        )
-
-        # Floor range filters
-        if search_criteria.get("min_floor") is not None:
-            q = query.filter(floor__gte=search_criteria["min_floor"])
-            if not q.exists():
-                search_criteria.pop("min_floor", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов выше этажа "
-                    f"{search_criteria.get('min_floor')}"  
-                    ". Уберите или измените этот критерий."
-                ))]}
-            query = q
-
-
-        if search_criteria.get("max_floor") is not None:
-            q = query.filter(floor__lte=search_criteria["max_floor"])
-            if not q.exists():
-                search_criteria.pop("max_floor", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов ниже этажа "
-                    f"{search_criteria.get('max_floor')}"  
-                    ". Уберите или измените этот критерий."
-                ))]}
-            query = q
-
-        # Area range filters
-        if search_criteria.get("min_area") is not None:
-            q = query.filter(area__gte=search_criteria["min_area"])
-            if not q.exists():
-                search_criteria.pop("min_area", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов с площадью от "
-                    f"{search_criteria.get('min_area')}"  
-                    " кв.м. Уберите или измените этот критерий."
-                ))]}
-            query = q
-            
-        if search_criteria.get("max_area") is not None:
-            q = query.filter(area__lte=search_criteria["max_area"])
-            if not q.exists():
-                search_criteria.pop("max_area", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов с площадью до "
-                    f"{search_criteria.get('max_area')}"  
-                    " кв.м. Уберите или измените этот критерий."
-                ))]}
-            query = q
-
-        # Room count filters
-        if search_criteria.get("min_rooms") is not None:
-            q = query.filter(rooms__gte=search_criteria["min_rooms"])
-            if not q.exists():
-                search_criteria.pop("min_rooms", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов с минимумом "
-                    f"{search_criteria.get('min_rooms')}"  
-                    " комнат. Уберите или измените этот критерий."
-                ))]}
-            query = q
-            
-        if search_criteria.get("max_rooms") is not None:
-            q = query.filter(rooms__lte=search_criteria["max_rooms"])
-            if not q.exists():
-                search_criteria.pop("max_rooms", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов с максимумом "
-                    f"{search_criteria.get('max_rooms')}"  
-                    " комнат. Уберите или измените этот критерий."
-                ))]}
-            query = q
-
-        # Price range filters
-        if search_criteria.get("min_price") is not None:
-            q = query.filter(price__gte=search_criteria["min_price"])
-            if not q.exists():
-                search_criteria.pop("min_price", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов с ценой от "
-                    f"{search_criteria.get('min_price')}"  
-                    " тг. Уберите или измените этот критерий."
-                ))]}
-            query = q
-            
-        if search_criteria.get("max_price") is not None:
-            q = query.filter(price__lte=search_criteria["max_price"])
-            if not q.exists():
-                search_criteria.pop("max_price", None)
-                state["search_criteria"] = search_criteria
-                return {"messages": [AIMessage(content=(
-                    "Извините, не найдено объектов с ценой до "
-                    f"{search_criteria.get('max_price')}" 
-                    " тг. Уберите или измените этот критерий."
-                ))]}
-            query = q
 
         # Final result compilation
-        total = query.count()
         if total == 0:
-            messages_content = "Извините, по вашим критериям объекты не найдены."
+            messages_content = build_no_results_message(evaluation)
         else:
             limit = 5 if total > 5 else total
             results = query[:limit]
@@ -150,4 +67,9 @@ def query_real_estate_db(state: AgentState) -> Dict[str, Any]:
     except Exception as e:
         messages_content = f"Произошла ошибка при поиске объектов: {str(e)}"
 
-    return {"messages": [AIMessage(content=messages_content)]}
+    # The name lets the context manager treat this dump like a tool output
+    return {"messages": [AIMessage(content=messages_content, name="query_real_estate_db")]}
+
+
+async def aquery_real_estate_db(state: AgentState) -> Dict[str, Any]:
+    return await to_coroutine(query_real_estate_db)(state)
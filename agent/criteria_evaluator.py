@@ -0,0 +1,85 @@
+from typing import Any, Dict, List
+
+from django.db.models import Count, Q
+
+
+# Order matters: prefix counts follow the order the criteria are applied in
+CRITERIA = [
+    ("min_floor", "floor__gte", "этаж от {}"),
+    ("max_floor", "floor__lte", "этаж до {}"),
+    ("min_area", "area__gte", "площадь от {} кв.м."),
+    ("max_area", "area__lte", "площадь до {} кв.м."),
+    ("min_rooms", "rooms__gte", "комнат от {}"),
+    ("max_rooms", "rooms__lte", "комнат до {}"),
+    ("min_price", "price__gte", "цена от {} тг"),
+    ("max_price", "price__lte", "цена до {} тг"),
+]
+
+
+def active_criteria(search_criteria: Dict[str, Any]) -> List[tuple]:
+    return [
+        (key, Q(**{lookup: search_criteria[key]}), label.format(search_criteria[key]))
+        for key, lookup, label in CRITERIA
+        if search_criteria.get(key) is not None
+    ]
+
+
+def criteria_filter(search_criteria: Dict[str, Any]) -> Q:
+    condition = Q()
+    for _, q, _ in active_criteria(search_criteria):
+        condition &= q
+    return condition
+
+
+def _count(condition: Q) -> Count:
+    return Count("id", filter=condition) if condition else Count("id")
+
+
+def evaluate_criteria(queryset, search_criteria: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Counts in one aggregate query how many rows match every criteria prefix, each criterion
+    on its own and every criteria set with one criterion left out.
+    """
+    criteria = active_criteria(search_criteria)
+    aggregates = {"total": Count("id")}
+
+    prefix = Q()
+    for key, q, _ in criteria:
+        prefix &= q
+        aggregates[f"prefix__{key}"] = _count(prefix)
+        aggregates[f"only__{key}"] = _count(q)
+
+        without = Q()
+        for other_key, other_q, _ in criteria:
+            if other_key != key:
+                without &= other_q
+        aggregates[f"without__{key}"] = _count(without)
+
+    counts = queryset.aggregate(**aggregates)
+
+    evaluation = {
+        "total": counts["total"],
+        "matched": counts[f"prefix__{criteria[-1][0]}"] if criteria else counts["total"],
+        "filter": prefix,
+        "criteria": [],
+        "first_empty": None,
+    }
+    for key, _, label in criteria:
+        item = {
+            "key": key,
+            "label": label,
+            "prefix": counts[f"prefix__{key}"],
+            "only": counts[f"only__{key}"],
+            "without": counts[f"without__{key}"],
+        }
+        evaluation["criteria"].append(item)
+        if item["prefix"] == 0 and evaluation["first_empty"] is None:
+            evaluation["first_empty"] = item
+    return evaluation
+
+
+def relaxation_suggestions(evaluation: Dict[str, Any], limit: int = 3) -> List[Dict[str, Any]]:
+    """Criteria whose removal unlocks results, the most productive first."""
+    suggestions = [item for item in evaluation["criteria"] if item["without"] > 0]
+    suggestions.sort(key=lambda item: item["without"], reverse=True)
+    return suggestions[:limit]
@@ -0,0 +1,196 @@
+import json
+import re
+from typing import Any, Dict, Tuple
+
+
+# Word forms that carry the number of rooms on their own
+ROOM_WORDS = [
+    (r"однокомнатн\w*|однушк\w*|бір\s+бөлмелі\w*", "1 комнат"),
+    (r"двухкомнатн\w*|двушк\w*|екі\s+бөлмелі\w*", "2 комнат"),
+    (r"тр[её]хкомнатн\w*|тр[её]шк\w*|үш\s+бөлмелі\w*", "3 комнат"),
+    (r"четыр[её]хкомнатн\w*|төрт\s+бөлмелі\w*", "4 комнат"),
+]
+
+# Phrases the rules cannot express; these messages always go to the LLM
+UNSUPPORTED = re.compile(
+    r"около|примерно|приблизительно|где-то|в районе|кроме|не перв|не последн|не на |"
+    r"за\s*(?:м2|м²|кв|квадрат|метр)|в месяц|аренд|"
+    r"about|around|approx|roughly|except|not on|not the|per\s*(?:sq|m2|m²|met)|rent|"
+    r"шамамен|басқа|"
+    # Prices are tenge; any other currency needs conversion
+    r"доллар\w*|долл\.?|бакс\w*|\$|usd|dollars?|евро|€|eur\b|euros?|руб\w*|₽|rub\b|рубл\w*|юан\w*|cny"
+)
+
+# Height of the building ("дом 12 этажей", "ЖК на 5 этажей", "9-этажный", "пятиэтажка", "12-storey"),
+# not the floor of the apartment; only a range ("от 3 до 9 этажей") reads as apartment floors
+BUILDING_HEIGHT = re.compile(
+    r"этажн\w*|этажк\w*|storey\w*|stor(?:y|ies)\b|қабатты\w*|"
+    r"(?<!от )(?<!до )(?<!с )(?<!по )(?<!from )(?<!to )\b\d+\s*(?:этажей|floors\b)"
+)
+
+# Negated comparisons the rules understand; the direction is flipped ("не больше" is a maximum)
+NEGATED_MIN = r"не менее|не меньше|не ниже|не дешевле|no less than|not less than|no fewer than|not fewer than"
+NEGATED_MAX = r"не более|не больше|не выше|не дороже|no more than|not more than"
+# Any other negation ("1 этаж не подходит", "not on the ground floor") goes to the LLM
+NEGATION = re.compile(r"(?<![а-яa-z])(?:не|нет|без|not|no|never|емес|жоқ)(?![а-яa-z])")
+
+NUM = r"\d+(?:\.\d+)?"
+MULT = r"млрд|миллиард\w*|billion|bn|млн|миллион\w*|million|mln|тыс\.?|тысяч\w*|thousand|k\b|мың"
+CURRENCY = r"тг\.?|тенге|теңге\w*|₸|kzt|tenge"
+ROOMS = r"комнат\w*|комн\.?|к(?![а-яё])|rooms?\b|bedrooms?\b|br\b|бөлме\w*"
+AREA = r"м2|м²|кв\.?\s?м\.?|квадрат\w*|sq\.?\s?m\w*|m2|m²|square\s+met\w+|шаршы\s+метр\w*"
+FLOOR = r"этаж\w*|эт\.|floors?\b|қабат\w*"
+MIN_PRE = (
+    rf"{NEGATED_MIN}|минимум|больше|более|выше|свыше|дороже|от|с|at least|more than|starting from|from|over|above|"
+    r"min\.?|кемінде"
+)
+MAX_PRE = rf"{NEGATED_MAX}|максимум|меньше|менее|ниже|дешевле|до|up to|less than|under|below|within|max\.?|ең көбі"
+RANGE_PRE = r"between|между"
+MIN_POST = r"и выше|и больше|и более|\+|or more|and more|and above|or higher|бастап|жоғары|артық"
+MAX_POST = r"и ниже|и меньше|и менее|or less|and below|or lower|дейін|төмен"
+RANGE_SEP = r"-|–|—|до|по|to|and|и"
+
+QUANTITY = re.compile(
+    rf"(?:(?P<min_pre>{MIN_PRE})|(?P<max_pre>{MAX_PRE})|(?P<range_pre>{RANGE_PRE}))?\s*"
+    rf"(?P<a>{NUM})\s*(?:-?х\s*)?(?P<a_mult>{MULT})?\s*"
+    rf"(?:(?:{RANGE_SEP})\s*(?P<b>{NUM})\s*(?:-?х\s*)?)?"
+    rf"(?P<mult>{MULT})?\s*(?P<currency>{CURRENCY})?\s*-?\s*"
+    rf"(?:(?P<rooms>{ROOMS})|(?P<area>{AREA})|(?P<floor>{FLOOR}))?\s*"
+    rf"(?P<currency_post>{CURRENCY})?\s*"
+    rf"(?:(?P<min_post>{MIN_POST})|(?P<max_post>{MAX_POST}))?",
+)
+
+MULTIPLIERS = [
+    (r"млрд|миллиард|billion|bn", 1_000_000_000),
+    (r"млн|миллион|million|mln", 1_000_000),
+    (r"тыс|тысяч|thousand|k|мың", 1_000),
+]
+
+
+def normalize_text(text: str) -> str:
+    text = text.lower().replace("ё", "е").replace(" ", " ")
+    # "40 000 000" -> "40000000", "2,5" -> "2.5"
+    text = re.sub(r"(?<=\d)[ ](?=\d{3}\b)", "", text)
+    text = re.sub(r"(?<=\d),(?=\d)", ".", text)
+    for pattern, replacement in ROOM_WORDS:
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def _multiplier(word: str) -> int:
+    if not word:
+        return 1
+    for pattern, value in MULTIPLIERS:
+        if re.match(pattern, word):
+            return value
+    return 1
+
+
+def _apply(criteria: Dict[str, Any], field: str, low, high) -> bool:
+    cast = int if field in ("rooms", "floor") else float
+    if low is not None:
+        if f"min_{field}" in criteria and criteria[f"min_{field}"] != cast(low):
+            return False
+        criteria[f"min_{field}"] = cast(low)
+    if high is not None:
+        if f"max_{field}" in criteria and criteria[f"max_{field}"] != cast(high):
+            return False
+        criteria[f"max_{field}"] = cast(high)
+    return True
+
+
+def parse_search_criteria(text: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Extracts SearchCriteriaObject fields from simple Russian, Kazakh and English messages.
+    Returns the criteria and whether the whole message was understood; callers should
+    fall back to the LLM when it was not.
+    """
+    normalized = normalize_text(text)
+    if UNSUPPORTED.search(normalized) or BUILDING_HEIGHT.search(normalized):
+        return {}, False
+    if NEGATION.search(re.sub(rf"{NEGATED_MIN}|{NEGATED_MAX}", " ", normalized)):
+        return {}, False
+
+    criteria = {}
+    leftover = normalized
+    for match in QUANTITY.finditer(normalized):
+        groups = match.groupdict()
+        a = float(groups["a"])
+        b = float(groups["b"]) if groups["b"] else None
+
+        mult = _multiplier(groups["mult"])
+        a_mult = _multiplier(groups["a_mult"]) if groups["a_mult"] else mult
+        a, b = a * a_mult, (b * mult if b is not None else None)
+
+        if groups["rooms"]:
+            field = "rooms"
+        elif groups["area"]:
+            field = "area"
+        elif groups["floor"]:
+            field = "floor"
+        elif groups["mult"] or groups["a_mult"] or groups["currency"] or groups["currency_post"] or a >= 100_000:
+            field = "price"
+        else:
+            return {}, False
+
+        if b is not None:
+            if b < a:
+                return {}, False
+            low, high = a, b
+        elif groups["min_pre"] or groups["min_post"]:
+            low, high = a, None
+        elif groups["max_pre"] or groups["max_post"]:
+            low, high = None, a
+        elif field in ("rooms", "floor"):
+            low, high = a, a
+        elif field == "price":
+            # A bare amount is the budget
+            low, high = None, a
+        else:
+            return {}, False
+
+        if field in ("rooms", "floor") and (a != int(a) or (b is not None and b != int(b))):
+            return {}, False
+        if not _apply(criteria, field, low, high):
+            return {}, False
+
+        leftover = leftover.replace(match.group(0).strip(), " ", 1)
+
+    if not criteria or re.search(r"\d", leftover):
+        return {}, False
+    for field in ("floor", "area", "rooms", "price"):
+        low, high = criteria.get(f"min_{field}"), criteria.get(f"max_{field}")
+        if low is not None and high is not None and low > high:
+            return {}, False
+    return criteria, True
+
+
+def evaluate_corpus(path) -> Dict[str, Any]:
+    """
+    Runs the parser over a labeled corpus. An item with "expected": null must be left to the LLM.
+    precision: share of confident parses that match their label;
+    coverage: share of messages answered without an LLM call.
+    """
+    with open(path, encoding="utf-8") as corpus_file:
+        corpus = json.load(corpus_file)
+
+    confident = correct = 0
+    mistakes = []
+    for item in corpus:
+        criteria, is_confident = parse_search_criteria(item["text"])
+        if not is_confident:
+            continue
+        confident += 1
+        if criteria == item["expected"]:
+            correct += 1
+        else:
+            mistakes.append({"text": item["text"], "expected": item["expected"], "parsed": criteria})
+
+    return {
+        "total": len(corpus),
+        "confident": confident,
+        "correct": correct,
+        "precision": correct / confident if confident else 1.0,
+        "coverage": confident / len(corpus) if corpus else 0.0,
+        "mistakes": mistakes,
+    }
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, kind: str, text: str) -> bytes:
+    # Query and document embeddings can differ (instruction prefixes), so the kind is part of the key
+    return hashlib.sha1(f"{model_name}\0{kind}\0{normalize_text(text)}".encode()).digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache in a SQLite file, shared by every thread and process that
+    embeds with the same model. Vectors are stored as packed float32; entries past
+    EMBEDDING_CACHE_MAX_ENTRIES are evicted least recently used first.
+    """
+    _local = threading.local()
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+    _writes_since_eviction = 0
+
+    @classmethod
+    def path(cls) -> str:
+        return settings.EMBEDDING_CACHE_PATH or os.path.join(settings.CHROMA_DB_PATH or ".", "embedding_cache.sqlite3")
+
+    @classmethod
+    def _connection(cls) -> sqlite3.Connection:
+        connection = getattr(cls._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(cls.path())), exist_ok=True)
+            connection = sqlite3.connect(cls.path(), timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key BLOB PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            cls._local.connection = connection
+        return connection
+
+    @classmethod
+    def get_many(cls, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        if not keys:
+            return {}
+        connection = cls._connection()
+        found = {}
+        # SQLite caps bound parameters per statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk).fetchall()
+            found.update((key, array("f", vector).tolist()) for key, vector in rows)
+            if rows:
+                connection.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({', '.join('?' * len(rows))})",
+                    [time.time(), *(key for key, _ in rows)]
+                )
+        with cls._lock:
+            cls._stats["hits"] += len(found)
+            cls._stats["misses"] += len(keys) - len(found)
+        return found
+
+    @classmethod
+    def put_many(cls, model_name: str, items: Dict[bytes, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        cls._connection().executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+            [(key, model_name, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        )
+        with cls._lock:
+            cls._stats["writes"] += len(items)
+            cls._writes_since_eviction += len(items)
+            evict = cls._writes_since_eviction >= settings.EMBEDDING_CACHE_EVICT_EVERY
+            if evict:
+                cls._writes_since_eviction = 0
+        if evict:
+            cls.evict()
+
+    @classmethod
+    def evict(cls, max_entries: Optional[int] = None) -> int:
+        max_entries = settings.EMBEDDING_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        connection = cls._connection()
+        (count,) = connection.execute("SELECT count(*) FROM embeddings").fetchone()
+        excess = count - max_entries
+        if excess <= 0:
+            return 0
+        connection.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            [excess]
+        )
+        with cls._lock:
+            cls._stats["evictions"] += excess
+        return excess
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            stats = dict(cls._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        try:
+            (stats["entries"],) = cls._connection().execute("SELECT count(*) FROM embeddings").fetchone()
+        except Exception as e:
+            stats["error"] = str(e)
+        stats["path"] = cls.path()
+        stats["max_entries"] = settings.EMBEDDING_CACHE_MAX_ENTRIES
+        return stats
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Wraps an embedding model so each distinct text is embedded once and then read from EmbeddingCache."""
+    _embedding: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, embedding: BaseEmbedding, model_name: str = None, **kwargs):
+        super().__init__(
+            model_name=model_name or embedding.model_name, embed_batch_size=embedding.embed_batch_size, **kwargs
+        )
+        self._embedding = embedding
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _cached(self, kind: str, texts: List[str], embed) -> List[List[float]]:
+        keys = [cache_key(self.model_name, kind, text) for text in texts]
+        try:
+            found = EmbeddingCache.get_many(list(dict.fromkeys(keys)))
+        except Exception as e:
+            print(f"Embedding cache unavailable: {e}")
+            return embed(texts)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            computed = dict(zip(missing, embed(list(missing.values()))))
+            try:
+                EmbeddingCache.put_many(self.model_name, computed)
+            except Exception as e:
+                print(f"Failed to write embedding cache: {e}")
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._cached("query", [query], lambda texts: [self._embedding._get_query_embedding(texts[0])])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cached("text", texts, self._embedding._get_text_embeddings)
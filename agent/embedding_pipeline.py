@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+from django.conf import settings
+
+from .embeddings import EmbeddingModelRegistry, cached_embedding_model
+
+
+_DONE = object()
+
+# Set in each pool process by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_model
+    import django
+    import torch
+
+    # Spawned processes inherit DJANGO_SETTINGS_MODULE but not the configured settings
+    django.setup()
+
+    # Each process gets its share of the cores instead of every process using all of them
+    torch.set_num_threads(threads)
+    _worker_model = cached_embedding_model(model_name)
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_model._get_text_embeddings(texts)
+
+
+class EmbeddingPipeline:
+    """
+    Embeds and writes documents in stages that run side by side:
+    reader (the caller, via submit) -> embedder thread -> writer thread -> Chroma upsert.
+
+    The queues between stages are bounded, so a slow embedder blocks submit() and a slow writer
+    blocks the embedder; memory stays at a few batches whatever the table size. With more than one
+    worker the embedder keeps batches in flight on a process pool, each process holding its own model.
+    """
+
+    def __init__(self, collection, batch_size: Optional[int] = None, workers: Optional[int] = None, model_name: str = None):
+        self.collection = collection
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.workers = settings.EMBEDDING_WORKERS if workers is None else workers
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.stats = {"submitted": 0, "embedded": 0, "written": 0, "embed_seconds": 0.0, "write_seconds": 0.0}
+
+        self._buffer = []
+        self._error = None
+        self._started = time.time()
+        self._embed_queue = queue.Queue(maxsize=settings.EMBEDDING_QUEUE_SIZE)
+        self._write_queue = queue.Queue(maxsize=settings.EMBEDDING_QUEUE_SIZE)
+
+        self._executor = None
+        if self.workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, threads),
+            )
+        self._max_in_flight = max(1, self.workers * 2)
+
+        self._embedder = threading.Thread(target=self._embed_loop, name="chroma-embedder", daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name="chroma-writer", daemon=True)
+        self._embedder.start()
+        self._writer.start()
+
+    def submit(self, documents):
+        """Queues SyncDocuments for embedding; blocks while the later stages are saturated."""
+        self._raise_error()
+        self._buffer.extend(documents)
+        self.stats["submitted"] += len(documents)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._embed_queue.put(batch)
+
+    def close(self, on_wait: Optional[Callable[[], None]] = None, wait_interval: float = 10.0) -> dict:
+        """
+        Flushes what is left, waits for every stage and returns the throughput stats. `on_wait` is
+        called every `wait_interval` seconds while the stages drain; an exception it raises is
+        re-raised only once the pipeline has stopped.
+        """
+        wait_error = None
+        try:
+            if self._buffer:
+                self._embed_queue.put(self._buffer)
+                self._buffer = []
+        finally:
+            self._embed_queue.put(_DONE)
+            for thread in (self._embedder, self._writer):
+                thread.join(wait_interval if on_wait else None)
+                while thread.is_alive():
+                    if wait_error is None:
+                        try:
+                            on_wait()
+                        except Exception as e:
+                            wait_error = e
+                    thread.join(wait_interval)
+            if self._executor:
+                self._executor.shutdown(cancel_futures=True)
+        self._raise_error()
+        if wait_error is not None:
+            raise wait_error
+        return self.report()
+
+    def report(self) -> dict:
+        elapsed = time.time() - self._started
+        return {
+            **self.stats,
+            "embed_seconds": round(self.stats["embed_seconds"], 3),
+            "write_seconds": round(self.stats["write_seconds"], 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_sec": round(self.stats["written"] / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _embed(self, texts: List[str]) -> Future:
+        if self._executor:
+            return self._executor.submit(_embed_in_worker, texts)
+        future = Future()
+        future.set_result(EmbeddingModelRegistry.get_model(self.model_name)._get_text_embeddings(texts))
+        return future
+
+    def _forward(self, batch, future: Future, submitted_at: float):
+        embeddings = future.result()
+        self.stats["embed_seconds"] += time.time() - submitted_at
+        self.stats["embedded"] += len(batch)
+        self._write_queue.put((batch, embeddings))
+
+    def _embed_loop(self):
+        in_flight = deque()
+        while True:
+            batch = self._embed_queue.get()
+            if batch is _DONE:
+                break
+            if self._error is not None:
+                # Keep draining so submit() never blocks on a dead stage
+                continue
+            try:
+                in_flight.append((batch, self._embed(batch), time.time()))
+                while in_flight and (len(in_flight) >= self._max_in_flight or self._embed_queue.empty()):
+                    self._forward(*in_flight.popleft())
+            except Exception as e:
+                self._error = e
+                in_flight.clear()
+        try:
+            while in_flight and self._error is None:
+                self._forward(*in_flight.popleft())
+        except Exception as e:
+            self._error = e
+        self._write_queue.put(_DONE)
+
+    def _write_loop(self):
+        while True:
+            item = self._write_queue.get()
+            if item is _DONE:
+                return
+            if self._error is not None:
+                continue
+            batch, embeddings = item
+            started = time.time()
+            try:
+                self.collection.upsert(
+                    ids=[doc.id for doc in batch],
+                    documents=[doc.text for doc in batch],
+                    metadatas=[doc.metadata for doc in batch],
+                    embeddings=embeddings
+                )
+            except Exception as e:
+                self._error = e
+                continue
+            self.stats["write_seconds"] += time.time() - started
+            self.stats["written"] += len(batch)
@@ -0,0 +1,59 @@
+import threading
+
+from django.conf import settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+from .embedding_cache import CachedEmbedding
+
+
+def load_embedding_model(model_name: str) -> HuggingFaceEmbedding:
+    try:
+        return HuggingFaceEmbedding(model_name=model_name)
+    except NotImplementedError as e:
+        if "Cannot copy out of meta tensor" not in str(e):
+            raise
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    print("Using alternative model loading method for newer PyTorch versions")
+    model = SentenceTransformer(model_name)
+    if hasattr(model, "to_empty"):
+        try:
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            model = model.to_empty(device=device)
+            model.eval()
+            return HuggingFaceEmbedding(model=model)
+        except Exception as inner_e:
+            print(f"Failed with to_empty() method: {inner_e}")
+    else:
+        print("Model doesn't have to_empty() method, falling back to CPU")
+
+    with torch.no_grad():
+        model = SentenceTransformer(model_name, device="cpu")
+        return HuggingFaceEmbedding(model=model)
+
+
+def cached_embedding_model(model_name: str) -> BaseEmbedding:
+    model = load_embedding_model(model_name)
+    return CachedEmbedding(model, model_name=model_name) if settings.EMBEDDING_CACHE_ENABLED else model
+
+
+class EmbeddingModelRegistry:
+    """Loads each embedding model once per process (behind the embedding cache) and shares it between threads."""
+    _models = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_model(cls, model_name: str = None) -> BaseEmbedding:
+        model_name = model_name or settings.EMBEDDING_MODEL
+        model = cls._models.get(model_name)
+        if model is None:
+            with cls._lock:
+                model = cls._models.get(model_name)
+                if model is None:
+                    print(f"🔄 Загружаем модель эмбеддингов '{model_name}' ...")
+                    model = cached_embedding_model(model_name)
+                    cls._models[model_name] = model
+        return model
@@ -1,42 +1,53 @@
+import asyncio
+import threading
+import time
+
 from dotenv import load_dotenv
+from langchain_core.runnables import RunnableLambda
 from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.graph import StateGraph
 from langgraph.graph.graph import CompiledGraph
 from langgraph.prebuilt import tools_condition, ToolNode
 from psycopg import OperationalError
 from psycopg.rows import dict_row
-from psycopg_pool import ConnectionPool
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 from django.conf import settings
 
 from agent.agent_state import AgentState
+from agent.checkpoint_retention import CHECKPOINT_TS_INDEX_SQL
 from agent.search_database_agent import search_database_tools, search_database_agent_runnable
-from agent.search_criteria_agent import search_criteria_agent
+from agent.search_criteria_agent import search_criteria_agent, asearch_criteria_agent
 from agent.main_agent import main_agent_runnable, route_main_agent
-from agent.criteria_db_query_node import query_real_estate_db
+from agent.criteria_db_query_node import query_real_estate_db, aquery_real_estate_db
 from agent.appointment_agent import appointment_agent_runnable, appointment_tools
 from agent.create_node import Assistant, back_to_main, create_tool_node
+from agent.context_manager import manage_context, amanage_context
 
 load_dotenv()
 
-def create_graph() -> CompiledGraph:
+def build_state_graph() -> StateGraph:
     builder = StateGraph(AgentState)
 
-    # main agent
-    builder.add_node("main_agent", Assistant(main_agent_runnable))
+    # bounds the history sent to the LLMs once per user turn
+    builder.add_node("context_manager", RunnableLambda(manage_context, afunc=amanage_context))
+    builder.set_entry_point("context_manager")
 
-    builder.set_entry_point("main_agent")
+    # main agent
+    builder.add_node("main_agent", Assistant(main_agent_runnable).as_node())
+    builder.add_edge("context_manager", "main_agent")
     builder.add_conditional_edges("main_agent", route_main_agent)
 
     # search criteria agent
-    builder.add_node("search_criteria_agent", search_criteria_agent)
-    builder.add_node("query_real_estate_db", query_real_estate_db)
+    builder.add_node("search_criteria_agent", RunnableLambda(search_criteria_agent, afunc=asearch_criteria_agent))
+    builder.add_node("query_real_estate_db", RunnableLambda(query_real_estate_db, afunc=aquery_real_estate_db))
 
     # search database agent
-    builder.add_node("search_database_agent", Assistant(search_database_agent_runnable, True))
+    builder.add_node("search_database_agent", Assistant(search_database_agent_runnable, True).as_node())
     builder.add_node("tools", ToolNode(search_database_tools))
 
     # appointment agent
-    builder.add_node("appointment_agent", Assistant(appointment_agent_runnable, True))
+    builder.add_node("appointment_agent", Assistant(appointment_agent_runnable, True).as_node())
     builder.add_node("appointment_tools", ToolNode(appointment_tools))
 
     # add edges for tools
@@ -51,30 +62,217 @@ def create_graph() -> CompiledGraph:
     builder.add_edge("search_criteria_agent", "query_real_estate_db")
     builder.add_edge("query_real_estate_db", "main_agent")
 
+    return builder
 
-    connection_kwargs = {
-        "autocommit": True,
-        "prepare_threshold": 0,
-        "row_factory": dict_row,
-        "keepalives": 1,
-        "keepalives_idle": 15,
-        "keepalives_interval": 10,
-        "keepalives_count": 5,
-    }
 
+def get_checkpointer_db_url() -> str:
     db_credentials = settings.DATABASES['default']
-    db_url = f"postgresql://{db_credentials['USER']}:{db_credentials['PASSWORD']}@{db_credentials['HOST']}:{db_credentials['PORT']}/{db_credentials['NAME']}"
+    return f"postgresql://{db_credentials['USER']}:{db_credentials['PASSWORD']}@{db_credentials['HOST']}:{db_credentials['PORT']}/{db_credentials['NAME']}"
+
+
+CHECKPOINTER_CONNECTION_KWARGS = {
+    "autocommit": True,
+    "prepare_threshold": 0,
+    "row_factory": dict_row,
+    "keepalives": 1,
+    "keepalives_idle": 15,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+
+
+def create_checkpointer_pool() -> ConnectionPool:
+    pool = ConnectionPool(
+        conninfo=get_checkpointer_db_url(),
+        max_size=settings.AGENT_DB_POOL_MAX_SIZE,
+        kwargs=CHECKPOINTER_CONNECTION_KWARGS,
+        name="agent_checkpointer",
+    )
+    validate_connection(pool)
+    print("PostgreSQL connection pool validated successfully!")
+    return pool
 
-    try:
-        pool = ConnectionPool(conninfo=db_url, max_size=20, kwargs=connection_kwargs)
-        validate_connection(pool)
-        print("PostgreSQL connection pool validated successfully!")
-    except Exception as e:
-        print(f"PostgreSQL connection setup failed: {e}")
 
+def create_graph(pool: ConnectionPool) -> CompiledGraph:
     checkpointer = PostgresSaver(pool)
     checkpointer.setup()
-    return builder.compile(checkpointer=checkpointer)
+    with pool.connection() as conn:
+        conn.execute(CHECKPOINT_TS_INDEX_SQL)
+    return build_state_graph().compile(checkpointer=checkpointer)
+
+
+async def create_async_checkpointer_pool() -> AsyncConnectionPool:
+    pool = AsyncConnectionPool(
+        conninfo=get_checkpointer_db_url(),
+        max_size=settings.AGENT_DB_POOL_MAX_SIZE,
+        kwargs=CHECKPOINTER_CONNECTION_KWARGS,
+        name="agent_checkpointer_async",
+        open=False,
+    )
+    await pool.open()
+    await avalidate_connection(pool)
+    print("Async PostgreSQL connection pool validated successfully!")
+    return pool
+
+
+async def create_async_graph(pool: AsyncConnectionPool) -> CompiledGraph:
+    checkpointer = AsyncPostgresSaver(pool)
+    await checkpointer.setup()
+    async with pool.connection() as conn:
+        await conn.execute(CHECKPOINT_TS_INDEX_SQL)
+    return build_state_graph().compile(checkpointer=checkpointer)
+
+
+class GraphRegistry:
+    """
+    Process-wide compiled graph and checkpointer pool. Built once on first use and shared
+    by every view; rebuilt only when the pool stops passing its health check.
+    """
+    _graph = None
+    _pool = None
+    _built_at = None
+    _rebuilds = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_graph(cls) -> CompiledGraph:
+        if cls._graph is None:
+            with cls._lock:
+                if cls._graph is None:
+                    cls._build()
+        return cls._graph
+
+    @classmethod
+    def _build(cls):
+        pool = create_checkpointer_pool()
+        try:
+            graph = create_graph(pool)
+        except Exception:
+            pool.close()
+            raise
+        cls._pool, cls._graph, cls._built_at = pool, graph, time.time()
+
+    @classmethod
+    def is_healthy(cls) -> bool:
+        if cls._pool is None or cls._pool.closed:
+            return False
+        try:
+            validate_connection(cls._pool)
+            return True
+        except OperationalError as e:
+            print(f"Checkpointer pool health check failed: {e}")
+            return False
+
+    @classmethod
+    def rebuild_if_unhealthy(cls) -> CompiledGraph:
+        with cls._lock:
+            if cls._graph is not None and cls.is_healthy():
+                return cls._graph
+
+            old_pool = cls._pool
+            cls._graph, cls._pool = None, None
+            if old_pool is not None:
+                try:
+                    old_pool.close()
+                except Exception as e:
+                    print(f"Failed to close checkpointer pool: {e}")
+            cls._build()
+            cls._rebuilds += 1
+            return cls._graph
+
+    @classmethod
+    def stats(cls) -> dict:
+        stats = {
+            "built": cls._graph is not None,
+            "built_at": cls._built_at,
+            "rebuilds": cls._rebuilds,
+            "healthy": cls.is_healthy(),
+            "pool": {},
+        }
+        if cls._pool is not None:
+            stats["pool"] = cls._pool.get_stats()
+        return stats
+
+
+class AsyncGraphRegistry:
+    """
+    Async counterpart of GraphRegistry for the ASGI chat view: the same graph compiled with an
+    AsyncPostgresSaver on an AsyncConnectionPool, built once per process event loop.
+    """
+    _graph = None
+    _pool = None
+    _built_at = None
+    _rebuilds = 0
+    _lock = None
+
+    @classmethod
+    def _get_lock(cls) -> asyncio.Lock:
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+        return cls._lock
+
+    @classmethod
+    async def get_graph(cls) -> CompiledGraph:
+        if cls._graph is None:
+            async with cls._get_lock():
+                if cls._graph is None:
+                    await cls._build()
+        return cls._graph
+
+    @classmethod
+    async def _build(cls):
+        pool = await create_async_checkpointer_pool()
+        try:
+            graph = await create_async_graph(pool)
+        except Exception:
+            await pool.close()
+            raise
+        cls._pool, cls._graph, cls._built_at = pool, graph, time.time()
+
+    @classmethod
+    async def is_healthy(cls) -> bool:
+        if cls._pool is None or cls._pool.closed:
+            return False
+        try:
+            await avalidate_connection(cls._pool)
+            return True
+        except OperationalError as e:
+            print(f"Async checkpointer pool health check failed: {e}")
+            return False
+
+    @classmethod
+    async def rebuild_if_unhealthy(cls) -> CompiledGraph:
+        async with cls._get_lock():
+            if cls._graph is not None and await cls.is_healthy():
+                return cls._graph
+
+            old_pool = cls._pool
+            cls._graph, cls._pool = None, None
+            if old_pool is not None:
+                try:
+                    await old_pool.close()
+                except Exception as e:
+                    print(f"Failed to close async checkpointer pool: {e}")
+            await cls._build()
+            cls._rebuilds += 1
+            return cls._graph
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Same shape as GraphRegistry.stats(), callable from sync code: the pool is bound to the
+        server's event loop, so it is not probed here and "healthy" only means it is open.
+        """
+        stats = {
+            "built": cls._graph is not None,
+            "built_at": cls._built_at,
+            "rebuilds": cls._rebuilds,
+            "healthy": cls._pool is not None and not cls._pool.closed,
+            "pool": {},
+        }
+        if cls._pool is not None:
+            stats["pool"] = cls._pool.get_stats()
+        return stats
 
 
 def validate_connection(pool):
@@ -92,3 +290,14 @@ def validate_connection(pool):
         if conn:
             pool.putconn(conn)
 
+
+async def avalidate_connection(pool):
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT 1")
+                result = await cur.fetchone()
+                if result is None:
+                    raise OperationalError("Health check query returned no result.")
+    except Exception as e:
+        raise OperationalError(f"Connection validation failed: {e}")
@@ -0,0 +1,349 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .complex_resolver import COMPLEX_NAMES_COLLECTION, normalize_name
+
+
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya",
+    # Kazakh letters
+    "ә": "a", "ғ": "g", "қ": "k", "ң": "n", "ө": "o", "ұ": "u", "ү": "u", "һ": "h", "і": "i",
+}
+# Spellings that differ between transliteration schemes
+LATIN_VARIANTS = (("kh", "h"), ("iy", "i"), ("yy", "y"), ("ii", "i"), ("w", "v"), ("x", "ks"), ("j", "zh"))
+# Adjective and case endings, longest first, so "Алмалинский" and "Almaly" share the stem "almal"
+ENDINGS = (
+    "inskogo", "inskii", "inskaya", "inski", "skogo", "skaya", "skoe", "ski", "ska", "sko", "nyi", "naya", "noe",
+    "ogo", "omu", "ami", "ah", "ov", "ev", "a", "e", "i", "y", "u", "o",
+)
+MIN_STEM = 4
+
+# Chroma collections holding name embeddings, per entry kind
+VECTOR_COLLECTIONS = {"complex": COMPLEX_NAMES_COLLECTION}
+RRF_K = 60
+
+
+def stem(token: str) -> str:
+    for ending in ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM:
+            return token[:-len(ending)]
+    return token
+
+
+def lexical_tokens(text: str) -> List[str]:
+    """Lowercased, transliterated to Latin and stemmed, so Cyrillic and Latin spellings meet."""
+    text = "".join(TRANSLIT.get(char, char) for char in normalize_name(text or ""))
+    for variant, replacement in LATIN_VARIANTS:
+        text = text.replace(variant, replacement)
+    return [stem(token) for token in re.findall(r"[a-z0-9]+", text)]
+
+
+def trigrams(tokens: Iterable[str]) -> set:
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return grams
+
+
+class Entry(NamedTuple):
+    kind: str
+    id: int
+    name: str
+    text: str
+
+
+class RetrievalHit(NamedTuple):
+    kind: str
+    id: int
+    name: str
+    score: float
+    source: str
+
+
+class LexicalIndex:
+    """
+    Lexical index over entries: a trigram index on names (typos, transliterations) and BM25 over the
+    full text (names, districts, descriptions). Entries are added and removed in place, keyed by
+    (kind, id), so a saved row costs only its own postings.
+    """
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    # Weight of a description match relative to a name match, and its saturation point
+    TEXT_WEIGHT = 0.6
+    TEXT_SATURATION = 5.0
+
+    def __init__(self, entries: Iterable[Entry] = ()):
+        self.entries = {}
+        self.name_grams = {}
+        self.gram_postings = defaultdict(set)
+        self.term_postings = defaultdict(dict)
+        self.lengths = {}
+        self.total_length = 0
+        # Searches run on request threads while model signals update the postings
+        self._lock = threading.RLock()
+        for entry in entries:
+            self.add(entry)
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / len(self.lengths) if self.lengths else 0.0
+
+    def add(self, entry: Entry):
+        """Indexes the entry, replacing the one with the same kind and id."""
+        key = (entry.kind, entry.id)
+        with self._lock:
+            self.remove(key)
+            self.entries[key] = entry
+            grams = trigrams(lexical_tokens(entry.name))
+            self.name_grams[key] = len(grams)
+            for gram in grams:
+                self.gram_postings[gram].add(key)
+
+            terms = Counter(lexical_tokens(entry.text))
+            self.lengths[key] = sum(terms.values())
+            self.total_length += self.lengths[key]
+            for term, frequency in terms.items():
+                self.term_postings[term][key] = frequency
+
+    def remove(self, key):
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            del self.name_grams[key]
+            for gram in trigrams(lexical_tokens(entry.name)):
+                self.gram_postings[gram].discard(key)
+                if not self.gram_postings[gram]:
+                    del self.gram_postings[gram]
+
+            self.total_length -= self.lengths.pop(key)
+            for term in set(lexical_tokens(entry.text)):
+                self.term_postings[term].pop(key, None)
+                if not self.term_postings[term]:
+                    del self.term_postings[term]
+
+    def name_scores(self, tokens: List[str]) -> Dict[tuple, float]:
+        grams = trigrams(tokens)
+        shared = Counter(key for gram in grams for key in self.gram_postings.get(gram, ()))
+        return {
+            # Half "how much of the query is in the name", half Dice, so shorter names win ties
+            key: 0.5 * count / len(grams) + count / (len(grams) + self.name_grams[key])
+            for key, count in shared.items()
+        }
+
+    def text_scores(self, tokens: List[str]) -> Dict[tuple, float]:
+        scores = defaultdict(float)
+        total = len(self.entries)
+        average_length = self.average_length or 1
+        for term in set(tokens):
+            postings = self.term_postings.get(term, {})
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                norm = 1 - self.BM25_B + self.BM25_B * self.lengths[key] / average_length
+                scores[key] += idf * frequency * (self.BM25_K1 + 1) / (frequency + self.BM25_K1 * norm)
+        return scores
+
+    def search(self, query: str, kind: Optional[str] = None, top_k: int = 3) -> List[RetrievalHit]:
+        tokens = lexical_tokens(query)
+        if not tokens:
+            return []
+        with self._lock:
+            scores = self.name_scores(tokens)
+            for key, bm25 in self.text_scores(tokens).items():
+                text_score = self.TEXT_WEIGHT * bm25 / (bm25 + self.TEXT_SATURATION)
+                scores[key] = max(scores.get(key, 0.0), text_score)
+
+            hits = [
+                RetrievalHit(entry.kind, entry.id, entry.name, round(score, 4), "lexical")
+                for key, score in scores.items()
+                for entry in (self.entries[key],)
+                if kind is None or entry.kind == kind
+            ]
+        return sorted(hits, key=lambda hit: -hit.score)[:top_k]
+
+
+def complex_entries(ids=None) -> List[Entry]:
+    from properties.models import ResidentialComplex
+
+    complexes = ResidentialComplex.objects.select_related("district")
+    if ids is not None:
+        complexes = complexes.filter(id__in=ids)
+    return [
+        Entry(
+            "complex", item.id, item.name,
+            " ".join(filter(None, [item.name, item.district.name, item.description_short, item.description_full])),
+        )
+        for item in complexes
+    ]
+
+
+def district_entries(ids=None) -> List[Entry]:
+    from location.models import District
+
+    districts = District.objects.select_related("city")
+    if ids is not None:
+        districts = districts.filter(id__in=ids)
+    return [
+        Entry("district", item.id, item.name, " ".join(filter(None, [item.name, item.city.name, item.description])))
+        for item in districts
+    ]
+
+
+ENTRY_LOADERS = {"complex": complex_entries, "district": district_entries}
+
+
+class HybridRetriever:
+    """
+    Looks up complexes and districts by name or description without an LLM: the in-process lexical
+    index answers in well under a millisecond, and only low-confidence queries are fused (reciprocal
+    rank fusion) with nearest neighbours from Chroma. Model signals update just the changed rows in
+    place; a background thread rebuilds the index periodically to pick up changes made by other processes.
+    """
+    _index = None
+    _lock = threading.Lock()
+    _rebuilder = None
+
+    @staticmethod
+    def load_index() -> LexicalIndex:
+        return LexicalIndex(entry for load in ENTRY_LOADERS.values() for entry in load())
+
+    @classmethod
+    def get_index(cls) -> LexicalIndex:
+        if cls._index is None:
+            with cls._lock:
+                if cls._index is None:
+                    # Only the first lookup in a process waits for the load; later rebuilds are in the background
+                    cls._index = cls.load_index()
+                    if settings.AGENT_BACKGROUND_WORKERS and settings.AGENT_HYBRID_REBUILD_SECONDS > 0:
+                        cls._rebuilder = threading.Thread(target=cls._rebuild_loop, name="hybrid-retriever-rebuild", daemon=True)
+                        cls._rebuilder.start()
+        return cls._index
+
+    @classmethod
+    def _rebuild_loop(cls):
+        from django.db import close_old_connections
+
+        while True:
+            time.sleep(settings.AGENT_HYBRID_REBUILD_SECONDS)
+            try:
+                index = cls.load_index()
+                with cls._lock:
+                    cls._index = index
+            except Exception as e:
+                print(f"Hybrid retriever rebuild failed: {e}")
+            finally:
+                close_old_connections()
+
+    @classmethod
+    def refresh(cls, kind: str, ids: Iterable[int]):
+        """Reloads the given rows; rows that no longer exist leave the index."""
+        if cls._index is None:
+            # Not built in this process yet; the first lookup loads everything
+            return
+        ids = list(ids)
+        entries = ENTRY_LOADERS[kind](ids)
+        with cls._lock:
+            # A background rebuild that read the rows before this save catches up on its next run
+            for row_id in ids:
+                cls._index.remove((kind, row_id))
+            for entry in entries:
+                cls._index.add(entry)
+
+    @classmethod
+    def lexical_search(cls, query: str, kind: Optional[str] = None, top_k: int = 3) -> List[RetrievalHit]:
+        hits = cls.get_index().search(query, kind, top_k)
+        return [hit for hit in hits if hit.score >= settings.AGENT_HYBRID_MIN_SCORE]
+
+    @classmethod
+    def vector_search(cls, query: str, kind: str, top_k: int = 3) -> List[RetrievalHit]:
+        from .embeddings import EmbeddingModelRegistry
+        from .vector_db import VectorDBConnection
+
+        collection = VectorDBConnection.get_client().get_collection(VECTOR_COLLECTIONS[kind])
+        embedding = EmbeddingModelRegistry.get_model().get_query_embedding(query.lower())
+        result = collection.query(query_embeddings=[embedding], n_results=top_k, include=["metadatas", "distances"])
+
+        hits = []
+        for metadata, distance in zip(result["metadatas"][0], result["distances"][0]):
+            row_id = (metadata or {}).get("id")
+            if row_id is None or distance > settings.AGENT_RESOLVER_MAX_DISTANCE:
+                continue
+            entry = cls.get_index().entries.get((kind, int(row_id)))
+            hits.append(RetrievalHit(kind, int(row_id), entry.name if entry else "", round(1 - distance, 4), "vector"))
+        return hits
+
+    @classmethod
+    def search(cls, query: str, kind: str, top_k: int = 3) -> List[RetrievalHit]:
+        lexical = cls.lexical_search(query, kind, top_k)
+        if lexical and lexical[0].score >= settings.AGENT_HYBRID_CONFIDENT_SCORE:
+            return lexical
+        if kind not in VECTOR_COLLECTIONS:
+            return lexical
+
+        try:
+            vector = cls.vector_search(query, kind, top_k)
+        except Exception as e:
+            print(f"Vector lookup failed, using lexical hits only: {e}")
+            return lexical
+        return fuse(lexical, vector, top_k=top_k)
+
+
+def fuse(*rankings: List[RetrievalHit], top_k: int = 3) -> List[RetrievalHit]:
+    """Reciprocal rank fusion: items ranked well by several retrievers rise to the top."""
+    scores, hits = defaultdict(float), {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            key = (hit.kind, hit.id)
+            scores[key] += 1 / (RRF_K + rank + 1)
+            if key not in hits or not hits[key].name:
+                hits[key] = hit
+    fused = [
+        RetrievalHit(hit.kind, hit.id, hit.name, round(scores[key], 4), "hybrid")
+        for key, hit in hits.items()
+    ]
+    return sorted(fused, key=lambda hit: -hit.score)[:top_k]
+
+
+def refresh_complex(sender, instance, **kwargs):
+    # Read now: a deleted instance has no pk by the time an outer transaction commits
+    pk = instance.pk
+    transaction.on_commit(lambda: HybridRetriever.refresh("complex", [pk]))
+
+
+def refresh_district(sender, instance, **kwargs):
+    pk = instance.pk
+
+    def refresh():
+        from properties.models import ResidentialComplex
+
+        HybridRetriever.refresh("district", [pk])
+        # Complex entries carry their district's name
+        HybridRetriever.refresh(
+            "complex", ResidentialComplex.objects.filter(district_id=pk).values_list("id", flat=True)
+        )
+
+    transaction.on_commit(refresh)
+
+
+def connect_signals():
+    from location.models import District
+    from properties.models import ResidentialComplex
+
+    post_save.connect(refresh_complex, sender=ResidentialComplex, dispatch_uid="hybrid-retriever-complex-save")
+    post_delete.connect(refresh_complex, sender=ResidentialComplex, dispatch_uid="hybrid-retriever-complex-delete")
+    post_save.connect(refresh_district, sender=District, dispatch_uid="hybrid-retriever-district-save")
+    post_delete.connect(refresh_district, sender=District, dispatch_uid="hybrid-retriever-district-delete")
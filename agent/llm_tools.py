@@ -1,8 +1,97 @@
-from properties.models import ResidentialComplex, Block, Property
+from django.conf import settings
+from django.db.models import Count
+from langchain_core.runnables import RunnableConfig
+
+from properties.cache import get_catalogue_cache, get_catalogue_version
+from properties.models import ResidentialComplex, Property
 from sales.models import PropertyPurchase
 from location.models import District
-from .vector_searcher import VectorSearcher
-import ast
+from .complex_resolver import ComplexNameResolver, normalize_name
+from .hybrid_retriever import HybridRetriever
+from .tool_cache import ThreadTTLCache
+
+
+complex_lookup_cache = ThreadTTLCache(
+    maxsize=settings.AGENT_TOOL_CACHE_SIZE,
+    ttl=settings.AGENT_TOOL_CACHE_TTL,
+)
+
+
+def get_thread_id(config: RunnableConfig) -> str:
+    return str((config or {}).get("configurable", {}).get("thread_id", ""))
+
+
+def resolve_complex_ids(thread_id: str, complex_name: str) -> list:
+    return complex_lookup_cache.get_or_set(
+        thread_id,
+        ("ids", get_catalogue_version(), normalize_name(complex_name)),
+        lambda: ComplexNameResolver.resolve(complex_name, top_k=3)
+    )
+
+
+def build_complex_profile(complex_id: int) -> dict:
+    residential_complex = ResidentialComplex.objects.select_related("district").filter(id=complex_id).first()
+    if not residential_complex:
+        return {}
+
+    return {
+        "complex_id": residential_complex.id,
+        "name": residential_complex.name,
+        "district": residential_complex.district.name if residential_complex.district else "Не указан",
+        "address": residential_complex.address,
+        "link_on_map": residential_complex.link_on_map or "Не указана",
+        "class_type": residential_complex.class_type,
+        "construction_technology": residential_complex.construction_technology,
+        "heating_type": residential_complex.heating_type,
+        "ceiling_height": str(residential_complex.ceiling_height),
+        "has_elevator_pass": "Имеется" if residential_complex.has_elevator_pass else "Отсутствует",
+        "has_elevator_cargo": "Имеется" if residential_complex.has_elevator_cargo else "Отсутствует",
+        "down_payment": str(residential_complex.down_payment) if residential_complex.down_payment else "Не указан",
+        "installment_plan": residential_complex.installment_plan or "Не указан",
+        "description": residential_complex.description_full or residential_complex.description_short or "Описание отсутствует",
+    }
+
+
+def build_residential_complexes_snapshot() -> list:
+    """Complex details with available apartments per block, from one grouped count query."""
+    available_by_complex = {}
+    block_counts = Property.objects.filter(
+        category="APARTMENT",
+        price__isnull=False,
+        is_available=True
+    ).values(
+        "block__complex_id", "block_id", "block__block_number"
+    ).annotate(
+        available_apartments=Count("id")
+    ).order_by("block__complex_id", "block_id")
+
+    for row in block_counts:
+        available_by_complex.setdefault(row["block__complex_id"], []).append({
+            "block_number": row["block__block_number"],
+            "available_apartments": row["available_apartments"]
+        })
+
+    details = []
+    for residential_complex in ResidentialComplex.objects.select_related("district").order_by("id"):
+        available_blocks = available_by_complex.get(residential_complex.id, [])
+        details.append({
+            "name": residential_complex.name,
+            "district": residential_complex.district.name if residential_complex.district else "Не указан",
+            "address": residential_complex.address,
+            "class_type": residential_complex.class_type,
+            "construction_technology": residential_complex.construction_technology,
+            "heating_type": residential_complex.heating_type,
+            "ceiling_height": str(residential_complex.ceiling_height),
+            "down_payment": str(residential_complex.down_payment) if residential_complex.down_payment else "Не указан",
+            "installment_plan": residential_complex.installment_plan or "Не указан",
+            "description_short": residential_complex.description_short or "",
+            "location": {
+                "link_on_map": residential_complex.link_on_map or None,
+            },
+            "total_available_apartments": sum(block["available_apartments"] for block in available_blocks),
+            "available_blocks": available_blocks
+        })
+    return details
 
 
 class MainAgentTools:
@@ -15,51 +104,16 @@ class MainAgentTools:
         """
 
         try:
-            residential_complexes = ResidentialComplex.objects.all()
-            if not residential_complexes:
+            cache = get_catalogue_cache()
+            key = f"agent:residential_complexes_snapshot:{get_catalogue_version()}"
+            details = cache.get(key)
+            if details is None:
+                details = build_residential_complexes_snapshot()
+                cache.set(key, details, timeout=settings.AGENT_COMPLEXES_SNAPSHOT_TTL)
+
+            if not details:
                 return "Нет доступных жилых комплексов."
 
-            details = []
-            for residential_complex in residential_complexes:
-                blocks = Block.objects.filter(complex=residential_complex)
-                
-                available_blocks = []
-                total_available_apartments = 0
-                
-                for block in blocks:
-                    apartments_in_block = Property.objects.filter(
-                        block=block,
-                        category="APARTMENT",
-                        price__isnull=False
-                    ).exclude(
-                        property_purchases__status__in=["PAID", "RESERVED", "COMPLETED"]
-                    ).count()
-                    
-                    if apartments_in_block > 0:
-                        available_blocks.append({
-                            "block_number": block.block_number,
-                            "available_apartments": apartments_in_block
-                        })
-                        total_available_apartments += apartments_in_block
-
-                details.append({
-                    "name": residential_complex.name,
-                    "district": residential_complex.district.name if residential_complex.district else "Не указан",
-                    "address": residential_complex.address,
-                    "class_type": residential_complex.class_type,
-                    "construction_technology": residential_complex.construction_technology,
-                    "heating_type": residential_complex.heating_type,
-                    "ceiling_height": str(residential_complex.ceiling_height),
-                    "down_payment": str(residential_complex.down_payment) if residential_complex.down_payment else "Не указан",
-                    "installment_plan": residential_complex.installment_plan or "Не указан",
-                    "description_short": residential_complex.description_short or "",
-                    "location": {
-                        "link_on_map": residential_complex.link_on_map or None,
-                    },
-                    "total_available_apartments": total_available_apartments,
-                    "available_blocks": available_blocks
-                })
-
             return f"Список всех жилых комплексов: {details}"
 
         except Exception as e:
@@ -98,6 +152,14 @@ class MainAgentTools:
         """
         try:
             district = District.objects.filter(name=district_name).first()
+            if not district:
+                # Misspellings and transliterations (Almaly -> Алмалинский) without an LLM call
+                hits = HybridRetriever.search(district_name, "district", top_k=3)
+                if hits and hits[0].score >= settings.AGENT_HYBRID_CONFIDENT_SCORE:
+                    district = District.objects.filter(id=hits[0].id).first()
+                elif hits:
+                    # A weak match ("Алматы" is close to "Алмалинский") is a guess; let the user choose
+                    return f"Район не найден. Возможно, имелся в виду: {', '.join(hit.name for hit in hits)}."
             if not district:
                 return "Район не найден."
 
@@ -105,9 +167,8 @@ class MainAgentTools:
             available_apartments = Property.objects.filter(
                 block__complex__district=district,
                 category="APARTMENT",
-                price__isnull=False
-            ).exclude(
-                property_purchases__status__in=["PAID", "RESERVED", "COMPLETED"]
+                price__isnull=False,
+                is_available=True
             ).count()
 
             details = {
@@ -124,123 +185,42 @@ class MainAgentTools:
             return "Произошла ошибка при поиске района."
 
     @staticmethod
-    def search_for_residential_complex_description(complex_name: str) -> str:
-        """Ищет описание жилого комплекса (ЖК) по названию"""
-        try:
-            raw_vector_res = VectorSearcher(collection_name="residential_complexes_names", top_k=3).search_vector(complex_name)
-
-            if not raw_vector_res:
-                return f"Нет данных о жилом комплексе {complex_name} в векторном хранилище."
-
-            print("raw_vector_res:", raw_vector_res.response)
-
-            resp_ids = ast.literal_eval(raw_vector_res.response)
-            residential_complex = ResidentialComplex.objects.filter(id__in=resp_ids).first()
-            if not residential_complex:
-                return f"Нет данных о жилом комплексе {complex_name}."
-
-            return f"Описание жилого комплекса {complex_name}: {residential_complex.description_full or residential_complex.description_short}."
-        except Exception as e:
-            print(e)
-            return "Произошла ошибка при поиске описания жилого комплекса."
-
-    @staticmethod
-    def search_for_res_complex_address(complex_name: str) -> str:
-        """Ищет адрес жилого комплекса (ЖК) по названию"""
-        try:
-            raw_vector_res = VectorSearcher(collection_name="residential_complexes_names", top_k=3).search_vector(complex_name)
-
-            if not raw_vector_res:
-                return f"Нет данных о жилом комплексе {complex_name} в векторном хранилище."
-            print("raw_vector_res:", raw_vector_res.response)
-
-            resp_ids = ast.literal_eval(raw_vector_res.response)
-            residential_complex = ResidentialComplex.objects.filter(id__in=resp_ids).first()
-            if not residential_complex:
-                return f"Нет данных о жилом комплексе {complex_name}."
-
-            return f"Адрес жилого комплекса {complex_name}: {residential_complex.address}. Ссылка на 2GIS - {residential_complex.link_on_map}."
-        except Exception as e:
-            print(e)
-            return "Произошла ошибка при поиске адреса жилого комплекса."
-
-    @staticmethod
-    def search_for_res_complex_constr_tech(complex_name: str) -> str:
-        """Ищет о системе строительства жилого комплекса (ЖК) по названию"""
-        try:
-            raw_vector_res = VectorSearcher(collection_name="residential_complexes_names", top_k=3).search_vector(complex_name)
-
-            if not raw_vector_res:
-                return f"Нет данных о жилом комплексе {complex_name} в векторном хранилище."
-            print("raw_vector_res:", raw_vector_res.response)
-
-            resp_ids = ast.literal_eval(raw_vector_res.response)
-            residential_complex = ResidentialComplex.objects.filter(id__in=resp_ids).first()
-            if not residential_complex:
-                return f"Нет данных о жилом комплексе {complex_name}."
-
-            return f"Система строительства жилого комплекса {complex_name}: {residential_complex.construction_technology}."
-        except Exception as e:
-            print(e)
-            return "Произошла ошибка при поиске информации о системе строительства."
-
-    @staticmethod
-    def search_for_res_complex_ceiling_height(complex_name: str) -> str:
-        """Ищет о высоте потолках жилого комплекса (ЖК) по названию"""
-        try:
-            raw_vector_res = VectorSearcher(collection_name="residential_complexes_names", top_k=3).search_vector(complex_name)
-
-            if not raw_vector_res:
-                return f"Нет данных о жилом комплексе {complex_name} в векторном хранилище."
-            print("raw_vector_res:", raw_vector_res.response)
-
-            resp_ids = ast.literal_eval(raw_vector_res.response)
-            residential_complex = ResidentialComplex.objects.filter(id__in=resp_ids).first()
-            if not residential_complex:
-                return f"Нет данных о жилом комплексе {complex_name}."
-
-            return f"Высота потолков жилого комплекса {complex_name}: {residential_complex.ceiling_height}."
-        except Exception as e:
-            print(e)
-            return "Произошла ошибка при поиске информации о высоте потолков."
-
-    @staticmethod
-    def search_for_res_complex_link_on_map(complex_name: str) -> str:
-        """Ищет ссылку на карте жилого комплекса (ЖК) по названию"""
+    def search_residential_complex_profile(complex_name: str, config: RunnableConfig) -> str:
+        """
+        Ищет всю информацию о жилом комплексе (ЖК) по названию: адрес, район, класс, систему строительства,
+        отопление, высоту потолков, лифты, условия оплаты, ссылку на карте и описание.
+        """
         try:
-            raw_vector_res = VectorSearcher(collection_name="residential_complexes_names", top_k=3).search_vector(complex_name)
+            thread_id = get_thread_id(config)
+            resp_ids = resolve_complex_ids(thread_id, complex_name)
 
-            if not raw_vector_res:
+            if not resp_ids:
                 return f"Нет данных о жилом комплексе {complex_name} в векторном хранилище."
-            print("raw_vector_res:", raw_vector_res.response)
 
-            resp_ids = ast.literal_eval(raw_vector_res.response)
-            residential_complex = ResidentialComplex.objects.filter(id__in=resp_ids).first()
-            if not residential_complex:
+            profile = complex_lookup_cache.get_or_set(
+                thread_id, ("profile", get_catalogue_version(), resp_ids[0]), lambda: build_complex_profile(resp_ids[0])
+            )
+            if not profile:
                 return f"Нет данных о жилом комплексе {complex_name}."
 
-            return f"Ссылка на карте жилого комплекса {complex_name}: {residential_complex.link_on_map}."
+            return f"Информация о жилом комплексе {complex_name}: {profile}"
         except Exception as e:
             print(e)
-            return "Произошла ошибка при поиске ссылки на карте."
+            return "Произошла ошибка при поиске информации о жилом комплексе."
 
     @staticmethod
-    def search_for_res_complex_probs(complex_name: str) -> str:
+    def search_for_res_complex_probs(complex_name: str, config: RunnableConfig) -> str:
         """Ищет квартиры в ЖК по названию Жилого Комплекса"""
         try:
-            raw_vector_res = VectorSearcher(collection_name="residential_complexes_names", top_k=3).search_vector(complex_name)
+            resp_ids = resolve_complex_ids(get_thread_id(config), complex_name)
 
-            if not raw_vector_res:
+            if not resp_ids:
                 return f"Нет данных о жилом комплексе {complex_name} в векторном хранилище."
-            print("raw_vector_res:", raw_vector_res.response)
-
-            resp_ids = ast.literal_eval(raw_vector_res.response)
             properties = Property.objects.filter(
                 block__complex_id__in=resp_ids,
                 category="APARTMENT",
-                price__isnull=False
-            ).exclude(
-                property_purchases__status__in=["PAID", "RESERVED", "COMPLETED"]
+                price__isnull=False,
+                is_available=True
             ).select_related('block', 'block__complex', 'block__complex__district')
 
             if not properties:
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from agent.models import ConversationMessage
+from agent.transcript import append_transcript, transcript_from_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Fills the conversation_messages transcript for threads that only exist in the checkpoint tables"
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT thread_id FROM public.checkpoints")
+            thread_ids = [row[0] for row in cursor.fetchall()]
+
+        existing = set(
+            ConversationMessage.objects.filter(thread_id__in=thread_ids).values_list('thread_id', flat=True).distinct()
+        )
+        filled = messages = 0
+        for thread_id in thread_ids:
+            if thread_id in existing:
+                continue
+            entries = transcript_from_checkpoints(thread_id)
+            append_transcript(thread_id, entries)
+            filled += 1
+            messages += len(entries)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {messages} messages for {filled} threads; {len(existing)} threads already had a transcript."
+        ))
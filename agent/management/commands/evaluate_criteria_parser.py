@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from agent.criteria_parser import evaluate_corpus
+
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "fixtures" / "criteria_parser_corpus.json"
+
+
+class Command(BaseCommand):
+    help = "Measures the rule-based criteria parser on a labeled corpus: precision and share of LLM calls avoided"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=str(DEFAULT_CORPUS), help="Path to a JSON list of {text, expected}")
+
+    def handle(self, *args, **options):
+        report = evaluate_corpus(options['corpus'])
+
+        for mistake in report['mistakes']:
+            self.stderr.write(self.style.ERROR(
+                f"{mistake['text']!r}: expected {mistake['expected']}, parsed {mistake['parsed']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['total']} messages, {report['confident']} parsed without the LLM "
+            f"({report['coverage']:.0%} of LLM calls avoided), precision {report['precision']:.1%}"
+        ))
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from agent.checkpoint_retention import checkpoint_table_sizes, sweep_checkpoints, sweep_lock, vacuum_checkpoint_tables
+
+
+def format_sizes(sizes) -> str:
+    return ", ".join(
+        f"{table} {size['bytes'] / 1024 / 1024:.1f} MB (~{size['rows']} rows)"
+        for table, size in sizes.items()
+    )
+
+
+class Command(BaseCommand):
+    help = "Prunes langgraph checkpoint tables: keeps the latest checkpoints per thread and expires idle threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-last', type=int, default=settings.AGENT_CHECKPOINT_KEEP_LAST,
+            help="Checkpoints to keep per thread; 0 disables pruning",
+        )
+        parser.add_argument(
+            '--ttl-days', type=int, default=settings.AGENT_CHECKPOINT_TTL_DAYS,
+            help="Delete threads idle for longer than this; 0 disables expiry",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.AGENT_CHECKPOINT_SWEEP_BATCH,
+            help="Threads handled per delete transaction",
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="Run VACUUM ANALYZE on the checkpoint tables afterwards so the space is reused",
+        )
+
+    def handle(self, *args, **options):
+        before = checkpoint_table_sizes()
+        self.stdout.write(f"Before: {format_sizes(before)}")
+
+        with sweep_lock() as acquired:
+            if not acquired:
+                raise CommandError("Another process is sweeping the checkpoint tables; try again later.")
+            report = sweep_checkpoints(options['keep_last'], options['ttl_days'], options['batch_size'])
+        if options['vacuum']:
+            vacuum_checkpoint_tables()
+
+        after = checkpoint_table_sizes()
+        self.stdout.write(f"After: {format_sizes(after)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {report['expired_threads']} threads, pruned {report['pruned_threads']} threads: "
+            f"deleted {report['checkpoints']} checkpoints, {report['checkpoint_writes']} writes, "
+            f"{report['checkpoint_blobs']} blobs."
+        ))
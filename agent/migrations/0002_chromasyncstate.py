@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChromaSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collection', models.CharField(max_length=255, unique=True)),
+                ('sql_table', models.CharField(max_length=255)),
+                ('id_column', models.CharField(max_length=255)),
+                ('watermark_column', models.CharField(blank=True, default='', max_length=255)),
+                ('high_water_mark', models.CharField(blank=True, default='', max_length=255)),
+                ('rows_read', models.PositiveIntegerField(default=0)),
+                ('rows_upserted', models.PositiveIntegerField(default=0)),
+                ('rows_unchanged', models.PositiveIntegerField(default=0)),
+                ('rows_deleted', models.PositiveIntegerField(default=0)),
+                ('synced_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'chroma_sync_states',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0002_chromasyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chromasyncstate',
+            name='text_columns',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='chromasyncstate',
+            name='metadata_columns',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='chromasyncstate',
+            name='column_names',
+            field=models.JSONField(default=dict),
+        ),
+    ]
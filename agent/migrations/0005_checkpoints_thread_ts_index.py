@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from agent.checkpoint_retention import CHECKPOINT_TS_INDEX_SQL
+
+
+# The checkpoint tables are created by the langgraph saver, which may not have run yet
+CREATE_INDEX_SQL = f"""
+DO $$
+BEGIN
+    IF to_regclass('public.checkpoints') IS NOT NULL THEN
+        {CHECKPOINT_TS_INDEX_SQL};
+    END IF;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0004_chromaloadjob'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX_SQL, reverse_sql="DROP INDEX IF EXISTS public.checkpoints_thread_ts_idx;"),
+    ]
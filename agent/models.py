@@ -1,3 +1,91 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class ConversationMessage(models.Model):
+    """
+    Append-only transcript of a chat thread, written by the graph as messages are produced.
+    seq numbers the messages of a thread, so a transcript page is one range read on (thread_id, seq).
+    """
+    thread_id = models.CharField(max_length=255)
+    seq = models.PositiveIntegerField()
+    role = models.CharField(max_length=20)
+    content = models.TextField()
+    node = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.thread_id}#{self.seq} {self.role}"
+
+    class Meta:
+        db_table = "conversation_messages"
+        constraints = [
+            models.UniqueConstraint(fields=["thread_id", "seq"], name="conversation_thread_seq_uniq"),
+        ]
+
+
+class ChromaSyncState(models.Model):
+    """Last sync of a Chroma collection from its SQL table: source, high-water mark and counters."""
+    collection = models.CharField(max_length=255, unique=True)
+    sql_table = models.CharField(max_length=255)
+    id_column = models.CharField(max_length=255)
+    # How documents are built from rows, so single rows can be re-synced on model changes
+    text_columns = models.JSONField(default=list)
+    metadata_columns = models.JSONField(default=list)
+    column_names = models.JSONField(default=dict)
+    watermark_column = models.CharField(max_length=255, blank=True, default="")
+    high_water_mark = models.CharField(max_length=255, blank=True, default="")
+    rows_read = models.PositiveIntegerField(default=0)
+    rows_upserted = models.PositiveIntegerField(default=0)
+    rows_unchanged = models.PositiveIntegerField(default=0)
+    rows_deleted = models.PositiveIntegerField(default=0)
+    synced_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"{self.collection} <- {self.sql_table}"
+
+    class Meta:
+        db_table = "chroma_sync_states"
+
+
+class ChromaLoadJob(models.Model):
+    """A background load_data run: its parameters, live progress and outcome."""
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+        ("cancelled", "Cancelled"),
+    )
+    ACTIVE_STATUSES = ("queued", "running")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    collection = models.CharField(max_length=255)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_CHOICES[0][0])
+    cancel_requested = models.BooleanField(default=False)
+    rows_total = models.PositiveIntegerField(null=True)
+    rows_read = models.PositiveIntegerField(default=0)
+    rows_embedded = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    report = models.JSONField(null=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"{self.collection} ({self.status})"
+
+    class Meta:
+        db_table = "chroma_load_jobs"
+        constraints = [
+            # At most one queued or running job per collection, enforced by the database
+            models.UniqueConstraint(
+                fields=["collection"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="chroma_load_job_active_uniq",
+            ),
+        ]
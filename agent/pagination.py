@@ -0,0 +1,17 @@
+from django.db.models import F, Q
+
+from properties.pagination import KeysetPagination, parse_int
+
+
+class TranscriptKeysetPagination(KeysetPagination):
+    """Pages a thread transcript by seq, which is unique per thread, so no id tiebreaker is needed."""
+    page_size = 100
+    sort_fields = {'seq': 'seq'}
+    default_sort = 'seq'
+    cursor_parsers = {'seq': parse_int}
+
+    def get_ordering(self, field, descending):
+        return [F(field).desc() if descending else F(field).asc()]
+
+    def cursor_filter(self, field, descending, value, pk):
+        return Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
@@ -6,6 +6,7 @@ import json
 from pydantic import BaseModel
 
 from agent.agent_state import AgentState
+from agent.criteria_parser import parse_search_criteria
 from archiq_backend import settings
 
 load_dotenv()
@@ -50,7 +51,7 @@ Guidelines:
 5. Respond with exactly the JSON object—no extra text.
 """
 
-def search_criteria_agent(state: AgentState) -> Dict[str, Any]:
+def prepare_criteria_request(state: AgentState):
     last_tool_call = state["messages"][-1].tool_calls[0]
     tool_call_id = last_tool_call["id"]
     user_query = last_tool_call["args"]["request"]
@@ -61,19 +62,28 @@ def search_criteria_agent(state: AgentState) -> Dict[str, Any]:
         {"role": "user", "content": f"Current Criteria: {json.dumps(current_criteria, indent=2)}"},
         {"role": "user", "content": f"User Query: {user_query}"},
     ]
+    return tool_call_id, user_query, current_criteria, messages
 
-    try:
-        response = structured_llm.invoke(messages)
-        new_search_criteria = response.dict(exclude_none=True)
-    except Exception as e:
-        return {
-            "search_criteria": current_criteria,
-            "messages": [
-                ToolMessage(content="Entering search criteria agent", tool_call_id=tool_call_id),
-                AIMessage(content=f"Failed to parse search criteria. Error: {e}"),
-            ],
-        }
 
+def parse_locally(user_query: str) -> Optional[SearchCriteriaObject]:
+    parsed_criteria, confident = parse_search_criteria(user_query)
+    if not confident:
+        return None
+    print(f"Search criteria parsed without LLM: {parsed_criteria}")
+    return SearchCriteriaObject(**parsed_criteria)
+
+
+def criteria_error_update(tool_call_id: str, current_criteria: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    return {
+        "search_criteria": current_criteria,
+        "messages": [
+            ToolMessage(content="Entering search criteria agent", tool_call_id=tool_call_id),
+            AIMessage(content=f"Failed to parse search criteria. Error: {error}"),
+        ],
+    }
+
+
+def criteria_update(tool_call_id: str, new_search_criteria: Dict[str, Any]) -> Dict[str, Any]:
     response_message = "I've updated your search criteria based on your request. Here's what I understood:\n"
     for key, value in new_search_criteria.items():
         if value is not None:
@@ -85,4 +95,28 @@ def search_criteria_agent(state: AgentState) -> Dict[str, Any]:
             ToolMessage(content="Entering search criteria agent.", tool_call_id=tool_call_id),
             AIMessage(content=response_message),
         ],
-    }
\ No newline at end of file
+    }
+
+
+def search_criteria_agent(state: AgentState) -> Dict[str, Any]:
+    tool_call_id, user_query, current_criteria, messages = prepare_criteria_request(state)
+
+    try:
+        response = parse_locally(user_query) or structured_llm.invoke(messages)
+        new_search_criteria = response.dict(exclude_none=True)
+    except Exception as e:
+        return criteria_error_update(tool_call_id, current_criteria, e)
+
+    return criteria_update(tool_call_id, new_search_criteria)
+
+
+async def asearch_criteria_agent(state: AgentState) -> Dict[str, Any]:
+    tool_call_id, user_query, current_criteria, messages = prepare_criteria_request(state)
+
+    try:
+        response = parse_locally(user_query) or await structured_llm.ainvoke(messages)
+        new_search_criteria = response.dict(exclude_none=True)
+    except Exception as e:
+        return criteria_error_update(tool_call_id, current_criteria, e)
+
+    return criteria_update(tool_call_id, new_search_criteria)
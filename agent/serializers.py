@@ -1,7 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from .models import ChromaLoadJob, ConversationMessage
+
 
 class ChromaLoadRequestSerializer(serializers.Serializer):
     table = serializers.CharField(help_text="Name of the collection to create in ChromaDB")
@@ -24,6 +27,69 @@ class ChromaLoadRequestSerializer(serializers.Serializer):
         allow_empty=True,
         allow_null=True
     )
+    mode = serializers.ChoiceField(
+        choices=["incremental", "full"],
+        default="incremental",
+        help_text="incremental re-embeds only changed rows; full re-embeds every row"
+    )
+    watermark_column = serializers.CharField(
+        required=False,
+        allow_null=True,
+        help_text="Monotonic column (e.g. updated_at); incremental syncs read only rows past its last value"
+    )
+    embed_batch_size = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Documents per embedding batch (defaults to EMBEDDING_BATCH_SIZE)"
+    )
+    workers = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        help_text="Embedding worker processes; 0 or 1 embeds in-process (defaults to EMBEDDING_WORKERS)"
+    )
+
+
+class ChromaFetchQuerySerializer(serializers.Serializer):
+    collection = serializers.CharField(required=False, help_text="Collection to page through; omit to stream every collection")
+    offset = serializers.IntegerField(required=False, default=0, min_value=0)
+    limit = serializers.IntegerField(required=False, default=100, min_value=1)
+    include = serializers.CharField(
+        required=False,
+        default="documents,metadatas",
+        help_text="Comma-separated fields to return: documents, metadatas, embeddings"
+    )
+
+    def validate_limit(self, value):
+        return min(value, settings.CHROMA_FETCH_MAX_LIMIT)
+
+    def validate_include(self, value):
+        from .chroma_fetcher import FETCH_FIELDS
+
+        include = [field.strip() for field in value.split(",") if field.strip()]
+        unknown = [field for field in include if field not in FETCH_FIELDS]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown fields: {', '.join(unknown)}")
+        return include
+
+
+class ChromaLoadJobSerializer(serializers.ModelSerializer):
+    rows_per_sec = serializers.SerializerMethodField()
+    eta_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChromaLoadJob
+        fields = [
+            'id', 'collection', 'status', 'cancel_requested', 'rows_total', 'rows_read', 'rows_embedded',
+            'rows_written', 'rows_per_sec', 'eta_seconds', 'report', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
+
+    def get_rows_per_sec(self, obj):
+        from .chroma_jobs import job_progress
+        return job_progress(obj)["rows_per_sec"]
+
+    def get_eta_seconds(self, obj):
+        from .chroma_jobs import job_progress
+        return job_progress(obj)["eta_seconds"]
 
 
 class UserDetailsSerializer(serializers.Serializer):
@@ -66,5 +132,11 @@ class MessageSerializer(serializers.Serializer):
     content = serializers.CharField()
 
 
+class ConversationMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConversationMessage
+        fields = ['seq', 'role', 'content', 'node', 'created_at']
+
+
 class StateMessagesOutSerializer(StateBaseSerializer):
     messages = serializers.ListField(child=serializers.CharField()) 
\ No newline at end of file
@@ -0,0 +1,153 @@
+import json
+
+from django.http import StreamingHttpResponse
+from langchain_core.messages import AIMessageChunk, ToolMessage
+from psycopg import OperationalError
+
+from agent.transcript import arollback_transcript, atranscript_position, rollback_transcript, transcript_position
+
+
+# Nodes whose LLM output is the user-facing answer; the criteria node streams raw JSON
+TOKEN_NODES = {"main_agent", "search_database_agent", "appointment_agent"}
+STREAM_MODES = ["messages", "updates"]
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _as_list(messages):
+    if messages is None:
+        return []
+    return messages if isinstance(messages, list) else [messages]
+
+
+def _update_events(node: str, update) -> list:
+    data = {"node": node}
+    if isinstance(update, dict) and update.get("context_stats"):
+        data["context_stats"] = update["context_stats"]
+    events = [sse_event("node", data)]
+    messages = update.get("messages") if isinstance(update, dict) else None
+    for message in _as_list(messages):
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            events.append(sse_event("tool_call", {"node": node, "tool": tool_call["name"], "args": tool_call["args"]}))
+        if isinstance(message, ToolMessage):
+            events.append(sse_event("tool_result", {"node": node, "tool": message.name, "tool_call_id": message.tool_call_id}))
+    return events
+
+
+def _chunk_events(mode: str, chunk) -> list:
+    if mode == "messages":
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        if node in TOKEN_NODES and isinstance(message, AIMessageChunk) and isinstance(message.content, str) and message.content:
+            return [sse_event("token", {"node": node, "content": message.content})]
+        return []
+
+    events = []
+    for node, update in chunk.items():
+        events.extend(_update_events(node, update))
+    return events
+
+
+def stream_graph_events(graph, state, config):
+    """
+    Runs the graph and yields SSE events as they happen: `token` for LLM deltas of the
+    answering nodes, `node`/`tool_call`/`tool_result` for progress and a final `done`
+    with the same answer the JSON chat endpoint returns.
+    """
+    graph_input = state
+    while True:
+        for mode, chunk in graph.stream(graph_input, config=config, stream_mode=STREAM_MODES):
+            yield from _chunk_events(mode, chunk)
+
+        snapshot = graph.get_state(config)
+        if not snapshot.next:
+            break
+        # Pending tool calls are always approved, as in AgentChatView.get_human_approval
+        graph_input = None
+
+    yield sse_event("done", {"result": snapshot.values["messages"][-1].content})
+
+
+async def astream_graph_events(graph, state, config):
+    """Async version of stream_graph_events for the graph compiled with AsyncPostgresSaver."""
+    graph_input = state
+    while True:
+        async for mode, chunk in graph.astream(graph_input, config=config, stream_mode=STREAM_MODES):
+            for event in _chunk_events(mode, chunk):
+                yield event
+
+        snapshot = await graph.aget_state(config)
+        if not snapshot.next:
+            break
+        graph_input = None
+
+    yield sse_event("done", {"result": snapshot.values["messages"][-1].content})
+
+
+def sse_response(graph_factory, rebuild_graph, state, config):
+    """
+    Streams the graph run as text/event-stream for WSGI; ASGI requests use async_sse_response.
+    A dropped checkpointer connection is retried on a rebuilt graph only while nothing has been sent yet;
+    transcript rows the failed attempt wrote are rolled back first.
+    """
+    def events():
+        sent = False
+        position = transcript_position(state["thread_id"])
+        try:
+            for event in stream_graph_events(graph_factory(), state, config):
+                sent = True
+                yield event
+        except OperationalError as e:
+            print("OperationalError during graph streaming:", e)
+            if sent:
+                yield sse_event("error", {"detail": "Connection to the checkpointer was lost."})
+                return
+            try:
+                rollback_transcript(state["thread_id"], position)
+                yield from stream_graph_events(rebuild_graph(), state, config)
+            except Exception as e:
+                print(f"Error streaming agent response: {e}")
+                yield sse_event("error", {"detail": "An error occurred while processing the request."})
+        except Exception as e:
+            print(f"Error streaming agent response: {e}")
+            yield sse_event("error", {"detail": "An error occurred while processing the request."})
+
+    return event_stream_response(events())
+
+
+def async_sse_response(get_graph, rebuild_graph, state, config):
+    """sse_response for ASGI: an async iterator, so no worker thread is held while streaming."""
+    async def events():
+        sent = False
+        position = await atranscript_position(state["thread_id"])
+        try:
+            async for event in astream_graph_events(await get_graph(), state, config):
+                sent = True
+                yield event
+        except OperationalError as e:
+            print("OperationalError during async graph streaming:", e)
+            if sent:
+                yield sse_event("error", {"detail": "Connection to the checkpointer was lost."})
+                return
+            try:
+                await arollback_transcript(state["thread_id"], position)
+                async for event in astream_graph_events(await rebuild_graph(), state, config):
+                    yield event
+            except Exception as e:
+                print(f"Error streaming agent response: {e}")
+                yield sse_event("error", {"detail": "An error occurred while processing the request."})
+        except Exception as e:
+            print(f"Error streaming agent response: {e}")
+            yield sse_event("error", {"detail": "An error occurred while processing the request."})
+
+    return event_stream_response(events())
+
+
+def event_stream_response(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,3 +1,617 @@
-from django.test import TestCase
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .criteria_parser import evaluate_corpus, parse_search_criteria
+
+
+CORPUS = Path(__file__).resolve().parent / "fixtures" / "criteria_parser_corpus.json"
+
+
+class CriteriaParserTests(SimpleTestCase):
+
+    def test_parses_mixed_criteria(self):
+        criteria, confident = parse_search_criteria("3 комнаты до 40 млн, от 5 этажа")
+
+        self.assertTrue(confident)
+        self.assertEqual(criteria, {"min_rooms": 3, "max_rooms": 3, "max_price": 40000000.0, "min_floor": 5})
+
+    def test_unexplained_numbers_fall_back_to_llm(self):
+        self.assertFalse(parse_search_criteria("в блоке 5")[1])
+        self.assertFalse(parse_search_criteria("примерно 40 млн")[1])
+
+    def test_negated_comparisons_flip_direction(self):
+        self.assertEqual(parse_search_criteria("не больше 10 этажа"), ({"max_floor": 10}, True))
+        self.assertEqual(parse_search_criteria("не дешевле 20 млн"), ({"min_price": 20000000.0}, True))
+        self.assertFalse(parse_search_criteria("1 этаж не подходит")[1])
+        self.assertFalse(parse_search_criteria("50 тыс долларов")[1])
+
+    def test_corpus_precision_and_coverage(self):
+        report = evaluate_corpus(CORPUS)
+
+        # A wrong confident parse silently changes the search, so precision must stay perfect
+        self.assertEqual(report["mistakes"], [])
+        self.assertGreaterEqual(report["coverage"], 0.6)
+
+
+class StreamGraphEventsTests(SimpleTestCase):
+
+    class FakeGraph:
+        def stream(self, graph_input, config, stream_mode):
+            from langchain_core.messages import AIMessage, AIMessageChunk
+
+            yield "messages", (AIMessageChunk(content="criteria json"), {"langgraph_node": "search_criteria_agent"})
+            yield "updates", {"main_agent": {"messages": AIMessage(content="", tool_calls=[
+                {"name": "ToSearchCriteriaAgent", "args": {"request": "3 комнаты"}, "id": "call-1"}
+            ])}}
+            yield "messages", (AIMessageChunk(content="Нашла "), {"langgraph_node": "main_agent"})
+            yield "messages", (AIMessageChunk(content="5 квартир"), {"langgraph_node": "main_agent"})
+
+        def get_state(self, config):
+            from types import SimpleNamespace
+            from langchain_core.messages import AIMessage
+
+            return SimpleNamespace(next=(), values={"messages": [AIMessage(content="Нашла 5 квартир")]})
+
+    def test_forwards_answer_tokens_progress_and_final_answer(self):
+        from .streaming import stream_graph_events
+
+        events = list(stream_graph_events(self.FakeGraph(), {}, {"configurable": {"thread_id": "1"}}))
+        names = [event.split("\n", 1)[0] for event in events]
+
+        self.assertEqual(names, [
+            "event: node", "event: tool_call", "event: token", "event: token", "event: done"
+        ])
+        self.assertIn('"result": "Нашла 5 квартир"', events[-1])
+
+    def test_retry_rolls_back_the_failed_attempts_transcript(self):
+        from unittest.mock import MagicMock
+
+        from psycopg import OperationalError
+
+        from .streaming import sse_response
+
+        broken = MagicMock()
+        broken.stream.side_effect = OperationalError("server closed the connection")
+        state = {"thread_id": "1"}
+
+        with patch("agent.streaming.transcript_position", return_value=4), \
+                patch("agent.streaming.rollback_transcript") as rollback:
+            response = sse_response(lambda: broken, self.FakeGraph, state, {"configurable": {"thread_id": "1"}})
+            content = "".join(chunk.decode() for chunk in response)
+
+        rollback.assert_called_once_with("1", 4)
+        self.assertIn('"result": "Нашла 5 квартир"', content)
+
+    def test_stream_view_uses_astream_under_asgi(self):
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        from django.test import AsyncRequestFactory
+
+        from .views import AgentChatStreamView
+
+        graph = AsyncAgentChatViewTests.FakeGraph()
+        request = AsyncRequestFactory().post(
+            "/agent/chat/stream/", data=AsyncAgentChatViewTests.body, content_type="application/json"
+        )
+
+        async def consume(response):
+            return "".join([chunk.decode() async for chunk in response])
+
+        with patch("agent.views.AsyncGraphRegistry") as registry, patch("agent.views.GraphRegistry") as sync_registry, \
+                patch("agent.streaming.atranscript_position", AsyncMock(return_value=0)):
+            registry.get_graph = AsyncMock(return_value=graph)
+            response = AgentChatStreamView.as_view()(request)
+            content = asyncio.run(consume(response))
+
+        sync_registry.get_graph.assert_not_called()
+        self.assertLess(content.index("event: token"), content.index("event: done"))
+
+
+class ContextManagerTests(SimpleTestCase):
+
+    def build_history(self, turns):
+        from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+        messages = []
+        for turn in range(turns):
+            messages += [
+                HumanMessage(content=f"вопрос {turn}", id=f"h{turn}"),
+                AIMessage(content="", id=f"c{turn}", tool_calls=[{"name": "search", "args": {}, "id": f"call{turn}"}]),
+                ToolMessage(content="ЖК " * 1000, tool_call_id=f"call{turn}", id=f"t{turn}"),
+                AIMessage(content=f"ответ {turn}", id=f"a{turn}"),
+            ]
+        return messages
+
+    @override_settings(
+        AGENT_CONTEXT_MAX_TURNS=3, AGENT_CONTEXT_KEEP_TURNS=2,
+        AGENT_CONTEXT_TOOL_OUTPUT_CHARS=100, AGENT_CONTEXT_SUMMARY=False,
+    )
+    def test_drops_old_turns_and_trims_tool_outputs_outside_current_turn(self):
+        from langchain_core.messages import RemoveMessage
+        from .context_manager import TRIM_MARKER, manage_context
+
+        update = manage_context({"messages": self.build_history(5)})
+
+        removed = [message.id for message in update["messages"] if isinstance(message, RemoveMessage)]
+        trimmed = [message for message in update["messages"] if not isinstance(message, RemoveMessage)]
+        self.assertEqual(removed, [f"{prefix}{turn}" for turn in range(3) for prefix in "hcta"])
+        self.assertEqual([message.id for message in trimmed], ["t3"])
+        self.assertTrue(trimmed[0].content.endswith(TRIM_MARKER))
+        self.assertGreater(update["context_stats"]["tokens_saved"], 0)
+        self.assertEqual(update["context_stats"]["messages_kept"], 8)
+
+
+class ChromaSyncDocumentTests(SimpleTestCase):
+
+    def test_content_hash_changes_only_with_indexed_content(self):
+        from .chroma_loader import build_document
+
+        row = {"id": 7, "name": "ЖК Алатау", "description": "У гор", "district_id": 2, "price": None}
+        document = build_document(row, "id", ["name", "description"], ["district_id"], {"name": ""})
+
+        self.assertEqual(document.id, "7")
+        self.assertEqual(document.text, "жк алатау\nу гор")
+        self.assertEqual(document.metadata["content_hash"], document.content_hash)
+        self.assertEqual(
+            build_document({**row, "price": 1}, "id", ["name", "description"], ["district_id"], {"name": ""}).content_hash,
+            document.content_hash,
+        )
+        self.assertNotEqual(
+            build_document({**row, "description": "У реки"}, "id", ["name", "description"], ["district_id"], {"name": ""}).content_hash,
+            document.content_hash,
+        )
+
+
+class CriteriaEvaluatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from location.models import City, District
+        from properties.models import Block, Property, ResidentialComplex
+
+        district = District.objects.create(city=City.objects.create(name="Алматы"), name="Медеуский")
+        complex_ = ResidentialComplex.objects.create(
+            district=district, name="ЖК Тест", address="Адрес", class_type="COMFORT",
+            construction_technology="MONOLITHIC", heating_type="CENTRAL", ceiling_height=3, block_number=1,
+        )
+        block = Block.objects.create(complex=complex_, total_floors=12, link_on_map="https://2gis.kz")
+        # Prices (area * 500 000): 20, 30, 40 and 50 million
+        for number, (floor, area, rooms) in enumerate([(2, 40, 1), (5, 60, 2), (9, 80, 3), (12, 100, 3)]):
+            Property.objects.create(
+                block=block, category="APARTMENT", number=number, floor=floor, area=area, rooms=rooms, price_per_sqm=500000,
+            )
+
+    def test_counts_relaxations_and_message_from_one_query(self):
+        from properties.models import Property
+
+        from .criteria_db_query_node import build_no_results_message
+        from .criteria_evaluator import evaluate_criteria, relaxation_suggestions
+
+        criteria = {"min_floor": 5, "min_rooms": 3, "max_price": 35000000, "max_area": None}
+        with self.assertNumQueries(1):
+            evaluation = evaluate_criteria(Property.objects.filter(is_available=True), criteria)
+
+        self.assertEqual((evaluation["total"], evaluation["matched"]), (4, 0))
+        self.assertEqual(
+            [(item["key"], item["prefix"], item["only"], item["without"]) for item in evaluation["criteria"]],
+            [("min_floor", 3, 3, 0), ("min_rooms", 2, 2, 1), ("max_price", 0, 2, 2)],
+        )
+        self.assertEqual(evaluation["first_empty"]["key"], "max_price")
+        self.assertEqual([item["key"] for item in relaxation_suggestions(evaluation)], ["max_price", "min_rooms"])
+
+        message = build_no_results_message(evaluation).split("\n")
+        self.assertEqual(message[1:], [
+            "Объекты заканчиваются на критерии «цена до 35000000 тг».",
+            "Если убрать критерий «цена до 35000000 тг», будет найдено объектов: 2.",
+            "Если убрать критерий «комнат от 3», будет найдено объектов: 1.",
+        ])
+
+
+class VectorUpdateQueueTests(SimpleTestCase):
+
+    @override_settings(CHROMA_UPDATE_FLUSH_INTERVAL=0, CHROMA_UPDATE_MAX_BATCH=100, CHROMA_REALTIME_UPDATES=True)
+    def test_repeated_changes_are_coalesced(self):
+        from .vector_updates import VectorUpdateQueue
+
+        with patch.object(VectorUpdateQueue, "_ensure_worker"):
+            for row_id in (1, 2, 1, 1):
+                VectorUpdateQueue.enqueue("residential_complexes", "id", row_id)
+            self.assertEqual(VectorUpdateQueue.status()["pending"], {"residential_complexes": 2})
+            self.assertEqual(list(VectorUpdateQueue._take()["residential_complexes"]), [1, 2])
+            self.assertEqual(VectorUpdateQueue.status()["queue_depth"], 0)
+
+    @override_settings(CHROMA_UPDATE_FLUSH_INTERVAL=0, CHROMA_UPDATE_MAX_BATCH=2, CHROMA_REALTIME_UPDATES=True)
+    def test_failed_batches_are_requeued_with_their_queued_at(self):
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+
+        from .vector_updates import VectorUpdateQueue
+
+        state = SimpleNamespace(sql_table="districts", id_column="id", text_columns=["name"])
+        loader = MagicMock()
+        loader.sync_ids.side_effect = [{"upserted": 2, "deleted": 0}, RuntimeError("chroma is down")]
+
+        with patch.object(VectorUpdateQueue, "_ensure_worker"), \
+                patch.dict(VectorUpdateQueue._pk_columns, {"districts": "id"}), \
+                patch("agent.models.ChromaSyncState.objects") as states, \
+                patch("agent.chroma_loader.ChromaDBLoader", return_value=loader):
+            states.filter.return_value = [state]
+            failed = VectorUpdateQueue.flush({"districts": {1: 10.0, 2: 11.0, 3: 12.0}})
+            self.assertEqual(failed, {"districts": {3: 12.0}})
+
+            VectorUpdateQueue.enqueue("districts", "id", 3)
+            VectorUpdateQueue._requeue("districts", failed["districts"])
+            self.assertEqual(VectorUpdateQueue._take(), {"districts": {3: 12.0}})
+
+
+class BackgroundWorkersTests(SimpleTestCase):
+
+    @override_settings(AGENT_BACKGROUND_WORKERS=False, AGENT_WARM_UP=True, AGENT_CHECKPOINT_SWEEP_INTERVAL=60, CHROMA_REALTIME_UPDATES=True)
+    def test_management_commands_start_no_threads(self):
+        from django.apps import apps
+
+        with patch("agent.checkpoint_retention.CheckpointSweeper.start") as start_sweeper, \
+                patch("agent.vector_updates.connect_signals") as connect_vector_signals, \
+                patch("threading.Thread") as thread:
+            apps.get_app_config("agent").ready()
+
+        start_sweeper.assert_not_called()
+        connect_vector_signals.assert_not_called()
+        thread.assert_not_called()
+
+    @override_settings(AGENT_BACKGROUND_WORKERS=True, AGENT_WARM_UP=False, AGENT_CHECKPOINT_SWEEP_INTERVAL=60, CHROMA_REALTIME_UPDATES=True)
+    def test_server_starts_the_sweeper_and_vector_updates(self):
+        from django.apps import apps
+
+        with patch("agent.checkpoint_retention.CheckpointSweeper.start") as start_sweeper, \
+                patch("agent.vector_updates.connect_signals") as connect_vector_signals:
+            apps.get_app_config("agent").ready()
+
+        start_sweeper.assert_called_once()
+        connect_vector_signals.assert_called_once()
+
+    def test_ts_bound_sorts_like_saver_timestamps(self):
+        from datetime import datetime, timedelta, timezone
+
+        from .checkpoint_retention import checkpoint_ts_bound
+
+        bound = checkpoint_ts_bound(timedelta(days=90))
+        older = (datetime.now(timezone.utc) - timedelta(days=91)).isoformat()
+        newer = (datetime.now(timezone.utc) - timedelta(days=89)).replace(microsecond=0).isoformat()
+        self.assertTrue(bound.endswith("+00:00"))
+        self.assertLess(older, bound)
+        self.assertGreater(newer, bound)
+
+
+class AgentGraphHealthViewTests(SimpleTestCase):
+
+    def get(self, async_pool):
+        from unittest.mock import MagicMock
+
+        from rest_framework.test import APIRequestFactory
+
+        from .graph_builder import AsyncGraphRegistry
+        from .views import AgentGraphHealthView
+
+        sync_stats = {"built": True, "built_at": 1.0, "rebuilds": 0, "healthy": True, "pool": {"pool_size": 2}}
+        with patch("agent.views.GraphRegistry") as registry, \
+                patch.multiple(AsyncGraphRegistry, _graph=MagicMock() if async_pool else None, _pool=async_pool, _rebuilds=3):
+            registry.stats.return_value = sync_stats
+            return AgentGraphHealthView.as_view()(APIRequestFactory().get("/agent/health/"))
+
+    def test_reports_async_pool_and_rebuilds(self):
+        from unittest.mock import MagicMock
+
+        pool = MagicMock(closed=False)
+        pool.get_stats.return_value = {"pool_size": 4, "requests_waiting": 0}
+        response = self.get(pool)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["async"]["rebuilds"], 3)
+        self.assertEqual(response.data["async"]["pool"], {"pool_size": 4, "requests_waiting": 0})
+
+    def test_closed_async_pool_is_unavailable(self):
+        from unittest.mock import MagicMock
+
+        response = self.get(MagicMock(closed=True))
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.data["async"]["healthy"])
+
+    def test_unbuilt_async_registry_is_healthy(self):
+        response = self.get(None)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["async"]["built"])
+
+
+class EmbeddingPipelineTests(SimpleTestCase):
+
+    @override_settings(EMBEDDING_BATCH_SIZE=2, EMBEDDING_WORKERS=0, EMBEDDING_QUEUE_SIZE=1, EMBEDDING_MODEL="test-model")
+    def test_documents_are_embedded_and_written_in_batches(self):
+        from unittest.mock import MagicMock
+
+        from .chroma_loader import build_document
+        from .embedding_pipeline import EmbeddingPipeline
+        from .embeddings import EmbeddingModelRegistry
+
+        model = MagicMock()
+        model._get_text_embeddings.side_effect = lambda texts: [[float(len(text))] for text in texts]
+        collection = MagicMock()
+        documents = [build_document({"id": row_id, "name": f"ЖК {row_id}"}, "id", ["name"]) for row_id in range(5)]
+
+        with patch.object(EmbeddingModelRegistry, "get_model", return_value=model):
+            pipeline = EmbeddingPipeline(collection)
+            pipeline.submit(documents[:3])
+            pipeline.submit(documents[3:])
+            report = pipeline.close()
+
+        self.assertEqual([len(call.args[0]) for call in model._get_text_embeddings.call_args_list], [2, 2, 1])
+        written = [doc_id for call in collection.upsert.call_args_list for doc_id in call.kwargs["ids"]]
+        self.assertEqual(written, [doc.id for doc in documents])
+        self.assertEqual(report["written"], 5)
+        self.assertIn("docs_per_sec", report)
+
+    @override_settings(EMBEDDING_BATCH_SIZE=2, EMBEDDING_WORKERS=0, EMBEDDING_QUEUE_SIZE=1, EMBEDDING_MODEL="test-model")
+    def test_close_reports_while_draining_and_raises_after_stopping(self):
+        import time
+        from unittest.mock import MagicMock
+
+        from .chroma_loader import build_document
+        from .embedding_pipeline import EmbeddingPipeline
+        from .embeddings import EmbeddingModelRegistry
+
+        model = MagicMock()
+        model._get_text_embeddings.side_effect = lambda texts: [[1.0] for _ in texts]
+        collection = MagicMock()
+        collection.upsert.side_effect = lambda **kwargs: time.sleep(0.2)
+        heartbeats = []
+
+        def on_wait():
+            heartbeats.append(time.time())
+            raise RuntimeError("cancelled")
+
+        with patch.object(EmbeddingModelRegistry, "get_model", return_value=model):
+            pipeline = EmbeddingPipeline(collection)
+            pipeline.submit([build_document({"id": row_id, "name": "ЖК"}, "id", ["name"]) for row_id in range(4)])
+            with self.assertRaisesMessage(RuntimeError, "cancelled"):
+                pipeline.close(on_wait=on_wait, wait_interval=0.05)
+
+        self.assertEqual(len(heartbeats), 1)
+        self.assertEqual(pipeline.stats["written"], 4)
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+
+    def test_each_text_is_embedded_once(self):
+        import tempfile
+
+        from llama_index.core import MockEmbedding
+
+        from .embedding_cache import CachedEmbedding, EmbeddingCache
+
+        class CountingEmbedding(MockEmbedding):
+            calls: list = []
+
+            def _get_text_embeddings(self, texts):
+                self.calls.append(list(texts))
+                return [[float(len(text)), 1.0] for text in texts]
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                EMBEDDING_CACHE_PATH=f"{directory}/cache.sqlite3", EMBEDDING_CACHE_MAX_ENTRIES=2, EMBEDDING_CACHE_EVICT_EVERY=1
+        ):
+            inner = CountingEmbedding(embed_dim=2)
+            model = CachedEmbedding(inner, model_name="test-model")
+
+            first = model.get_text_embedding_batch(["алматы", "астана"])
+            second = model.get_text_embedding_batch(["астана", "алматы  "])
+
+            self.assertEqual(inner.calls, [["алматы", "астана"]])
+            self.assertEqual(second, first[::-1])
+
+            model.get_text_embedding_batch(["шымкент"])
+            self.assertGreaterEqual(EmbeddingCache.stats()["evictions"], 1)
+            self.assertEqual(EmbeddingCache.stats()["entries"], 2)
+            EmbeddingCache._local.connection.close()
+            del EmbeddingCache._local.connection
+
+
+class ChromaLoadJobProgressTests(SimpleTestCase):
+
+    def test_eta_is_estimated_from_read_rate(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from .chroma_jobs import job_progress
+        from .models import ChromaLoadJob
+
+        job = ChromaLoadJob(
+            collection="complexes", status="running", rows_total=1000, rows_read=250,
+            started_at=timezone.now() - timedelta(seconds=10),
+        )
+        progress = job_progress(job)
+
+        self.assertAlmostEqual(progress["rows_per_sec"], 25, delta=1)
+        self.assertAlmostEqual(progress["eta_seconds"], 30, delta=2)
+        self.assertEqual(job_progress(ChromaLoadJob(collection="complexes")), {"rows_per_sec": None, "eta_seconds": None})
+
+
+class ChromaFetcherTests(SimpleTestCase):
+
+    @override_settings(CHROMA_FETCH_BATCH_SIZE=2)
+    def test_collections_stream_as_json_page_by_page(self):
+        import json
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+
+        from .chroma_fetcher import ChromaDBFetcher
+        from .vector_db import VectorDBConnection
+
+        ids = ["1", "2", "3"]
+
+        def get(offset, limit, include):
+            page = ids[offset:offset + limit]
+            return {"ids": page, "documents": [f"doc {doc_id}" for doc_id in page], "metadatas": [None] * len(page)}
+
+        collection = MagicMock()
+        collection.get.side_effect = get
+        client = MagicMock()
+        client.list_collections.return_value = [SimpleNamespace(name="complexes")]
+        client.get_collection.return_value = collection
+
+        with patch.object(VectorDBConnection, "get_client", return_value=client):
+            data = json.loads("".join(ChromaDBFetcher().stream_all_collections()))
+
+        self.assertEqual([record["id"] for record in data["complexes"]], ids)
+        self.assertEqual(data["complexes"][0], {"id": "1", "text": "doc 1", "metadata": {}})
+        self.assertEqual([call.kwargs["offset"] for call in collection.get.call_args_list], [0, 2])
+        self.assertTrue(all(call.kwargs["include"] == ["documents", "metadatas"] for call in collection.get.call_args_list))
+
+    def test_failed_collection_is_reported_in_the_stream(self):
+        import json
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock
+
+        from .chroma_fetcher import STREAM_ERRORS_KEY, ChromaDBFetcher
+        from .vector_db import VectorDBConnection
+
+        broken = MagicMock()
+        broken.get.side_effect = RuntimeError("connection reset")
+        client = MagicMock()
+        client.list_collections.return_value = [SimpleNamespace(name="complexes")]
+        client.get_collection.return_value = broken
+
+        with patch.object(VectorDBConnection, "get_client", return_value=client):
+            data = json.loads("".join(ChromaDBFetcher().stream_all_collections()))
+
+        self.assertEqual(data["complexes"], [])
+        self.assertEqual(data[STREAM_ERRORS_KEY], {"complexes": "connection reset"})
+
+
+class ComplexNameResolverTests(SimpleTestCase):
+
+    def test_containment_needs_a_single_long_enough_match(self):
+        from .complex_resolver import ComplexNameResolver
+
+        names = {"хан тенгри": [1], "алтын ай": [2], "алтын сити": [3], "нурлы тау": [4]}
+        with patch.object(ComplexNameResolver, "_get_name_index", return_value=names):
+            self.assertEqual(ComplexNameResolver.match_name("ЖК «Хан Тенгри»"), [1])
+            self.assertEqual(ComplexNameResolver.match_name("тенгри"), [1])
+            self.assertEqual(ComplexNameResolver.match_name("нурлы тау 2 очередь"), [4])
+            self.assertEqual(ComplexNameResolver.match_name("алтын"), [])
+            self.assertEqual(ComplexNameResolver.match_name("ай"), [])
+
+
+class HybridRetrieverTests(SimpleTestCase):
+
+    def test_transliterations_and_typos_find_the_same_entry(self):
+        from .hybrid_retriever import Entry, LexicalIndex
+
+        index = LexicalIndex([
+            Entry("district", 1, "Алмалинский", "Алмалинский Алматы центр города"),
+            Entry("district", 2, "Бостандыкский", "Бостандыкский Алматы горы"),
+            Entry("complex", 10, "ЖК Хан Тенгри", "Хан Тенгри Бостандыкский бизнес класс"),
+        ])
+
+        for query in ["Almaly", "Алмалы", "алмалинский район"]:
+            self.assertEqual(index.search(query, "district", top_k=1)[0].id, 1, query)
+        self.assertEqual(index.search("Khan Tengri", "complex", top_k=1)[0].id, 10)
+        self.assertEqual(index.search("Bostandyk", top_k=1)[0].id, 2)
+        self.assertLess(max((hit.score for hit in index.search("asdfgh")), default=0), 0.35)
+
+    def test_in_place_updates_match_a_fresh_build(self):
+        from .hybrid_retriever import Entry, LexicalIndex
+
+        almaly = Entry("district", 1, "Алмалинский", "Алмалинский Алматы центр города")
+        bostandyk = Entry("district", 2, "Бостандыкский", "Бостандыкский Алматы горы")
+        index = LexicalIndex([almaly, Entry("district", 2, "Бостандык", "старое описание")])
+        index.add(Entry("complex", 10, "ЖК Хан Тенгри", "Хан Тенгри бизнес класс"))
+        index.add(bostandyk)
+        index.remove(("complex", 10))
+
+        fresh = LexicalIndex([almaly, bostandyk])
+        self.assertEqual(dict(index.term_postings), dict(fresh.term_postings))
+        self.assertEqual(dict(index.gram_postings), dict(fresh.gram_postings))
+        self.assertEqual(index.search("Алматы горы"), fresh.search("Алматы горы"))
+        self.assertEqual(index.search("Khan Tengri"), [])
+
+    def test_rank_fusion_prefers_agreement(self):
+        from .hybrid_retriever import RetrievalHit, fuse
+
+        lexical = [RetrievalHit("complex", 1, "A", 0.5, "lexical"), RetrievalHit("complex", 2, "B", 0.4, "lexical")]
+        vector = [RetrievalHit("complex", 2, "", 0.9, "vector"), RetrievalHit("complex", 3, "", 0.8, "vector")]
+
+        fused = fuse(lexical, vector, top_k=3)
+        self.assertEqual([hit.id for hit in fused], [2, 1, 3])
+        self.assertEqual(fused[0].name, "B")
+
+
+class AsyncAgentChatViewTests(SimpleTestCase):
+
+    class FakeGraph:
+        answer = "Здравствуйте!"
+
+        async def astream(self, graph_input, config=None, stream_mode=None):
+            from langchain_core.messages import AIMessage, AIMessageChunk
+
+            if isinstance(stream_mode, list):
+                yield "messages", (AIMessageChunk(content=self.answer), {"langgraph_node": "main_agent"})
+            else:
+                yield {"messages": [AIMessage(content=self.answer)]}
+
+        async def aget_state(self, config):
+            from types import SimpleNamespace
+
+            from langchain_core.messages import AIMessage
+
+            return SimpleNamespace(next=(), values={"messages": [AIMessage(content=self.answer)]})
+
+    body = {
+        "query": "Привет",
+        "user_details": {"user_telegram_id": 1},
+        "message_details": {"chat_id": 1, "created_at": "2025-01-01T10:00:00Z"},
+    }
+
+    async def post(self, body, path="/agent/chat/async/"):
+        from unittest.mock import AsyncMock
+
+        from django.test import AsyncRequestFactory
+
+        from .views import AsyncAgentChatView
+
+        request = AsyncRequestFactory().post(path, data=body, content_type="application/json")
+        with patch("agent.views.AsyncGraphRegistry") as registry, \
+                patch("agent.views.atranscript_position", AsyncMock(return_value=0)), \
+                patch("agent.streaming.atranscript_position", AsyncMock(return_value=0)):
+            registry.get_graph = AsyncMock(return_value=self.FakeGraph())
+            response = await AsyncAgentChatView.as_view()(request)
+            content = (
+                "".join([chunk.decode() async for chunk in response])
+                if response.streaming else response.content.decode()
+            )
+        return response, content
+
+    async def test_json_answer(self):
+        import json
+
+        response, content = await self.post(self.body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(content), {"result": "Здравствуйте!"})
+
+    async def test_stream_sends_tokens_then_done(self):
+        response, content = await self.post(self.body, path="/agent/chat/async/?stream=true")
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertLess(content.index("event: token"), content.index("event: done"))
+
+    async def test_invalid_body_is_rejected(self):
+        from django.test import AsyncRequestFactory
+
+        from .views import AsyncAgentChatView
+
+        request = AsyncRequestFactory().post("/agent/chat/async/", data=b"{", content_type="application/json")
+        response = await AsyncAgentChatView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,34 @@
+import threading
+
+from cachetools import TTLCache
+
+
+class ThreadTTLCache:
+    """
+    TTL cache scoped by conversation thread, so follow-up questions in the same
+    conversation reuse earlier lookups while other conversations never see them.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, thread_id: str, key, factory):
+        cache_key = (thread_id or "", key)
+        with self._lock:
+            if cache_key in self._cache:
+                self.hits += 1
+                return self._cache[cache_key]
+            self.misses += 1
+
+        value = factory()
+        with self._lock:
+            self._cache[cache_key] = value
+        return value
+
+    def clear_thread(self, thread_id: str):
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._cache if cache_key[0] == thread_id]:
+                self._cache.pop(cache_key, None)
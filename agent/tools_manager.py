@@ -1,6 +1,35 @@
-from .llm_tools import MainAgentTools
+import functools
 import inspect
 
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from langchain_core.tools import StructuredTool
+
+from .llm_tools import MainAgentTools
+
+
+def to_coroutine(func):
+    """
+    Async twin of a sync ORM-backed tool for the async graph. functools.wraps keeps the
+    signature, so StructuredTool still injects RunnableConfig into the coroutine.
+    """
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Pool threads keep their own connections; release them like the end of a request
+            close_old_connections()
+
+    # Not thread-sensitive: conversations run their tools on the thread pool side by side
+    # instead of queueing on Django's single sync thread
+    async_func = sync_to_async(call, thread_sensitive=False)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await async_func(*args, **kwargs)
+
+    return wrapper
+
 
 def get_main_tools_list() -> list:
     functions = inspect.getmembers(MainAgentTools, predicate=inspect.isfunction)
@@ -9,5 +38,9 @@ def get_main_tools_list() -> list:
 
 def get_database_tools_list() -> list:
     functions = inspect.getmembers(MainAgentTools, predicate=inspect.isfunction)
-    functions_list = [func for name, func in functions if not name.startswith('__')]
+    # StructuredTool keeps the injected RunnableConfig argument out of the schema sent to the LLM
+    functions_list = [
+        StructuredTool.from_function(func, coroutine=to_coroutine(func))
+        for name, func in functions if not name.startswith('__')
+    ]
     return functions_list
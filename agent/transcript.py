@@ -0,0 +1,103 @@
+import json
+from typing import List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+
+from agent.models import ConversationMessage
+
+
+APPEND_RETRIES = 3
+
+
+def append_transcript(thread_id: str, entries: List[Tuple[str, str, str]]):
+    """
+    Appends (role, content, node) entries to a thread's transcript. Sequence numbers continue
+    from the thread's last message; a concurrent append for the same thread is retried.
+    Transcript failures are logged and never break the conversation.
+    """
+    entries = [(role, content, node) for role, content, node in entries if isinstance(content, str) and content]
+    if not thread_id or not entries:
+        return
+
+    for _ in range(APPEND_RETRIES):
+        try:
+            with transaction.atomic():
+                last_seq = ConversationMessage.objects.filter(thread_id=thread_id).aggregate(last=Max("seq"))["last"] or 0
+                ConversationMessage.objects.bulk_create([
+                    ConversationMessage(thread_id=thread_id, seq=last_seq + offset, role=role, content=content, node=node or "")
+                    for offset, (role, content, node) in enumerate(entries, start=1)
+                ])
+            return
+        except IntegrityError:
+            continue
+        except Exception as e:
+            print(f"Failed to write transcript for thread {thread_id}: {e}")
+            return
+    print(f"Failed to write transcript for thread {thread_id}: sequence conflict")
+
+
+aappend_transcript = sync_to_async(append_transcript)
+
+
+def transcript_position(thread_id: str) -> Optional[int]:
+    """Seq of the thread's last message, taken before a turn runs so a failed attempt can be rolled back."""
+    try:
+        return ConversationMessage.objects.filter(thread_id=thread_id).aggregate(last=Max("seq"))["last"] or 0
+    except Exception as e:
+        print(f"Failed to read transcript position for thread {thread_id}: {e}")
+        return None
+
+
+def rollback_transcript(thread_id: str, position: Optional[int]):
+    """Deletes what a failed attempt of a turn appended after `position`, so its retry does not write it twice."""
+    if not thread_id or position is None:
+        return
+    try:
+        ConversationMessage.objects.filter(thread_id=thread_id, seq__gt=position).delete()
+    except Exception as e:
+        print(f"Failed to roll back transcript for thread {thread_id}: {e}")
+
+
+atranscript_position = sync_to_async(transcript_position)
+arollback_transcript = sync_to_async(rollback_transcript)
+
+
+def transcript_from_checkpoints(thread_id: str) -> List[Tuple[str, str, str]]:
+    """Rebuilds a thread's dialogue from checkpoint metadata, for threads that predate the transcript table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT metadata
+            FROM public.checkpoints
+            WHERE thread_id = %s
+            ORDER BY (metadata->>'step')::int ASC;
+            """,
+            [thread_id]
+        )
+        rows = cursor.fetchall()
+
+    entries = []
+    for (metadata,) in rows:
+        if isinstance(metadata, str):
+            try:
+                metadata = json.loads(metadata)
+            except Exception as err:
+                print("Error parsing metadata:", err)
+                continue
+
+        writes = metadata.get("writes")
+        if not writes:
+            continue
+
+        for key in ["__start__", "main_agent"]:
+            if not writes.get(key):
+                continue
+            messages = writes[key].get("messages", [])
+            for message in messages if isinstance(messages, list) else [messages]:
+                kwargs = message.get("kwargs") or {}
+                role, content = kwargs.get("type"), kwargs.get("content")
+                if role and content:
+                    entries.append((role, content, "" if key == "__start__" else key))
+    return entries
@@ -3,22 +3,34 @@ from agent.views import (
     ChromaFetchDataView,
     ChromaDeleteCollectionsView,
     ChromaResetView,
+    ChromaStatusView,
     AgentChatView,
+    AgentChatStreamView,
+    AsyncAgentChatView,
     ChromaLoadDataView,
+    ChromaLoadJobView,
+    ChromaLoadJobCancelView,
     StateDeleteMessagesView,
     StateGetSimpleConversationView,
     StateGetMessagesView,
-    StateGetGraphPngView
+    StateGetGraphPngView,
+    AgentGraphHealthView
 )
 
 app_name = 'agent'
 
 urlpatterns = [
+    path('chroma/', ChromaStatusView.as_view(), name='chroma_status'),
     path('chroma/load_data/', ChromaLoadDataView.as_view(), name='chroma_load_data'),
+    path('chroma/jobs/<uuid:job_id>/', ChromaLoadJobView.as_view(), name='chroma_load_job'),
+    path('chroma/jobs/<uuid:job_id>/cancel/', ChromaLoadJobCancelView.as_view(), name='chroma_load_job_cancel'),
     path('chroma/fetch_data/', ChromaFetchDataView.as_view(), name='chroma_fetch_data'),
     path('chroma/delete_collections/', ChromaDeleteCollectionsView.as_view(), name='chroma_delete_collections'),
     path('chroma/reset/', ChromaResetView.as_view(), name='chroma_reset'),
     path('agent/chat/', AgentChatView.as_view(), name='agent-chat'),
+    path('agent/chat/stream/', AgentChatStreamView.as_view(), name='agent-chat-stream'),
+    path('agent/chat/async/', AsyncAgentChatView.as_view(), name='agent-chat-async'),
+    path('agent/health/', AgentGraphHealthView.as_view(), name='agent-health'),
     path('states/delete_all_messages/', StateDeleteMessagesView.as_view(), name='delete_all_messages'),
     path('states/get_simple_conversation/', StateGetSimpleConversationView.as_view(), name='get_simple_conversation'),
     path('states/get_messages/', StateGetMessagesView.as_view(), name='get_messages'),
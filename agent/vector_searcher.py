@@ -1,23 +1,65 @@
 # app/services/vector_searcher.py
+import threading
+
 from icecream import ic
 from llama_index.core import VectorStoreIndex
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.vector_stores.chroma import ChromaVectorStore
 
-from archiq_backend import settings
+from .embeddings import EmbeddingModelRegistry
 from .searcher_llm import SearcherLLM
 from .vector_db import VectorDBConnection
 
 
 class VectorSearcher:
+    # (collection_name, top_k) -> query engine, shared by every searcher in the process
+    _query_engines = {}
+    _lock = threading.Lock()
+
     def __init__(self, collection_name: str, top_k=3):
-        self.chroma_client = VectorDBConnection.get_client()
-        self.embed_model = HuggingFaceEmbedding(model_name=settings.EMBEDDING_MODEL)
-        self.chroma_collection = self.chroma_client.get_collection(collection_name)
-        self.vector_store = ChromaVectorStore(self.chroma_collection)
-        self.llm = SearcherLLM.get_llm()
-        self.index = VectorStoreIndex.from_vector_store(vector_store=self.vector_store, embed_model=self.embed_model, llm=self.llm)
-        self.query_engine = self.index.as_query_engine(similarity_top_k=top_k, verbose=True)
+        self.collection_name = collection_name
+        self.top_k = top_k
+        self.query_engine = self.get_query_engine(collection_name, top_k)
+
+    @classmethod
+    def get_query_engine(cls, collection_name: str, top_k=3):
+        key = (collection_name, top_k)
+        query_engine = cls._query_engines.get(key)
+        if query_engine is None:
+            with cls._lock:
+                query_engine = cls._query_engines.get(key)
+                if query_engine is None:
+                    query_engine = cls._build_query_engine(collection_name, top_k)
+                    cls._query_engines[key] = query_engine
+        return query_engine
+
+    @staticmethod
+    def _build_query_engine(collection_name: str, top_k: int):
+        chroma_collection = VectorDBConnection.get_client().get_collection(collection_name)
+        vector_store = ChromaVectorStore(chroma_collection)
+        index = VectorStoreIndex.from_vector_store(
+            vector_store=vector_store,
+            embed_model=EmbeddingModelRegistry.get_model(),
+            llm=SearcherLLM.get_llm()
+        )
+        return index.as_query_engine(similarity_top_k=top_k, verbose=True)
+
+    @classmethod
+    def invalidate(cls, collection_name: str = None):
+        """Drops cached query engines for a rewritten collection, or all of them."""
+        with cls._lock:
+            for key in list(cls._query_engines):
+                if collection_name is None or key[0] == collection_name:
+                    del cls._query_engines[key]
+
+    @classmethod
+    def warm_up(cls, collection_names, top_k=3):
+        EmbeddingModelRegistry.get_model()
+        for collection_name in collection_names:
+            try:
+                cls.get_query_engine(collection_name, top_k)
+                print(f"✅ Поисковый движок для коллекции '{collection_name}' готов")
+            except Exception as e:
+                print(f"⚠️ Не удалось подготовить коллекцию '{collection_name}': {e}")
 
     def search_vector(self, query):
         response = self.query_engine.query(query.lower())
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+
+class VectorUpdateQueue:
+    """
+    Coalesces model changes into per-collection sets of row ids and lets one background thread
+    flush them to Chroma in batches. A row changed many times between flushes is embedded once;
+    an update waits at most CHROMA_UPDATE_FLUSH_INTERVAL seconds (plus the flush itself).
+
+    A batch that fails to sync goes back into the queue with its original queued_at, and the worker
+    backs off exponentially (up to CHROMA_UPDATE_MAX_BACKOFF seconds) while failures continue.
+    """
+    _pending = defaultdict(dict)  # sql_table -> {row id: first queued at}
+    _pk_columns = {}  # sql_table -> column the queued ids belong to
+    _condition = threading.Condition()
+    _thread = None
+    _failures = 0  # consecutive failed flushes
+    _stats = {
+        "flushes": 0,
+        "rows_upserted": 0,
+        "rows_deleted": 0,
+        "errors": 0,
+        "rows_requeued": 0,
+        "last_error": None,
+        "last_flush_at": None,
+        "last_flush_seconds": None,
+    }
+
+    @classmethod
+    def enqueue(cls, sql_table: str, pk_column: str, row_id):
+        with cls._condition:
+            cls._pk_columns[sql_table] = pk_column
+            cls._pending[sql_table].setdefault(row_id, time.time())
+            cls._ensure_worker()
+            if cls.depth() >= settings.CHROMA_UPDATE_MAX_BATCH:
+                cls._condition.notify()
+
+    @classmethod
+    def depth(cls) -> int:
+        return sum(len(ids) for ids in cls._pending.values())
+
+    @classmethod
+    def _ensure_worker(cls):
+        if cls._thread is None or not cls._thread.is_alive():
+            cls._thread = threading.Thread(target=cls._run, name="chroma-vector-updates", daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _requeue(cls, sql_table: str, pending: dict):
+        """Puts ids that failed to sync back, keeping the earlier of the two times for ids queued again since."""
+        with cls._condition:
+            queued = cls._pending[sql_table]
+            for row_id, queued_at in pending.items():
+                queued[row_id] = min(queued_at, queued.get(row_id, queued_at))
+            cls._stats["rows_requeued"] += len(pending)
+
+    @classmethod
+    def backoff_seconds(cls) -> float:
+        if not cls._failures:
+            return 0.0
+        return min(max(settings.CHROMA_UPDATE_FLUSH_INTERVAL, 1) * 2 ** cls._failures, settings.CHROMA_UPDATE_MAX_BACKOFF)
+
+    @classmethod
+    def _take(cls) -> dict:
+        with cls._condition:
+            cls._condition.wait_for(lambda: cls.depth() > 0)
+            oldest = min(queued_at for ids in cls._pending.values() for queued_at in ids.values())
+            remaining = settings.CHROMA_UPDATE_FLUSH_INTERVAL - (time.time() - oldest)
+            if remaining > 0:
+                cls._condition.wait_for(lambda: cls.depth() >= settings.CHROMA_UPDATE_MAX_BATCH, timeout=remaining)
+            pending = {table: dict(ids) for table, ids in cls._pending.items() if ids}
+            cls._pending.clear()
+            return pending
+
+    @classmethod
+    def _run(cls):
+        while True:
+            # Requeued ids are already past the flush interval, so the wait after a failure is here
+            time.sleep(cls.backoff_seconds())
+            pending = cls._take()
+            started = time.time()
+            try:
+                failed = cls.flush(pending)
+            except Exception as e:
+                failed = pending
+                cls._record_error(e)
+            finally:
+                close_old_connections()
+            for table, ids in failed.items():
+                cls._requeue(table, ids)
+            cls._failures = cls._failures + 1 if failed else 0
+            cls._stats["flushes"] += 1
+            cls._stats["last_flush_at"] = time.time()
+            cls._stats["last_flush_seconds"] = round(time.time() - started, 3)
+
+    @classmethod
+    def _record_error(cls, error: Exception):
+        cls._stats["errors"] += 1
+        cls._stats["last_error"] = str(error)
+        print(f"Chroma vector update failed: {error}")
+
+    @classmethod
+    def flush(cls, pending: dict) -> dict:
+        """Syncs {sql_table: {row id: queued_at}} to Chroma; returns the ids of the batches that failed, in the same shape."""
+        from .chroma_loader import ChromaDBLoader
+        from .models import ChromaSyncState
+
+        states = ChromaSyncState.objects.filter(sql_table__in=list(pending))
+        loader = None
+        failed = {}
+        for state in states:
+            if not state.text_columns or state.id_column != cls._pk_columns.get(state.sql_table):
+                # Synced before the document spec was recorded (needs one load_data run first),
+                # or keyed by a column other than the primary key the signals report
+                continue
+            loader = loader or ChromaDBLoader()
+            ids = list(pending[state.sql_table])
+            batch_size = settings.CHROMA_UPDATE_MAX_BATCH
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                try:
+                    result = loader.sync_ids(state, batch)
+                except Exception as e:
+                    cls._record_error(e)
+                    failed.setdefault(state.sql_table, {}).update(
+                        (row_id, pending[state.sql_table][row_id]) for row_id in batch
+                    )
+                    continue
+                cls._stats["rows_upserted"] += result["upserted"]
+                cls._stats["rows_deleted"] += result["deleted"]
+        return failed
+
+    @classmethod
+    def status(cls) -> dict:
+        """Queue and flush counters of this worker process only; every process has its own queue."""
+        with cls._condition:
+            pending = {table: len(ids) for table, ids in cls._pending.items() if ids}
+            queued_at = [queued for ids in cls._pending.values() for queued in ids.values()]
+        return {
+            "enabled": settings.CHROMA_REALTIME_UPDATES,
+            "scope": "process",
+            "pid": os.getpid(),
+            "worker_alive": cls._thread is not None and cls._thread.is_alive(),
+            "queue_depth": sum(pending.values()),
+            "pending": pending,
+            "oldest_pending_seconds": round(time.time() - min(queued_at), 3) if queued_at else 0,
+            "flush_interval": settings.CHROMA_UPDATE_FLUSH_INTERVAL,
+            "backoff_seconds": cls.backoff_seconds(),
+            **cls._stats,
+        }
+
+
+def queue_instance(sender, instance, **kwargs):
+    # Enqueue after commit so the worker reads the committed row (or finds it gone)
+    table, pk_column, pk = sender._meta.db_table, sender._meta.pk.column, instance.pk
+    transaction.on_commit(lambda: VectorUpdateQueue.enqueue(table, pk_column, pk))
+
+
+def connect_signals():
+    from location.models import District
+    from properties.models import Property, ResidentialComplex
+
+    for model in (ResidentialComplex, District, Property):
+        post_save.connect(queue_instance, sender=model, dispatch_uid=f"chroma-vector-updates-save-{model.__name__}")
+        post_delete.connect(queue_instance, sender=model, dispatch_uid=f"chroma-vector-updates-delete-{model.__name__}")
@@ -1,7 +1,10 @@
 from rest_framework import views, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from django.conf import settings
@@ -10,54 +13,134 @@ from langchain_core.messages import HumanMessage, ToolMessage
 from typing import cast, List, Dict
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 import json
-from django.db import connection
 
 from agent.vector_db import VectorDBConnection
-from agent.chroma_loader import ChromaDBLoader
+from agent.chroma_jobs import ActiveLoadJobExists, cancel_load_job, start_load_job
 from agent.chroma_fetcher import ChromaDBFetcher
+from agent.vector_searcher import VectorSearcher
+from agent.vector_updates import VectorUpdateQueue
+from agent.embedding_cache import EmbeddingCache
 from .serializers import (
     ChromaLoadRequestSerializer, QueryCreateSerializer, 
     QueryResponseSerializer, StateDeleteSerializer, 
     StateOutSerializer, StateMessagesOutSerializer,
-    MessageSerializer
+    MessageSerializer, ConversationMessageSerializer,
+    ChromaLoadJobSerializer, ChromaFetchQuerySerializer
 )
-from agent.graph_builder import create_graph
+from .models import ChromaLoadJob, ChromaSyncState, ConversationMessage
+from .pagination import TranscriptKeysetPagination
+from agent.graph_builder import GraphRegistry, AsyncGraphRegistry
+from agent.checkpoint_retention import delete_threads
+from agent.streaming import sse_response, async_sse_response
+from agent.transcript import arollback_transcript, atranscript_position, rollback_transcript, transcript_position
 from agent.agent_state import AgentState
+from properties.streaming import is_asgi_request, streaming_content
 
 
 @extend_schema(
     tags=["ChromaDB"],
-    description="Load data from SQL table into ChromaDB collection",
+    description="Start a background job syncing a ChromaDB collection from a SQL table (incremental by default)",
     request=ChromaLoadRequestSerializer,
-    responses={200: {"description": "Data loaded successfully"}}
+    responses={
+        202: ChromaLoadJobSerializer,
+        409: {"description": "The collection already has a queued or running load job"}
+    }
 )
 class ChromaLoadDataView(views.APIView):
     def post(self, request):
         serializer = ChromaLoadRequestSerializer(data=request.data)
         if serializer.is_valid():
-            loader = ChromaDBLoader()
-            loader.load_data(
-                table=serializer.validated_data['table'],
-                sql_table=serializer.validated_data['sql_table'],
-                id_column=serializer.validated_data['id_column'],
-                text_columns=serializer.validated_data['text_columns'],
-                metadata_columns=serializer.validated_data.get('metadata_columns'),
-                column_names=serializer.validated_data.get('column_names', {})
+            try:
+                job = start_load_job(dict(serializer.validated_data))
+            except ActiveLoadJobExists as e:
+                return Response(
+                    {"error": str(e), "job": ChromaLoadJobSerializer(e.job).data},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return Response(
+                {'status': 'Load job started', 'job': ChromaLoadJobSerializer(job).data},
+                status=status.HTTP_202_ACCEPTED
             )
-            return Response({'status': 'Data loaded successfully'}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @extend_schema(
     tags=["ChromaDB"],
-    description="Fetch all data from all ChromaDB collections",
+    description="Status and progress of a ChromaDB load job: rows read, embedded and written, throughput and ETA",
+    responses={200: ChromaLoadJobSerializer}
+)
+class ChromaLoadJobView(views.APIView):
+    def get(self, request, job_id):
+        job = ChromaLoadJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ChromaLoadJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    tags=["ChromaDB"],
+    description="Cancel a queued or running ChromaDB load job; it stops after its current batch",
+    request=None,
+    responses={202: ChromaLoadJobSerializer}
+)
+class ChromaLoadJobCancelView(views.APIView):
+    def post(self, request, job_id):
+        job = ChromaLoadJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not cancel_load_job(job):
+            return Response(
+                {"error": f"Job already {job.status}", "job": ChromaLoadJobSerializer(job).data},
+                status=status.HTTP_409_CONFLICT
+            )
+        job.refresh_from_db()
+        return Response(ChromaLoadJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(
+    tags=["ChromaDB"],
+    description=(
+        "Page through a ChromaDB collection with offset/limit, or stream every collection as JSON when "
+        "no collection is given. Embeddings are only returned when listed in include. A collection that fails "
+        "mid-stream is listed with its error under \"__errors__\" at the end of the streamed object."
+    ),
+    parameters=[
+        OpenApiParameter(name="collection", type=str, location=OpenApiParameter.QUERY),
+        OpenApiParameter(name="offset", type=int, location=OpenApiParameter.QUERY),
+        OpenApiParameter(name="limit", type=int, location=OpenApiParameter.QUERY),
+        OpenApiParameter(name="include", type=str, location=OpenApiParameter.QUERY),
+    ],
     responses={200: {"description": "Data retrieved successfully"}}
 )
 class ChromaFetchDataView(views.APIView):
     def get(self, request):
+        serializer = ChromaFetchQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
         fetcher = ChromaDBFetcher()
-        data = dict(fetcher.fetch_all_data_all_collections())
-        return JsonResponse(data)
+
+        if not params.get('collection'):
+            return StreamingHttpResponse(
+                streaming_content(request, fetcher.stream_all_collections(params['include'])),
+                content_type="application/json",
+            )
+
+        try:
+            items = fetcher.fetch_collection_page(params['collection'], params['offset'], params['limit'], params['include'])
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        return Response(
+            {
+                "collection": params['collection'],
+                "count": fetcher.count_records(params['collection']),
+                "offset": params['offset'],
+                "limit": params['limit'],
+                "next_offset": params['offset'] + len(items) if len(items) == params['limit'] else None,
+                "items": items,
+            },
+            status=status.HTTP_200_OK
+        )
 
 
 @extend_schema(
@@ -75,6 +158,7 @@ class ChromaDeleteCollectionsView(views.APIView):
             chroma_client.delete_collection(name=collection_name)
             print(f"Коллекция '{collection_name}' удалена.")
 
+        VectorSearcher.invalidate()
         print("Оставшиеся коллекции:", chroma_client.list_collections())
         return Response({'status': 'Collections deleted'}, status=status.HTTP_200_OK)
 
@@ -88,9 +172,55 @@ class ChromaResetView(views.APIView):
     def get(self, request):
         chroma_client = VectorDBConnection.get_client()
         chroma_client.reset()
+        VectorSearcher.invalidate()
         return Response({"success": "Chroma Client has been reset."}, status=status.HTTP_200_OK)
 
 
+@extend_schema(
+    tags=["ChromaDB"],
+    description="Vector index status: pending real-time updates, update lag, embedding cache counters and the last sync of each collection",
+    responses={200: {"description": "Status retrieved successfully"}}
+)
+class ChromaStatusView(views.APIView):
+    def get(self, request):
+        collections = list(
+            ChromaSyncState.objects.order_by("collection").values(
+                "collection", "sql_table", "id_column", "watermark_column", "high_water_mark",
+                "rows_read", "rows_upserted", "rows_unchanged", "rows_deleted", "synced_at",
+            )
+        )
+        active_jobs = ChromaLoadJob.objects.filter(status__in=ChromaLoadJob.ACTIVE_STATUSES).order_by("created_at")
+        return Response(
+            {
+                "updates": VectorUpdateQueue.status(),
+                "embedding_cache": EmbeddingCache.stats(),
+                "active_jobs": ChromaLoadJobSerializer(active_jobs, many=True).data,
+                "collections": collections,
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+def build_chat_config(user_details: Dict) -> Dict:
+    return {
+        "configurable": {
+            "thread_id": str(user_details.get('user_telegram_id', '')),
+        }
+    }
+
+
+def build_chat_state(question: str, config: Dict) -> AgentState:
+    return cast(
+        AgentState,
+        {
+            "messages": [HumanMessage(content=question)],
+            "thread_id": str(config["configurable"]["thread_id"]),
+            "search_criteria": {},
+            "last_updated_keys": []
+        }
+    )
+
+
 @extend_schema(
     tags=["Agent"],
     description="Chat with the AI agent system",
@@ -140,22 +270,20 @@ class AgentChatView(APIView):
         print("Username:", user_details.get('username'))
         print("Query:", question)
         
-        # Get or create graph
-        if not hasattr(self, 'graph'):
-            self.graph = create_graph()
+        graph = GraphRegistry.get_graph()
         
-        config = {
-            "configurable": {
-                "thread_id": str(user_details.get('user_telegram_id', '')),
-            }
-        }
+        config = build_chat_config(user_details)
+        thread_id = config["configurable"]["thread_id"]
+        position = transcript_position(thread_id)
         
         try:
-            response = self.process_single_question(self.graph, question, config)
+            response = self.process_single_question(graph, question, config)
         except OperationalError as e:
             print("OperationalError during graph invocation:", e)
-            self.graph = create_graph()
-            response = self.process_single_question(self.graph, question, config)
+            graph = GraphRegistry.rebuild_if_unhealthy()
+            # The retry runs the whole turn again, transcript included
+            rollback_transcript(thread_id, position)
+            response = self.process_single_question(graph, question, config)
         
         print("Response:", response)
         
@@ -167,15 +295,7 @@ class AgentChatView(APIView):
     
     def process_single_question(self, graph, question, config):
         """Process a single question and return the response."""
-        state = cast(
-            AgentState,
-            {
-                "messages": [HumanMessage(content=question)],
-                "thread_id": str(config["configurable"]["thread_id"]),
-                "search_criteria": {},
-                "last_updated_keys": []
-            }
-        )
+        state = build_chat_state(question, config)
         
         for event in graph.stream(input=state, config=config, stream_mode="values"):
             if "messages" in event:
@@ -209,6 +329,92 @@ class AgentChatView(APIView):
         return snapshot.values["messages"][-1].content
 
 
+@extend_schema(
+    tags=["Agent"],
+    description=(
+        "Chat with the AI agent system over Server-Sent Events. Emits `token` events with LLM deltas, "
+        "`node`, `tool_call` and `tool_result` progress events, and a final `done` event with the answer "
+        "(or `error`)."
+    ),
+    request=QueryCreateSerializer,
+    responses={200: {"description": "text/event-stream of agent events"}},
+)
+class AgentChatStreamView(APIView):
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = QueryCreateSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        query_data = serializer.validated_data
+        question = query_data.get('query', '')
+        config = build_chat_config(query_data.get('user_details', {}))
+        print("Streaming query:", question, "thread:", config["configurable"]["thread_id"])
+
+        state = build_chat_state(question, config)
+        if is_asgi_request(request):
+            # A sync generator would be buffered whole by the ASGI handler; astream sends tokens as they come
+            return async_sse_response(AsyncGraphRegistry.get_graph, AsyncGraphRegistry.rebuild_if_unhealthy, state, config)
+        return sse_response(GraphRegistry.get_graph, GraphRegistry.rebuild_if_unhealthy, state, config)
+
+
+async def aprocess_question(graph, state: AgentState, config: Dict) -> str:
+    async for event in graph.astream(input=state, config=config, stream_mode="values"):
+        if "messages" in event:
+            # For logging purposes
+            print(f"Agent: {event['messages'][-1].content}")
+
+    snapshot = await graph.aget_state(config)
+    while snapshot.next:
+        # Tool calls are always approved, as in AgentChatView.get_human_approval
+        await graph.ainvoke(None, config)
+        snapshot = await graph.aget_state(config)
+
+    return snapshot.values["messages"][-1].content
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAgentChatView(View):
+    """
+    Async chat for ASGI servers: the graph runs with astream on an AsyncPostgresSaver, so a
+    conversation waiting on the LLM does not hold a worker thread. Accepts the same body as
+    AgentChatView; `?stream=true` answers with the Server-Sent Events of AgentChatStreamView.
+    """
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"detail": "Request body must be JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = QueryCreateSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        query_data = serializer.validated_data
+        question = query_data.get('query', '')
+        config = build_chat_config(query_data.get('user_details', {}))
+        state = build_chat_state(question, config)
+        print("Async query:", question, "thread:", config["configurable"]["thread_id"])
+
+        if request.GET.get('stream') == 'true':
+            return async_sse_response(AsyncGraphRegistry.get_graph, AsyncGraphRegistry.rebuild_if_unhealthy, state, config)
+
+        position = await atranscript_position(state["thread_id"])
+        try:
+            response = await aprocess_question(await AsyncGraphRegistry.get_graph(), state, config)
+        except OperationalError as e:
+            print("OperationalError during async graph invocation:", e)
+            graph = await AsyncGraphRegistry.rebuild_if_unhealthy()
+            await arollback_transcript(state["thread_id"], position)
+            response = await aprocess_question(graph, state, config)
+
+        print("Response:", response)
+        return JsonResponse(QueryResponseSerializer({"result": response}).data, json_dumps_params={"ensure_ascii": False})
+
+
 # State Management Views
 @extend_schema(
     tags=["State Management"],
@@ -224,17 +430,8 @@ class StateDeleteMessagesView(APIView):
         
         thread_id = serializer.validated_data['thread_id']
         
-        # SQL queries to execute
-        queries = [
-            "DELETE FROM public.checkpoints WHERE thread_id = %s;",
-            "DELETE FROM public.checkpoint_writes WHERE thread_id = %s;",
-            "DELETE FROM public.checkpoint_blobs WHERE thread_id = %s;"
-        ]
-        
         try:
-            with connection.cursor() as cursor:
-                for query in queries:
-                    cursor.execute(query, [thread_id])
+            delete_threads([thread_id])
             
             result = {"thread_id": thread_id, "result": "All messages have been removed."}
             return Response(result, status=status.HTTP_200_OK)
@@ -248,11 +445,21 @@ class StateDeleteMessagesView(APIView):
 
 @extend_schema(
     tags=["State Management"],
-    description="Get a simplified conversation for a thread",
-    parameters=[OpenApiParameter(name="thread_id", type=str, location=OpenApiParameter.QUERY)],
-    responses={200: {"type": "array", "items": {"type": "object", "properties": {"role": {"type": "string"}, "content": {"type": "string"}}}}}
+    description=(
+        "Get the conversation transcript of a thread, oldest first. Paginated by `cursor` "
+        "(use `next_cursor` from the previous page), `page_size` and `sort` (`seq` or `-seq`)."
+    ),
+    parameters=[
+        OpenApiParameter(name="thread_id", type=str, location=OpenApiParameter.QUERY),
+        OpenApiParameter(name="cursor", type=str, location=OpenApiParameter.QUERY),
+        OpenApiParameter(name="page_size", type=int, location=OpenApiParameter.QUERY),
+        OpenApiParameter(name="sort", type=str, location=OpenApiParameter.QUERY),
+    ],
+    responses={200: ConversationMessageSerializer(many=True)}
 )
 class StateGetSimpleConversationView(APIView):
+    pagination_class = TranscriptKeysetPagination
+
     def get(self, request):
         thread_id = request.query_params.get('thread_id')
         if not thread_id:
@@ -261,59 +468,10 @@ class StateGetSimpleConversationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT checkpoint_id, thread_id, metadata
-                    FROM public.checkpoints
-                    WHERE thread_id = %s
-                    ORDER BY (metadata->>'step')::int ASC;
-                    """,
-                    [thread_id]
-                )
-                rows = cursor.fetchall()
-            
-            conversation = []
-            for row in rows:
-                metadata = row[2]
-                if isinstance(metadata, str):
-                    try:
-                        metadata = json.loads(metadata)
-                    except Exception as err:
-                        print("Error parsing metadata:", err)
-                        continue
-                
-                writes = metadata.get("writes")
-                if not writes:
-                    continue
-                
-                for key in ["__start__", "main_agent"]:
-                    if key in writes and writes[key]:
-                        if key == 'main_agent':
-                            messages = writes[key]["messages"]
-                            kwargs = messages["kwargs"]
-                            role = kwargs["type"]
-                            content = kwargs["content"]
-                            
-                            if role and content:
-                                conversation.append({"role": role, "content": content})
-                        else:
-                            messages = writes[key].get("messages", [])
-                            for msg in messages:
-                                kwargs = msg.get("kwargs")
-                                role = kwargs.get("type")
-                                content = kwargs.get("content")
-                                if role and content:
-                                    conversation.append({"role": role, "content": content})
-            
-            return Response(conversation, status=status.HTTP_200_OK)
-        except Exception as e:
-            print(f"Error getting conversation: {e}")
-            return Response(
-                {"detail": "An error occurred while retrieving the conversation."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(ConversationMessage.objects.filter(thread_id=thread_id), request, view=self)
+        serializer = ConversationMessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 @extend_schema(
@@ -323,8 +481,6 @@ class StateGetSimpleConversationView(APIView):
     responses={200: StateMessagesOutSerializer}
 )
 class StateGetMessagesView(APIView):
-    graph = None
-    
     def get(self, request):
         thread_id = request.query_params.get('thread_id')
         if not thread_id:
@@ -335,11 +491,8 @@ class StateGetMessagesView(APIView):
         
         config = {"configurable": {"thread_id": thread_id}}
         
-        if not self.graph:
-            self.graph = create_graph()
-        
         try:
-            snapshot = self.graph.get_state(config)
+            snapshot = GraphRegistry.get_graph().get_state(config)
             messages = snapshot.values.get("messages", [])
             
             if len(messages) > 0:
@@ -365,14 +518,9 @@ class StateGetMessagesView(APIView):
     responses={200: {"description": "PNG image of the graph"}}
 )
 class StateGetGraphPngView(APIView):
-    graph = None
-    
     def get(self, request):
-        if not self.graph:
-            self.graph = create_graph()
-        
         try:
-            image_data = self.graph.get_graph().draw_mermaid_png()
+            image_data = GraphRegistry.get_graph().get_graph().draw_mermaid_png()
             response = HttpResponse(content=image_data, content_type="image/png")
             response['Content-Disposition'] = 'inline; filename="graph.png"'
             return response
@@ -381,4 +529,23 @@ class StateGetGraphPngView(APIView):
             return Response(
                 {"detail": f"Error generating graph: {e}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+@extend_schema(
+    tags=["Agent"],
+    description="Health, rebuild count and connection pool usage of the shared sync and async agent graph checkpointers",
+    responses={200: {"description": "Checkpointer is healthy"}, 503: {"description": "Checkpointer is unavailable"}}
+)
+class AgentGraphHealthView(APIView):
+    def get(self, request):
+        try:
+            GraphRegistry.get_graph()
+        except Exception as e:
+            print(f"Error building agent graph: {e}")
+        stats = GraphRegistry.stats()
+        # The async registry is built lazily by the ASGI chat view; a closed pool after a build is unhealthy
+        stats["async"] = AsyncGraphRegistry.stats()
+        healthy = stats["healthy"] and (stats["async"]["healthy"] or not stats["async"]["built"])
+        status_code = status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE
+        return Response(stats, status=status_code)
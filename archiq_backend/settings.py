@@ -187,10 +187,73 @@ STATIC_ROOT = '/app/static'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Redis is used when REDIS_URL is set; local memory is per process, so multi-worker
+# deployments need Redis for catalogue cache invalidation to reach every worker
+REDIS_URL = os.getenv('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'archiq',
+    }
+}
+
+CATALOGUE_CACHE_ALIAS = 'default'
+CATALOGUE_CACHE_ENABLED = os.getenv('CATALOGUE_CACHE_ENABLED', 'true').lower() == 'true'
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', 300))
+
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 64))
+EMBEDDING_WORKERS = int(os.getenv('EMBEDDING_WORKERS', 0))
+EMBEDDING_QUEUE_SIZE = int(os.getenv('EMBEDDING_QUEUE_SIZE', 4))
+EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH')
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 100000))
+EMBEDDING_CACHE_EVICT_EVERY = int(os.getenv('EMBEDDING_CACHE_EVICT_EVERY', 1000))
 LLM_MODEL = os.getenv('LLM_MODEL')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH')
+# Rows read, hashed and upserted per batch when syncing Chroma collections from SQL tables
+CHROMA_SYNC_BATCH_SIZE = int(os.getenv('CHROMA_SYNC_BATCH_SIZE', 256))
+CHROMA_REALTIME_UPDATES = os.getenv('CHROMA_REALTIME_UPDATES', 'true').lower() == 'true'
+CHROMA_UPDATE_FLUSH_INTERVAL = float(os.getenv('CHROMA_UPDATE_FLUSH_INTERVAL', 2))
+CHROMA_UPDATE_MAX_BATCH = int(os.getenv('CHROMA_UPDATE_MAX_BATCH', 256))
+CHROMA_UPDATE_MAX_BACKOFF = float(os.getenv('CHROMA_UPDATE_MAX_BACKOFF', 300))
+CHROMA_JOB_STALE_SECONDS = int(os.getenv('CHROMA_JOB_STALE_SECONDS', 600))
+CHROMA_FETCH_BATCH_SIZE = int(os.getenv('CHROMA_FETCH_BATCH_SIZE', 500))
+CHROMA_FETCH_MAX_LIMIT = int(os.getenv('CHROMA_FETCH_MAX_LIMIT', 1000))
+AGENT_DB_POOL_MAX_SIZE = int(os.getenv('AGENT_DB_POOL_MAX_SIZE', 20))
+# Start the agent's background threads (warm-up, checkpoint sweeper, Chroma realtime updates,
+# hybrid index rebuilds) in this process. Set only for the server, so migrate, shell and tests stay idle
+AGENT_BACKGROUND_WORKERS = os.getenv('AGENT_BACKGROUND_WORKERS', 'false').lower() == 'true'
+# Load the embedding model and Chroma query engines in the background when the server starts
+AGENT_WARM_UP = os.getenv('AGENT_WARM_UP', 'false').lower() == 'true'
+AGENT_WARM_UP_COLLECTIONS = os.getenv('AGENT_WARM_UP_COLLECTIONS', 'residential_complexes_names').split()
+# Complex name resolution: squared L2 distance cutoff for Chroma neighbours, difflib cutoff
+# for fuzzy name matches, and whether ambiguous neighbours are reranked by the LLM
+AGENT_RESOLVER_MAX_DISTANCE = float(os.getenv('AGENT_RESOLVER_MAX_DISTANCE', 1.0))
+AGENT_RESOLVER_FUZZY_CUTOFF = float(os.getenv('AGENT_RESOLVER_FUZZY_CUTOFF', 0.8))
+AGENT_RESOLVER_LLM_RERANK = os.getenv('AGENT_RESOLVER_LLM_RERANK', 'false').lower() == 'true'
+AGENT_HYBRID_MIN_SCORE = float(os.getenv('AGENT_HYBRID_MIN_SCORE', 0.35))
+AGENT_HYBRID_CONFIDENT_SCORE = float(os.getenv('AGENT_HYBRID_CONFIDENT_SCORE', 0.7))
+AGENT_HYBRID_REBUILD_SECONDS = int(os.getenv('AGENT_HYBRID_REBUILD_SECONDS', 300))
+# Per-conversation cache of resolved complex names and profiles used by the agent tools
+AGENT_TOOL_CACHE_SIZE = int(os.getenv('AGENT_TOOL_CACHE_SIZE', 4096))
+AGENT_TOOL_CACHE_TTL = int(os.getenv('AGENT_TOOL_CACHE_TTL', 900))
+AGENT_COMPLEXES_SNAPSHOT_TTL = int(os.getenv('AGENT_COMPLEXES_SNAPSHOT_TTL', 60))
+# Conversation window: once a thread has more than MAX_TURNS user turns, older turns are folded
+# into a rolling summary and only the last KEEP_TURNS are sent; older tool outputs are cut to TOOL_OUTPUT_CHARS
+AGENT_CONTEXT_MAX_TURNS = int(os.getenv('AGENT_CONTEXT_MAX_TURNS', 10))
+AGENT_CONTEXT_KEEP_TURNS = int(os.getenv('AGENT_CONTEXT_KEEP_TURNS', 4))
+AGENT_CONTEXT_TOOL_OUTPUT_CHARS = int(os.getenv('AGENT_CONTEXT_TOOL_OUTPUT_CHARS', 600))
+AGENT_CONTEXT_SUMMARY = os.getenv('AGENT_CONTEXT_SUMMARY', 'true').lower() == 'true'
+# Checkpoint retention (manage.py sweep_checkpoints); a positive interval also sweeps in a background thread
+AGENT_CHECKPOINT_KEEP_LAST = int(os.getenv('AGENT_CHECKPOINT_KEEP_LAST', 10))
+AGENT_CHECKPOINT_TTL_DAYS = int(os.getenv('AGENT_CHECKPOINT_TTL_DAYS', 90))
+AGENT_CHECKPOINT_SWEEP_BATCH = int(os.getenv('AGENT_CHECKPOINT_SWEEP_BATCH', 500))
+AGENT_CHECKPOINT_SWEEP_INTERVAL = int(os.getenv('AGENT_CHECKPOINT_SWEEP_INTERVAL', 0))
 
 MOBIZON_KEY = os.getenv('MOBIZON_KEY')
 TELEGRAM_KEY = os.getenv('TELEGRAM_KEY')
@@ -10,10 +10,11 @@ from .serializers import (
     CitySerializer,
     DistrictSerializer,
 )
+from properties.cache import CatalogueCacheMixin
 from properties.permissions import ReadOnlyForAnyone
 
 
-class CityListView(APIView):
+class CityListView(CatalogueCacheMixin, APIView):
     permission_classes = [ReadOnlyForAnyone]
     
     @extend_schema(
@@ -24,7 +25,7 @@ class CityListView(APIView):
         serializer = CitySerializer(cities, many=True)
         return Response(serializer.data)
 
-class DistrictListView(APIView):
+class DistrictListView(CatalogueCacheMixin, APIView):
     permission_classes = [ReadOnlyForAnyone]
     
     @extend_schema(
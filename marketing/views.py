@@ -10,6 +10,7 @@ from .models import Banner
 from .serializers import BannerCreateSerializer, BannerSerializer
 from .permissions import AllowAnyListGet, IsAdminOrManager
 from clients.s3 import S3Client, generate_unique_filename
+from properties.cache import CatalogueCacheMixin
 from django.conf import settings
 
 class ActionMixin:
@@ -20,7 +21,7 @@ class ActionMixin:
             self.action = None
         return super().initial(request, *args, **kwargs)
     
-class BannerListCreateView(ActionMixin, APIView):
+class BannerListCreateView(CatalogueCacheMixin, ActionMixin, APIView):
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [AllowAnyListGet]
 
@@ -0,0 +1,91 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+
+def get_catalogue_cache():
+    return caches[settings.CATALOGUE_CACHE_ALIAS]
+
+
+def get_catalogue_version():
+    cache = get_catalogue_cache()
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGUE_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOGUE_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalogue_version():
+    """Invalidates every cached catalogue response; old entries simply stop being addressed."""
+    cache = get_catalogue_cache()
+    try:
+        return cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        # The counter was evicted or never set
+        cache.add(CATALOGUE_VERSION_KEY, 1, timeout=None)
+        return cache.incr(CATALOGUE_VERSION_KEY)
+
+
+def catalogue_cache_key(request, version):
+    params = sorted(
+        (key, value)
+        for key in request.GET
+        for value in request.GET.getlist(key)
+        if value != ''
+    )
+    # Pagination links are absolute, so the host is part of the key; Accept picks the renderer
+    raw = f"{request.get_host()}{request.path}?{params}#{request.META.get('HTTP_ACCEPT', '')}"
+    return f"catalogue:{version}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+class CatalogueCacheMixin:
+    """
+    Caches anonymous-readable GET responses of catalogue views under the normalized query
+    parameters and the current catalogue version, and answers conditional requests with 304.
+    Only JSON is cached; the browsable API is rendered on every request.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not settings.CATALOGUE_CACHE_ENABLED:
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = get_catalogue_cache()
+        key = catalogue_cache_key(request, get_catalogue_version())
+        cached = cache.get(key)
+
+        if cached is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            if not getattr(response, 'accepted_media_type', 'application/json').startswith('application/json'):
+                return response
+
+            if hasattr(response, 'render'):
+                response.render()
+            etag = f'"{hashlib.md5(response.content).hexdigest()}"'
+            cached = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': etag,
+            }
+            cache.set(key, cached, timeout=settings.CATALOGUE_CACHE_TIMEOUT)
+
+        if etag_matches(request, cached['etag']):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+        response['ETag'] = cached['etag']
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept'
+        return response
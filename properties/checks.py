@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_catalogue_cache(app_configs, **kwargs):
+    """With several server workers, versioned invalidation only works when every worker shares the cache."""
+    if not settings.CATALOGUE_CACHE_ENABLED:
+        return []
+    backend = settings.CACHES[settings.CATALOGUE_CACHE_ALIAS]['BACKEND']
+    if backend.endswith('LocMemCache'):
+        return [Error(
+            "The catalogue cache uses per-process local memory.",
+            hint="Set REDIS_URL (or CATALOGUE_CACHE_ENABLED=false) when running more than one server worker.",
+            id='properties.E001',
+        )]
+    return []
@@ -0,0 +1,46 @@
+from django.db.models import Count, Max, Min
+
+
+METADATA_BOUNDS = {
+    'price': 'total_price',
+    'price_per_sqm': 'price_per_sqm',
+    'area': 'area',
+    'floor': 'floor',
+}
+
+
+def build_filter_metadata(properties, include_rooms=False):
+    """
+    Computes catalogue filter metadata for a Property queryset in a single
+    grouped query: min/max bounds, the number of properties and the rooms histogram.
+    """
+    aggregates = {}
+    for field in METADATA_BOUNDS:
+        aggregates[f'{field}__min'] = Min(field)
+        aggregates[f'{field}__max'] = Max(field)
+
+    groups = list(
+        properties.prefetch_related(None)
+        .order_by()
+        .values('rooms')
+        .annotate(rooms_count=Count('id'), **aggregates)
+    )
+
+    metadata = {}
+    for field, name in METADATA_BOUNDS.items():
+        minimums = [group[f'{field}__min'] for group in groups if group[f'{field}__min'] is not None]
+        maximums = [group[f'{field}__max'] for group in groups if group[f'{field}__max'] is not None]
+        metadata[f'min_{name}'] = min(minimums) if minimums else None
+        metadata[f'max_{name}'] = max(maximums) if maximums else None
+
+    metadata['available_properties_count'] = sum(group['rooms_count'] for group in groups)
+
+    if include_rooms:
+        # NULL rooms go last, the same way Postgres orders them
+        groups.sort(key=lambda group: (group['rooms'] is None, group['rooms'] or 0))
+        metadata['rooms_available'] = [group['rooms'] for group in groups]
+        metadata['rooms_histogram'] = {
+            str(group['rooms']): group['rooms_count'] for group in groups if group['rooms'] is not None
+        }
+
+    return metadata
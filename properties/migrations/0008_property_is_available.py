@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+UNAVAILABLE_STATUSES = ('RESERVED', 'PAID', 'COMPLETED')
+
+
+def populate_is_available(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    Property.objects.filter(
+        property_purchases__status__in=UNAVAILABLE_STATUSES
+    ).update(is_available=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_alter_property_price'),
+        ('sales', '0002_alter_propertypurchase_purchase_purpose_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='is_available',
+            field=models.BooleanField(db_index=True, default=True, editable=False),
+        ),
+        migrations.RunPython(populate_is_available, migrations.RunPython.noop),
+    ]
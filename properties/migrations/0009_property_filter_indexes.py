@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_property_is_available'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='residentialcomplex',
+            index=models.Index(fields=['class_type'], name='rc_class_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'price'], name='prop_cat_price_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'area'], name='prop_cat_area_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'rooms', 'price'], name='prop_cat_rooms_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'floor'], name='prop_cat_floor_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['block', 'category'], name='prop_block_cat_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['price', 'area'], name='prop_price_area_avail_idx'),
+        ),
+    ]
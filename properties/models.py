@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 
 from location.models import District
 
@@ -48,6 +49,9 @@ class ResidentialComplex(models.Model):
 
     class Meta:
         db_table = "residential_complexes"
+        indexes = [
+            models.Index(fields=["class_type"], name="rc_class_type_idx"),
+        ]
 
 
 class ResidentialComplexPhotos(models.Model):
@@ -104,6 +108,8 @@ class Property(models.Model):
     area = models.DecimalField(max_digits=10, decimal_places=2)
     rooms = models.IntegerField(null=True, blank=True)
     layout = models.URLField(null=True, blank=True)
+    # Maintained by sales.signals from PropertyPurchase state changes
+    is_available = models.BooleanField(default=True, db_index=True, editable=False)
 
     def save(self, *args, **kwargs):
         if self.area is not None and self.price_per_sqm is not None:
@@ -115,6 +121,16 @@ class Property(models.Model):
 
     class Meta:
         db_table = "properties"
+        # Catalogue filters only ever read available rows, so the composite indexes are partial
+        indexes = [
+            models.Index(fields=["category", "price"], condition=Q(is_available=True), name="prop_cat_price_avail_idx"),
+            models.Index(fields=["category", "area"], condition=Q(is_available=True), name="prop_cat_area_avail_idx"),
+            models.Index(fields=["category", "rooms", "price"], condition=Q(is_available=True), name="prop_cat_rooms_avail_idx"),
+            models.Index(fields=["category", "floor"], condition=Q(is_available=True), name="prop_cat_floor_avail_idx"),
+            models.Index(fields=["block", "category"], condition=Q(is_available=True), name="prop_block_cat_avail_idx"),
+            # The agent criteria search does not filter on category
+            models.Index(fields=["price", "area"], condition=Q(is_available=True), name="prop_price_area_avail_idx"),
+        ]
 
 class PropertyPhotos(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="property_photos")
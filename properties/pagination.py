@@ -0,0 +1,192 @@
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+def parse_int(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError
+    return value
+
+
+def parse_decimal(value):
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise ValueError
+    value = Decimal(value)
+    if not value.is_finite():
+        raise ValueError
+    return value
+
+
+def parse_text(value):
+    if not isinstance(value, str):
+        raise ValueError
+    return value
+
+
+def parse_timestamp(value):
+    value = parse_datetime(value) if isinstance(value, str) else None
+    if value is None:
+        raise ValueError
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over (sort field, id). Each page is a single index range read,
+    no matter how deep the client scrolls.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    sort_query_param = 'sort'
+    # sort value -> model field; a leading "-" on the sort value means descending
+    sort_fields = {'id': 'id'}
+    default_sort = 'id'
+    # model field -> parser of its cursor value; tokens are client-supplied, so a value that
+    # does not parse is rejected here instead of failing in the ORM
+    cursor_parsers = {'id': parse_int}
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return self.page_size
+        if not page_size.isdigit() or int(page_size) < 1:
+            raise ValidationError({self.page_size_query_param: f"Must be an integer between 1 and {self.max_page_size}."})
+        return min(int(page_size), self.max_page_size)
+
+    def get_sort(self, request):
+        sort = request.query_params.get(self.sort_query_param, self.default_sort)
+        if sort.lstrip('-') not in self.sort_fields:
+            raise ValidationError({self.sort_query_param: f"Must be one of: {', '.join(self.sort_fields)} (prefix with '-' for descending)."})
+        return self.sort_fields[sort.lstrip('-')], sort.startswith('-')
+
+    def get_ordering(self, field, descending):
+        if descending:
+            return [F(field).desc(nulls_last=True), F('id').desc()]
+        return [F(field).asc(nulls_last=True), F('id').asc()]
+
+    def encode_cursor(self, sort, value, pk):
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        payload = json.dumps({'s': sort, 'v': value, 'id': pk}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token, sort):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if payload['s'] != sort:
+                raise ValueError
+            value = payload['v']
+            if value is not None:
+                value = self.cursor_parsers[self.sort_fields[sort.lstrip('-')]](value)
+            return value, parse_int(payload['id'])
+        except (binascii.Error, ValueError, KeyError, TypeError, InvalidOperation):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor for this sort order."})
+
+    def cursor_filter(self, field, descending, value, pk):
+        # NULL sort values are ordered last in both directions
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'id__lt' if descending else 'id__gt': pk})
+        comparison = 'lt' if descending else 'gt'
+        return (
+            Q(**{f'{field}__{comparison}': value})
+            | Q(**{field: value, f'id__{comparison}': pk})
+            | Q(**{f'{field}__isnull': True})
+        )
+
+    def order_queryset(self, queryset, request):
+        field, descending = self.get_sort(request)
+        return queryset.order_by(*self.get_ordering(field, descending))
+
+    def page_queryset(self, queryset, request):
+        """
+        Returns the ordered, cursor-filtered and sliced queryset that one page is read from
+        (one row more than the page size, to detect the next page).
+        """
+        self.page_size_value = self.get_page_size(request)
+        field, descending = self.get_sort(request)
+        self.sort = request.query_params.get(self.sort_query_param, self.default_sort)
+
+        queryset = queryset.order_by(*self.get_ordering(field, descending))
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            value, pk = self.decode_cursor(token, self.sort)
+            queryset = queryset.filter(self.cursor_filter(field, descending, value, pk))
+        return queryset[:self.page_size_value + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page = list(self.page_queryset(queryset, request))
+        self.has_next = len(page) > self.page_size_value
+        page = page[:self.page_size_value]
+
+        self.next_cursor = None
+        if self.has_next:
+            field, _ = self.get_sort(request)
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(self.sort, getattr(last, field), last.pk)
+        return page
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data, metadata=None):
+        response = {
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'first': self.get_first_link(),
+            'page_size': self.page_size_value,
+            'results': data,
+        }
+        if metadata is not None:
+            response['metadata'] = metadata
+        return Response(response)
+
+
+class PropertyKeysetPagination(KeysetPagination):
+    sort_fields = {
+        'price': 'price',
+        'price_per_sqm': 'price_per_sqm',
+        'area': 'area',
+        'floor': 'floor',
+        'rooms': 'rooms',
+        'id': 'id',
+    }
+    default_sort = 'price'
+    cursor_parsers = {
+        'price': parse_decimal,
+        'price_per_sqm': parse_decimal,
+        'area': parse_decimal,
+        'floor': parse_int,
+        'rooms': parse_int,
+        'id': parse_int,
+    }
+
+
+class ResidentialComplexKeysetPagination(KeysetPagination):
+    sort_fields = {
+        'name': 'name',
+        'created_at': 'created_at',
+        'id': 'id',
+    }
+    default_sort = 'name'
+    cursor_parsers = {'name': parse_text, 'created_at': parse_timestamp, 'id': parse_int}
@@ -64,7 +64,21 @@ class ResidentialComplexSimpleSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'address', 'class_type', 'district']
 
 
-class PropertySerializer(serializers.ModelSerializer):
+class ComplexPayloadMixin:
+    """
+    Serializes each residential complex once per response. Properties of the same complex
+    share the cached payload through the serializer context instead of re-serializing it per row.
+    """
+
+    def get_complex(self, obj):
+        payloads = self.context.setdefault('complex_payloads', {})
+        complex_id = obj.block.complex_id
+        if complex_id not in payloads:
+            payloads[complex_id] = ResidentialComplexSimpleSerializer(obj.block.complex).data
+        return payloads[complex_id]
+
+
+class PropertySerializer(ComplexPayloadMixin, serializers.ModelSerializer):
     property_photos = PropertyPhotosSerializer(many=True, read_only=True)
     property_videos = PropertyVideosSerializer(many=True, read_only=True)
     price = serializers.SerializerMethodField(read_only=True)
@@ -86,9 +100,6 @@ class PropertySerializer(serializers.ModelSerializer):
             return float(obj.area) * float(obj.price_per_sqm)
         return obj.price
     
-    def get_complex(self, obj):
-        return ResidentialComplexSimpleSerializer(obj.block.complex).data
-    
     def validate(self, data):
         # Calculate price automatically from area and price_per_sqm
         if 'area' in data and 'price_per_sqm' in data:
@@ -100,7 +111,7 @@ class PropertySerializer(serializers.ModelSerializer):
         return data
 
 
-class PropertyDetailSerializer(serializers.ModelSerializer):
+class PropertyDetailSerializer(ComplexPayloadMixin, serializers.ModelSerializer):
     property_photos = PropertyPhotosSerializer(many=True, read_only=True)
     property_videos = PropertyVideosSerializer(many=True, read_only=True)
     price = serializers.SerializerMethodField(read_only=True)
@@ -121,9 +132,6 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
             return float(obj.area) * float(obj.price_per_sqm)
         return obj.price
     
-    def get_complex(self, obj):
-        return ResidentialComplexSimpleSerializer(obj.block.complex).data
-    
     def validate(self, data):
         if 'area' in data and 'price_per_sqm' in data:
             data['price'] = data['area'] * data['price_per_sqm']
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from location.models import City, District
+from marketing.models import Banner
+from sales.models import PropertyPurchase
+from .cache import bump_catalogue_version
+from .models import (
+    ResidentialComplex, ResidentialComplexPhotos, Block, Property, PropertyPhotos, PropertyVideos,
+)
+
+
+CATALOGUE_MODELS = (
+    ResidentialComplex, ResidentialComplexPhotos, Block, Property, PropertyPhotos, PropertyVideos,
+    PropertyPurchase, City, District, Banner,
+)
+
+
+def invalidate_catalogue_cache(sender, **kwargs):
+    # Bumped before the commit, a concurrent request could re-cache the old rows under the new version
+    transaction.on_commit(bump_catalogue_version)
+
+
+for model in CATALOGUE_MODELS:
+    post_save.connect(invalidate_catalogue_cache, sender=model, dispatch_uid=f"catalogue-cache-save-{model.__name__}")
+    post_delete.connect(invalidate_catalogue_cache, sender=model, dispatch_uid=f"catalogue-cache-delete-{model.__name__}")
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+
+STREAM_CHUNK_SIZE = 500
+
+
+def _close_iterator(iterator):
+    try:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+    finally:
+        # The thread is discarded with its executor; its connections must not leak
+        connections.close_all()
+
+
+async def aiter_in_thread(iterator):
+    """
+    Async view of a sync iterator. Under ASGI Django buffers a sync streaming iterator whole
+    before sending it; this pulls each chunk on one dedicated thread instead, so chunks go out
+    as they are produced and a server-side cursor stays on the connection that opened it.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    done = object()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        await loop.run_in_executor(executor, _close_iterator, iterator)
+        executor.shutdown(wait=False)
+
+
+def is_asgi_request(request) -> bool:
+    # DRF wraps the Django request
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def streaming_content(request, iterator):
+    """The iterator as StreamingHttpResponse content for this request's handler (ASGI or WSGI)."""
+    if is_asgi_request(request):
+        return aiter_in_thread(iterator)
+    return iterator
+
+
+def ndjson_response(queryset, serializer_class, filename, serializer_context=None, request=None):
+    """
+    Streams a queryset as newline-delimited JSON. Rows come from a server-side cursor
+    in chunks, so the full export is never built in memory.
+    """
+    # One context for the whole stream so serializers can share per-response caches
+    context = serializer_context if serializer_context is not None else {}
+
+    def rows():
+        for instance in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE):
+            data = serializer_class(instance, context=context).data
+            yield json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    response = StreamingHttpResponse(streaming_content(request, rows()), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
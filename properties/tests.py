@@ -1 +1,389 @@
+import os
+from unittest import skipUnless
 
+from django.db import connection
+from django.http import QueryDict
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from agent.criteria_evaluator import criteria_filter
+from location.models import City, District
+from .models import ResidentialComplex, Block, Property
+from .serializers import PropertySerializer
+from .streaming import streaming_content
+from .views import PropertyListView, ResidentialComplexListView
+
+
+SEED_PROPERTIES = int(os.getenv('QUERY_PLAN_SEED_SIZE', 500_000))
+
+
+def create_complex(district, name, class_type="COMFORT"):
+    return ResidentialComplex.objects.create(
+        district=district,
+        name=name,
+        address=f"Адрес {name}",
+        class_type=class_type,
+        construction_technology="MONOLITHIC",
+        heating_type="CENTRAL",
+        ceiling_height=3,
+        block_number=1,
+    )
+
+
+class PropertyListSerializationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        city = City.objects.create(name="Алматы")
+        districts = [District.objects.create(city=city, name=f"Район {i}") for i in range(3)]
+        complexes = [create_complex(districts[i % len(districts)], f"ЖК {i}") for i in range(10)]
+        blocks = [
+            Block.objects.create(complex=complexes[i % len(complexes)], total_floors=12, link_on_map="https://2gis.kz")
+            for i in range(20)
+        ]
+        Property.objects.bulk_create(
+            Property(
+                block=blocks[i % len(blocks)],
+                category="APARTMENT",
+                number=i,
+                price=20000000 + i,
+                price_per_sqm=400000,
+                floor=1 + i % 12,
+                area=50,
+                rooms=1 + i % 4,
+            )
+            for i in range(1000)
+        )
+
+    def test_listing_query_count_is_constant(self):
+        queryset = PropertyListView().get_queryset(QueryDict(''))
+        # properties, photos, videos, blocks, complexes, districts
+        with self.assertNumQueries(6):
+            data = PropertySerializer(queryset, many=True).data
+
+        self.assertEqual(len(data), 1000)
+        self.assertTrue(data[0]['complex']['district']['name'].startswith("Район"))
+
+    def test_complex_payload_is_shared_between_rows(self):
+        queryset = PropertyListView().get_queryset(QueryDict(''))
+        serializer = PropertySerializer(queryset, many=True)
+        serializer.data
+
+        self.assertEqual(len(serializer.context['complex_payloads']), 10)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        city = City.objects.create(name="Алматы")
+        district = District.objects.create(city=city, name="Медеуский")
+        block = Block.objects.create(
+            complex=create_complex(district, "ЖК Тест"), total_floors=12, link_on_map="https://2gis.kz"
+        )
+        # Price is area * price_per_sqm; five rows share a price, so only the id tie-break orders them
+        areas = [60, 50, 50, 50, 50, 50, 40]
+        cls.properties = [
+            Property.objects.create(
+                block=block, category="APARTMENT", number=i, price_per_sqm=500000, floor=1, area=area, rooms=2,
+            )
+            for i, area in enumerate(areas)
+        ]
+
+    def paginate(self, **params):
+        from rest_framework.request import Request
+
+        from .pagination import PropertyKeysetPagination
+
+        paginator = PropertyKeysetPagination()
+        request = Request(RequestFactory().get("/properties/", params))
+        return paginator, paginator.paginate_queryset(Property.objects.all(), request)
+
+    def test_cursor_round_trip(self):
+        from datetime import datetime, timezone
+        from decimal import Decimal
+
+        from .pagination import PropertyKeysetPagination, ResidentialComplexKeysetPagination
+
+        created_at = datetime(2025, 1, 1, 10, 30, tzinfo=timezone.utc)
+        cases = [
+            (PropertyKeysetPagination(), "price", Decimal("25000000.50")),
+            (PropertyKeysetPagination(), "-floor", 7),
+            (PropertyKeysetPagination(), "rooms", None),
+            (ResidentialComplexKeysetPagination(), "-created_at", created_at),
+            (ResidentialComplexKeysetPagination(), "name", "ЖК Тест"),
+        ]
+        for paginator, sort, value in cases:
+            token = paginator.encode_cursor(sort, value, 42)
+            self.assertEqual(paginator.decode_cursor(token, sort), (value, 42), sort)
+
+    def test_pages_follow_the_id_tie_break(self):
+        for sort in ("price", "-price"):
+            seen, cursor = [], None
+            while True:
+                params = {"sort": sort, "page_size": 2, **({"cursor": cursor} if cursor else {})}
+                paginator, page = self.paginate(**params)
+                seen.extend(item.pk for item in page)
+                cursor = paginator.next_cursor
+                if not cursor:
+                    break
+
+            expected = sorted(self.properties, key=lambda item: (item.price, item.pk), reverse=sort.startswith("-"))
+            self.assertEqual(seen, [item.pk for item in expected], sort)
+
+    def test_tampered_cursor_is_rejected(self):
+        import base64
+
+        from rest_framework.exceptions import ValidationError
+
+        paginator, _ = self.paginate(sort="price", page_size=2)
+        other_sort = paginator.encode_cursor("-price", 25000000, self.properties[1].pk)
+        bad_id = base64.urlsafe_b64encode(b'{"s":"price","v":"1","id":"1 OR 1=1"}').decode()
+        for cursor in [other_sort, bad_id, "not-a-cursor", paginator.next_cursor[:-3]]:
+            with self.assertRaises(ValidationError, msg=cursor):
+                self.paginate(sort="price", page_size=2, cursor=cursor)
+
+    def test_tampered_cursor_values_are_rejected(self):
+        from rest_framework.exceptions import ValidationError
+
+        from .pagination import PropertyKeysetPagination, ResidentialComplexKeysetPagination
+
+        cases = [
+            (PropertyKeysetPagination(), "price", ["abc", "NaN", 1.5, True, ["1"]]),
+            (PropertyKeysetPagination(), "-floor", ["3", 2.5]),
+            (ResidentialComplexKeysetPagination(), "created_at", ["yesterday", 1700000000, {"ts": 1}]),
+            (ResidentialComplexKeysetPagination(), "name", [5]),
+        ]
+        for paginator, sort, values in cases:
+            for value in values:
+                token = paginator.encode_cursor(sort, value, 1)
+                with self.assertRaises(ValidationError, msg=f"{sort}={value!r}"):
+                    paginator.decode_cursor(token, sort)
+
+    def test_tampered_value_is_a_bad_request(self):
+        from django.urls import reverse
+
+        from .pagination import PropertyKeysetPagination
+
+        token = PropertyKeysetPagination().encode_cursor("price", "abc", 1)
+        response = self.client.get(reverse("property-list"), {"sort": "price", "cursor": token})
+        self.assertEqual(response.status_code, 400)
+
+
+class SharedCatalogueCacheCheckTests(SimpleTestCase):
+
+    def test_local_memory_catalogue_cache_fails_the_deploy_check(self):
+        from .checks import check_shared_catalogue_cache
+
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/0'}}
+        with override_settings(CACHES=locmem, CATALOGUE_CACHE_ENABLED=True):
+            self.assertEqual([error.id for error in check_shared_catalogue_cache(None)], ['properties.E001'])
+        with override_settings(CACHES=locmem, CATALOGUE_CACHE_ENABLED=False):
+            self.assertEqual(check_shared_catalogue_cache(None), [])
+        with override_settings(CACHES=redis, CATALOGUE_CACHE_ENABLED=True):
+            self.assertEqual(check_shared_catalogue_cache(None), [])
+
+
+class StreamingContentTests(SimpleTestCase):
+
+    def test_sync_iterator_streams_chunk_by_chunk_under_asgi(self):
+        import asyncio
+
+        produced = []
+
+        def rows():
+            try:
+                for i in range(3):
+                    produced.append(i)
+                    yield f"{i}\n"
+            finally:
+                produced.append("closed")
+
+        content = streaming_content(AsyncRequestFactory().get("/"), rows())
+
+        async def consume():
+            received = []
+            async for chunk in content:
+                # Nothing is produced ahead of what has been sent
+                self.assertEqual(len(produced), len(received) + 1)
+                received.append(chunk)
+            return received
+
+        self.assertEqual(asyncio.run(consume()), ["0\n", "1\n", "2\n"])
+        self.assertEqual(produced[-1], "closed")
+
+    def test_wsgi_gets_the_iterator_itself(self):
+        iterator = iter(["a"])
+        self.assertIs(streaming_content(RequestFactory().get("/"), iterator), iterator)
+
+
+class CatalogueCacheTests(TestCase):
+
+    def setUp(self):
+        from .cache import get_catalogue_cache
+
+        get_catalogue_cache().clear()
+
+    @override_settings(CATALOGUE_CACHE_ENABLED=True)
+    def test_browsable_api_is_not_served_from_the_json_entry(self):
+        view = ResidentialComplexListView.as_view()
+        factory = RequestFactory()
+
+        html = view(factory.get("/residential-complexes/", HTTP_ACCEPT="text/html"))
+        data = view(factory.get("/residential-complexes/", HTTP_ACCEPT="application/json"))
+        html_again = view(factory.get("/residential-complexes/", HTTP_ACCEPT="text/html"))
+
+        self.assertTrue(html['Content-Type'].startswith("text/html"))
+        self.assertTrue(data['Content-Type'].startswith("application/json"))
+        self.assertTrue(html_again['Content-Type'].startswith("text/html"))
+
+    def test_version_is_bumped_after_commit(self):
+        from .cache import get_catalogue_version
+
+        version = get_catalogue_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            City.objects.create(name="Астана")
+            self.assertEqual(get_catalogue_version(), version)
+        self.assertEqual(get_catalogue_version(), version + 1)
+
+
+@skipUnless(os.getenv('QUERY_PLAN_TESTS'), "Set QUERY_PLAN_TESTS=1 to seed a large catalogue and check query plans")
+class CatalogueQueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN against a seeded catalogue and fails if a query scans the whole properties table.
+
+    test_property_list_pages drives the page query the property list actually sends, through
+    PropertyListView.get_queryset and the keyset paginator: the default parameters (APARTMENT,
+    price sort), a rooms filter, the class_type join and a keyset continuation. These read one
+    page, so they must stay on the partial indexes whatever the selectivity of the filters.
+
+    The remaining tests use deliberately narrow bands (a few percent of the catalogue or less)
+    to check that each index can serve its filters when they are selective. They do not cover
+    the unpaginated filter metadata aggregates: with the default parameters those read most of
+    the available apartments (70% of the seeded rows are apartments, 6 in 7 are available, and a
+    district or class type still leaves an eighth to a quarter of them), so a sequential scan is the plan the
+    planner should pick there; the catalogue cache absorbs that cost instead.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        city = City.objects.create(name="Алматы")
+        districts = District.objects.bulk_create(
+            District(city=city, name=f"Район {i}") for i in range(8)
+        )
+        class_types = [choice for choice, _ in ResidentialComplex.CLASS_TYPE_CHOICES]
+        complexes = ResidentialComplex.objects.bulk_create(
+            ResidentialComplex(
+                district=districts[i % len(districts)],
+                name=f"ЖК {i}",
+                address=f"Адрес {i}",
+                class_type=class_types[i % len(class_types)],
+                construction_technology="MONOLITHIC",
+                heating_type="CENTRAL",
+                ceiling_height=3,
+                block_number=8,
+            )
+            for i in range(40)
+        )
+        blocks = Block.objects.bulk_create(
+            Block(complex=complexes[i % len(complexes)], block_number=i, total_floors=25, link_on_map="https://2gis.kz")
+            for i in range(300)
+        )
+        cls.complex = complexes[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH seed AS (
+                    SELECT g,
+                           (25 + (g * 37) %% 150)::numeric AS area,
+                           (300000 + (g * 7919) %% 900000)::numeric AS price_per_sqm
+                    FROM generate_series(1, %s) AS g
+                )
+                INSERT INTO properties (block_id, category, number, price, price_per_sqm, floor, area, rooms, is_available)
+                SELECT (%s::bigint[])[1 + g %% %s],
+                       CASE g %% 10 WHEN 0 THEN 'PARKING' WHEN 1 THEN 'BOXROOM' WHEN 2 THEN 'COMMERCE' ELSE 'APARTMENT' END,
+                       g,
+                       area * price_per_sqm,
+                       price_per_sqm,
+                       1 + g %% 25,
+                       area,
+                       1 + g %% 5,
+                       g %% 7 <> 0
+                FROM seed;
+                """,
+                [SEED_PROPERTIES, [block.id for block in blocks], len(blocks)]
+            )
+            cursor.execute("ANALYZE properties, blocks, residential_complexes, property_purchases;")
+
+    def assertNoPropertiesSeqScan(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan on properties", plan, msg=f"\n{queryset.query}\n{plan}")
+
+    def page_queryset(self, **params):
+        from rest_framework.request import Request
+
+        from .pagination import PropertyKeysetPagination
+
+        request = Request(RequestFactory().get("/properties/", params))
+        queryset = PropertyListView().get_queryset(request.query_params)
+        return PropertyKeysetPagination().page_queryset(queryset, request)
+
+    def test_property_list_pages(self):
+        from rest_framework.request import Request
+
+        from .pagination import PropertyKeysetPagination
+
+        paginator = PropertyKeysetPagination()
+        request = Request(RequestFactory().get("/properties/"))
+        paginator.paginate_queryset(PropertyListView().get_queryset(request.query_params), request)
+
+        combinations = [
+            {},
+            {"rooms": "2"},
+            {"class_type": "PREMIUM"},
+            {"class_type": "BUSINESS", "rooms": "3"},
+            {"cursor": paginator.next_cursor},
+        ]
+        for params in combinations:
+            with self.subTest(params=params):
+                self.assertNoPropertiesSeqScan(self.page_queryset(**params))
+
+    def test_property_list_filters(self):
+        combinations = [
+            "category=APARTMENT&min_price=30000000&max_price=30500000",
+            "category=APARTMENT&rooms=3&max_price=12000000",
+            "category=PARKING&min_area=170",
+            "category=APARTMENT&min_area=172&max_area=174&rooms=2",
+            f"complex_id={self.complex.id}",
+            f"complex_id={self.complex.id}&category=COMMERCE&min_price=50000000",
+        ]
+        view = PropertyListView()
+        for params in combinations:
+            with self.subTest(params=params):
+                self.assertNoPropertiesSeqScan(view.get_queryset(QueryDict(params)))
+
+    def test_residential_complex_list_filters(self):
+        combinations = [
+            "property_category=APARTMENT&rooms=2&min_total_price=20000000&max_total_price=20300000",
+            "property_category=APARTMENT&min_floor=25",
+            "property_category=BOXROOM&max_area=26",
+            "property_category=APARTMENT&class_type=PREMIUM&min_total_price=150000000",
+        ]
+        view = ResidentialComplexListView()
+        for params in combinations:
+            with self.subTest(params=params):
+                self.assertNoPropertiesSeqScan(view.get_available_properties(QueryDict(params)))
+
+    def test_agent_criteria_filters(self):
+        combinations = [
+            {"max_price": 9000000},
+            {"min_price": 100000000, "max_price": 100500000, "min_rooms": 2},
+            {"min_floor": 3, "max_floor": 10, "max_price": 10000000, "min_area": 30},
+        ]
+        for criteria in combinations:
+            with self.subTest(criteria=criteria):
+                queryset = Property.objects.filter(is_available=True).filter(criteria_filter(criteria)).select_related(
+                    'block', 'block__complex', 'block__complex__district'
+                )
+                self.assertNoPropertiesSeqScan(queryset)
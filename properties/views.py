@@ -1,4 +1,3 @@
-from django.db.models import Min, Max, Q
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.views import APIView
@@ -17,10 +16,15 @@ from .serializers import (
     ResidentialComplexPhotosSerializer, PropertyPhotoCreateSerializer, ResidentialComplexPhotoCreateSerializer,
 )
 from .permissions import ReadOnlyForAnyone
+from .cache import CatalogueCacheMixin
+from .metadata import build_filter_metadata
+from .pagination import PropertyKeysetPagination, ResidentialComplexKeysetPagination
+from .streaming import ndjson_response
 
 
-class ResidentialComplexListView(APIView):
+class ResidentialComplexListView(CatalogueCacheMixin, APIView):
     permission_classes = [ReadOnlyForAnyone]
+    pagination_class = ResidentialComplexKeysetPagination
     
     @extend_schema(
         parameters=[
@@ -35,6 +39,10 @@ class ResidentialComplexListView(APIView):
             OpenApiParameter(name="max_area", description="Filter by maximum area", type=OpenApiTypes.NUMBER, required=False),
             OpenApiParameter(name="min_total_price", description="Filter by minimum total price", type=OpenApiTypes.NUMBER, required=False),
             OpenApiParameter(name="max_total_price", description="Filter by maximum total price", type=OpenApiTypes.NUMBER, required=False),
+            OpenApiParameter(name="sort", description="Sort order, prefix with '-' for descending", type=str, enum=["name", "-name", "created_at", "-created_at", "id", "-id"], required=False),
+            OpenApiParameter(name="page_size", description="Number of results per page (max 500)", type=OpenApiTypes.INT, required=False),
+            OpenApiParameter(name="cursor", description="Cursor token from the previous page's next_cursor", type=str, required=False),
+            OpenApiParameter(name="stream", description="Stream every matching row as NDJSON instead of a page (true/false)", type=OpenApiTypes.BOOL, required=False),
         ]
     )
     def get(self, request):
@@ -88,13 +96,18 @@ class ResidentialComplexListView(APIView):
             if max_total_price and max_total_price.replace('.', '', 1).isdigit():
                 queryset = queryset.filter(blocks__properties__price__lte=float(max_total_price)).distinct()
         
+        paginator = self.pagination_class()
+        if request.query_params.get('stream', 'false').lower() == 'true':
+            return ndjson_response(
+                paginator.order_queryset(queryset, request), ResidentialComplexListSerializer, 'residential_complexes.ndjson',
+                request=request
+            )
+
         metadata = self.get_filter_metadata(request)
         
-        serializer = ResidentialComplexListSerializer(queryset, many=True)
-        return Response({
-            'results': serializer.data,
-            'metadata': metadata
-        })
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = ResidentialComplexListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data, metadata)
     
     @extend_schema(
         request=ResidentialComplexCreateUpdateSerializer,
@@ -111,69 +124,55 @@ class ResidentialComplexListView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def get_filter_metadata(self, request):
-        available_properties = Property.objects.exclude(
-            property_purchases__status__in=['RESERVED', 'PAID', 'COMPLETED']
-        )
-        
         property_category = request.query_params.get('property_category', 'APARTMENT')
+        available_properties = self.get_available_properties(request.query_params)
+        return build_filter_metadata(available_properties, include_rooms=property_category == 'APARTMENT')
+
+    def get_available_properties(self, query_params):
+        available_properties = Property.objects.filter(is_available=True)
+        
+        property_category = query_params.get('property_category', 'APARTMENT')
         if property_category:
             available_properties = available_properties.filter(category=property_category)
             
             if property_category == 'APARTMENT':
-                class_type = request.query_params.get('class_type')
+                class_type = query_params.get('class_type')
                 if class_type:
                     available_properties = available_properties.filter(block__complex__class_type=class_type)
                 
-                rooms = request.query_params.get('rooms')
+                rooms = query_params.get('rooms')
                 if rooms and rooms.isdigit():
                     available_properties = available_properties.filter(rooms=int(rooms))
         
-        district_id = request.query_params.get('district')
+        district_id = query_params.get('district')
         if district_id and district_id.isdigit():
             available_properties = available_properties.filter(block__complex__district_id=int(district_id))
         
-        min_floor = request.query_params.get('min_floor')
-        max_floor = request.query_params.get('max_floor')
+        min_floor = query_params.get('min_floor')
+        max_floor = query_params.get('max_floor')
         if min_floor and min_floor.isdigit():
             available_properties = available_properties.filter(floor__gte=int(min_floor))
         if max_floor and max_floor.isdigit():
             available_properties = available_properties.filter(floor__lte=int(max_floor))
         
-        min_area = request.query_params.get('min_area')
-        max_area = request.query_params.get('max_area')
+        min_area = query_params.get('min_area')
+        max_area = query_params.get('max_area')
         if min_area and min_area.replace('.', '', 1).isdigit():
             available_properties = available_properties.filter(area__gte=float(min_area))
         if max_area and max_area.replace('.', '', 1).isdigit():
             available_properties = available_properties.filter(area__lte=float(max_area))
         
-        min_total_price = request.query_params.get('min_total_price')
-        max_total_price = request.query_params.get('max_total_price')
+        min_total_price = query_params.get('min_total_price')
+        max_total_price = query_params.get('max_total_price')
         if min_total_price and min_total_price.replace('.', '', 1).isdigit():
             available_properties = available_properties.filter(price__gte=float(min_total_price))
         if max_total_price and max_total_price.replace('.', '', 1).isdigit():
             available_properties = available_properties.filter(price__lte=float(max_total_price))
             
-        metadata = {
-            'min_total_price': available_properties.aggregate(Min('price'))['price__min'],
-            'max_total_price': available_properties.aggregate(Max('price'))['price__max'],
-            'min_price_per_sqm': available_properties.aggregate(Min('price_per_sqm'))['price_per_sqm__min'],
-            'max_price_per_sqm': available_properties.aggregate(Max('price_per_sqm'))['price_per_sqm__max'],
-            'min_area': available_properties.aggregate(Min('area'))['area__min'],
-            'max_area': available_properties.aggregate(Max('area'))['area__max'],
-            'min_floor': available_properties.aggregate(Min('floor'))['floor__min'],
-            'max_floor': available_properties.aggregate(Max('floor'))['floor__max'],
-            'available_properties_count': available_properties.count()
-        }
-        
-        if property_category == 'APARTMENT':
-            metadata.update({
-                'rooms_available': list(available_properties.values_list('rooms', flat=True).distinct().order_by('rooms'))
-            })
-            
-        return metadata
+        return available_properties
 
 
-class ResidentialComplexDetailView(APIView):
+class ResidentialComplexDetailView(CatalogueCacheMixin, APIView):
     permission_classes = [ReadOnlyForAnyone]
     
     def get_object(self, pk):
@@ -211,7 +210,7 @@ class ResidentialComplexDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class BlockListView(APIView):
+class BlockListView(CatalogueCacheMixin, APIView):
     permission_classes = [ReadOnlyForAnyone]
     
     @extend_schema(
@@ -279,8 +278,9 @@ class BlockDetailView(APIView):
 
 
 # Property views
-class PropertyListView(APIView):
+class PropertyListView(CatalogueCacheMixin, APIView):
     permission_classes = [ReadOnlyForAnyone]
+    pagination_class = PropertyKeysetPagination
     
     @extend_schema(
         parameters=[
@@ -292,69 +292,70 @@ class PropertyListView(APIView):
             OpenApiParameter(name="min_area", description="Filter by minimum area", type=OpenApiTypes.NUMBER, required=False),
             OpenApiParameter(name="max_area", description="Filter by maximum area", type=OpenApiTypes.NUMBER, required=False),
             OpenApiParameter(name="rooms", description="Filter by number of rooms (for APARTMENT category)", type=OpenApiTypes.INT, required=False),
+            OpenApiParameter(name="sort", description="Sort order, prefix with '-' for descending", type=str, enum=["price", "-price", "price_per_sqm", "-price_per_sqm", "area", "-area", "floor", "-floor", "rooms", "-rooms", "id", "-id"], required=False),
+            OpenApiParameter(name="page_size", description="Number of results per page (max 500)", type=OpenApiTypes.INT, required=False),
+            OpenApiParameter(name="cursor", description="Cursor token from the previous page's next_cursor", type=str, required=False),
+            OpenApiParameter(name="stream", description="Stream every matching row as NDJSON instead of a page (true/false)", type=OpenApiTypes.BOOL, required=False),
         ],
         description="List available properties. Properties with RESERVED, PAID, or COMPLETED status are not included in the results."
     )
     def get(self, request):
-        queryset = Property.objects.all().prefetch_related('property_photos', 'property_videos', 'block', 'block__complex')
+        queryset = self.get_queryset(request.query_params)
+        paginator = self.pagination_class()
+        if request.query_params.get('stream', 'false').lower() == 'true':
+            return ndjson_response(
+                paginator.order_queryset(queryset, request), PropertySerializer, 'properties.ndjson', request=request
+            )
+
+        metadata = self.get_filter_metadata(request, queryset)
         
-        queryset = queryset.exclude(
-            property_purchases__status__in=['PAID', 'RESERVED', 'COMPLETED']
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = PropertySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data, metadata)
+
+    def get_queryset(self, query_params):
+        queryset = Property.objects.all().prefetch_related(
+            'property_photos', 'property_videos', 'block__complex__district'
         )
+        
+        queryset = queryset.filter(is_available=True)
             
-        complex_id = request.query_params.get('complex_id')
+        complex_id = query_params.get('complex_id')
         if complex_id and complex_id.isdigit():
             queryset = queryset.filter(block__complex_id=int(complex_id))
             
-        category = request.query_params.get('category', 'APARTMENT')
+        category = query_params.get('category', 'APARTMENT')
         if category:
             queryset = queryset.filter(category=category)
             
             if category == 'APARTMENT':
-                class_type = request.query_params.get('class_type')
+                class_type = query_params.get('class_type')
                 if class_type:
                     queryset = queryset.filter(block__complex__class_type=class_type)
             
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
+        min_price = query_params.get('min_price')
+        max_price = query_params.get('max_price')
         if min_price and min_price.replace('.', '', 1).isdigit():
             queryset = queryset.filter(price__gte=float(min_price))
         if max_price and max_price.replace('.', '', 1).isdigit():
             queryset = queryset.filter(price__lte=float(max_price))
             
-        min_area = request.query_params.get('min_area')
-        max_area = request.query_params.get('max_area')
+        min_area = query_params.get('min_area')
+        max_area = query_params.get('max_area')
         if min_area and min_area.replace('.', '', 1).isdigit():
             queryset = queryset.filter(area__gte=float(min_area))
         if max_area and max_area.replace('.', '', 1).isdigit():
             queryset = queryset.filter(area__lte=float(max_area))
             
-        rooms = request.query_params.get('rooms')
+        rooms = query_params.get('rooms')
         if rooms and rooms.isdigit():
             queryset = queryset.filter(rooms=int(rooms))
-            
-        metadata = self.get_filter_metadata(request, queryset)
-        
-        serializer = PropertySerializer(queryset, many=True)
-        return Response({
-            'results': serializer.data,
-            'metadata': metadata
-        })
+
+        return queryset
     
     def get_filter_metadata(self, request, filtered_properties):
-        metadata = {}
-        
-        metadata.update({
-            'min_total_price': filtered_properties.aggregate(Min('price'))['price__min'],
-            'max_total_price': filtered_properties.aggregate(Max('price'))['price__max'],
-            'min_price_per_sqm': filtered_properties.aggregate(Min('price_per_sqm'))['price_per_sqm__min'],
-            'max_price_per_sqm': filtered_properties.aggregate(Max('price_per_sqm'))['price_per_sqm__max'],
-            'min_area': filtered_properties.aggregate(Min('area'))['area__min'],
-            'max_area': filtered_properties.aggregate(Max('area'))['area__max'],
-            'min_floor': filtered_properties.aggregate(Min('floor'))['floor__min'],
-            'max_floor': filtered_properties.aggregate(Max('floor'))['floor__max'],
-            'available_properties_count': filtered_properties.count()
-        })
+        category = request.query_params.get('category', 'APARTMENT')
+        metadata = build_filter_metadata(filtered_properties, include_rooms=category == 'APARTMENT')
         
         available_complex_ids = filtered_properties.values_list('block__complex_id', flat=True).distinct()
         available_complexes = ResidentialComplex.objects.filter(id__in=available_complex_ids)
@@ -363,14 +364,7 @@ class PropertyListView(APIView):
             available_complexes, 
             many=True
         ).data
-        
-        # Category-specific metadata
-        category = request.query_params.get('category', 'APARTMENT')
-        if category == 'APARTMENT':
-            metadata.update({
-                'rooms_available': list(filtered_properties.values_list('rooms', flat=True).distinct().order_by('rooms'))
-            })
-            
+
         return metadata
     
     @extend_schema(
@@ -393,11 +387,11 @@ class PropertyDetailView(APIView):
     
     def get_object(self, pk):
         property = get_object_or_404(
-            Property.objects.prefetch_related('property_photos', 'property_videos', 'block', 'block__complex'),
+            Property.objects.select_related('block__complex__district').prefetch_related('property_photos', 'property_videos'),
             pk=pk
         )
         
-        if property.property_purchases.filter(status__in=['PAID', 'RESERVED', 'COMPLETED']).exists():
+        if not property.is_available:
             raise NotFound("Property is not available")
             
         return property
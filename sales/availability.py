@@ -0,0 +1,44 @@
+from django.db.models import Exists, OuterRef
+
+from properties.cache import bump_catalogue_version
+from properties.models import Property
+from .models import PropertyPurchase
+
+
+def _blocking_purchases():
+    return PropertyPurchase.objects.filter(
+        property_id=OuterRef('pk'),
+        status__in=PropertyPurchase.UNAVAILABLE_STATUSES,
+    )
+
+
+def refresh_property_availability(property_ids):
+    """Recomputes Property.is_available for the given property ids from their purchases."""
+    property_ids = {pk for pk in property_ids if pk is not None}
+    if not property_ids:
+        return 0
+
+    properties = Property.objects.filter(pk__in=property_ids)
+    blocked = properties.filter(Exists(_blocking_purchases())).values_list('pk', flat=True)
+    updated = properties.filter(pk__in=blocked, is_available=True).update(is_available=False)
+    updated += properties.exclude(pk__in=blocked).filter(is_available=False).update(is_available=True)
+    return updated
+
+
+def find_availability_drift():
+    """Returns (should_be_unavailable_ids, should_be_available_ids) for rows out of sync."""
+    annotated = Property.objects.annotate(blocked=Exists(_blocking_purchases()))
+    stale_available = list(annotated.filter(blocked=True, is_available=True).values_list('pk', flat=True))
+    stale_unavailable = list(annotated.filter(blocked=False, is_available=False).values_list('pk', flat=True))
+    return stale_available, stale_unavailable
+
+
+def rebuild_property_availability():
+    """Fixes every drifted row and returns the number of properties updated."""
+    stale_available, stale_unavailable = find_availability_drift()
+    updated = Property.objects.filter(pk__in=stale_available).update(is_available=False)
+    updated += Property.objects.filter(pk__in=stale_unavailable).update(is_available=True)
+    if updated:
+        # update() sends no signals, so the cached catalogue pages are invalidated here
+        bump_catalogue_version()
+    return updated
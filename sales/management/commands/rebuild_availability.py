@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from sales.availability import find_availability_drift, rebuild_property_availability
+
+
+class Command(BaseCommand):
+    help = "Rebuilds Property.is_available from PropertyPurchase statuses or checks it for drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only report drifted properties; exit with code 1 if any are found",
+        )
+
+    def handle(self, *args, **options):
+        stale_available, stale_unavailable = find_availability_drift()
+        drifted = len(stale_available) + len(stale_unavailable)
+
+        if options['check']:
+            if drifted:
+                self.stderr.write(self.style.ERROR(
+                    f"{drifted} properties out of sync: "
+                    f"{len(stale_available)} marked available but sold/reserved {stale_available[:20]}, "
+                    f"{len(stale_unavailable)} marked unavailable but free {stale_unavailable[:20]}"
+                ))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS("Property availability is in sync."))
+            return
+
+        updated = rebuild_property_availability()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt property availability, {updated} properties updated."))
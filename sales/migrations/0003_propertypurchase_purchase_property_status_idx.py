@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_alter_propertypurchase_purchase_purpose_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='propertypurchase',
+            index=models.Index(fields=['property', 'status'], name='purchase_property_status_idx'),
+        ),
+    ]
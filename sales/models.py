@@ -14,6 +14,9 @@ class PropertyPurchase(models.Model):
         ("COMPLETED", "Completed"),
     )
 
+    # A property with a purchase in one of these statuses is not for sale
+    UNAVAILABLE_STATUSES = ("RESERVED", "PAID", "COMPLETED")
+
     PURPOSE_CHOICES = (
         ("BUYING", "Buying"),
         ("RENTING", "Renting"),
@@ -28,4 +31,7 @@ class PropertyPurchase(models.Model):
         return f"{self.user} purchases {self.property}"
 
     class Meta:
-        db_table = "property_purchases"
\ No newline at end of file
+        db_table = "property_purchases"
+        indexes = [
+            models.Index(fields=["property", "status"], name="purchase_property_status_idx"),
+        ]
\ No newline at end of file
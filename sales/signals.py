@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .availability import refresh_property_availability
+from .models import PropertyPurchase
+
+
+@receiver(pre_save, sender=PropertyPurchase)
+def remember_previous_property(sender, instance, **kwargs):
+    # A purchase moved to another property must release the old one
+    instance._previous_property_id = None
+    if instance.pk:
+        instance._previous_property_id = (
+            PropertyPurchase.objects.filter(pk=instance.pk).values_list('property_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=PropertyPurchase)
+def update_availability_on_save(sender, instance, **kwargs):
+    refresh_property_availability([instance.property_id, getattr(instance, '_previous_property_id', None)])
+
+
+@receiver(post_delete, sender=PropertyPurchase)
+def update_availability_on_delete(sender, instance, **kwargs):
+    refresh_property_availability([instance.property_id])
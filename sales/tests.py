@@ -1,3 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from location.models import City, District
+from properties.cache import get_catalogue_version
+from properties.models import ResidentialComplex, Block, Property
+from users.models import CustomUser
+from .models import PropertyPurchase
+
+
+class PropertyAvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        district = District.objects.create(city=City.objects.create(name="Алматы"), name="Медеуский")
+        complex_ = ResidentialComplex.objects.create(
+            district=district,
+            name="ЖК Тест",
+            address="Адрес",
+            class_type="COMFORT",
+            construction_technology="MONOLITHIC",
+            heating_type="CENTRAL",
+            ceiling_height=3,
+            block_number=1,
+        )
+        block = Block.objects.create(complex=complex_, total_floors=12, link_on_map="https://2gis.kz")
+        cls.user = CustomUser.objects.create_user(phone_number="+77010000000", password="secret")
+        cls.apartments = [
+            Property.objects.create(block=block, category="APARTMENT", number=i, price_per_sqm=500000, area=50, floor=1)
+            for i in range(2)
+        ]
+
+    def is_available(self, apartment):
+        return Property.objects.values_list('is_available', flat=True).get(pk=apartment.pk)
+
+    def test_purchase_status_drives_availability(self):
+        apartment = self.apartments[0]
+        purchase = PropertyPurchase.objects.create(user=self.user, property=apartment)
+        self.assertTrue(self.is_available(apartment))
+
+        purchase.status = "RESERVED"
+        purchase.save()
+        self.assertFalse(self.is_available(apartment))
+
+        purchase.status = "CANCELED"
+        purchase.save()
+        self.assertTrue(self.is_available(apartment))
+
+    def test_moved_purchase_releases_the_old_property(self):
+        old, new = self.apartments
+        purchase = PropertyPurchase.objects.create(user=self.user, property=old, status="PAID")
+        self.assertFalse(self.is_available(old))
+
+        purchase.property = new
+        purchase.save()
+        self.assertTrue(self.is_available(old))
+        self.assertFalse(self.is_available(new))
+
+        purchase.delete()
+        self.assertTrue(self.is_available(new))
+
+    def test_check_exits_with_1_on_drift_and_rebuild_fixes_it(self):
+        apartment = self.apartments[0]
+        call_command('rebuild_availability', check=True, stdout=StringIO())
+
+        # Drift that bypasses the signals, like a raw SQL import
+        Property.objects.filter(pk=apartment.pk).update(is_available=False)
+        with self.assertRaises(SystemExit) as exit_info:
+            call_command('rebuild_availability', check=True, stderr=StringIO())
+        self.assertEqual(exit_info.exception.code, 1)
+
+        version = get_catalogue_version()
+        call_command('rebuild_availability', stdout=StringIO())
+        self.assertTrue(self.is_available(apartment))
+        self.assertEqual(get_catalogue_version(), version + 1)
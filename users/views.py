@@ -329,7 +329,7 @@ class UserPropertiesView(APIView):
         user_properties = Property.objects.filter(
             property_purchases__user=request.user,
             property_purchases__status__in=['PAID', 'COMPLETED', 'RESERVED']  # Only include properties with completed purchases
-        ).distinct()
+        ).distinct().prefetch_related('property_photos', 'property_videos', 'block__complex__district')
         
         serializer = PropertySerializer(user_properties, many=True)
         return Response(serializer.data)
\ No newline at end of file